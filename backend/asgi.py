@@ -0,0 +1,68 @@
+"""
+⚡ ASGI server mode — route ชุดเดียวกับ server.py แต่รันบน ASGI server (uvicorn)
+  - route ทั่วไปวิ่งผ่าน Flask app เดิม (a2wsgi) บน thread pool ขนาดคงที่ ASGI_WSGI_WORKERS
+    inference ที่เกิดจาก request ผ่าน BoundedExecutor ของ server.py — เต็มแล้วตอบ 503 + Retry-After
+  - stream ที่เปิดค้าง (/api/stream MJPEG, /api/events SSE) เป็น async ใน event loop — ไม่กิน thread ต่อ client
+
+    cd backend
+    pip install starlette uvicorn a2wsgi
+    uvicorn asgi:app --host 127.0.0.1 --port 5000
+"""
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import server
+
+ASGI_WSGI_WORKERS = 16   # thread สำหรับ route ที่วิ่งผ่าน Flask (ไม่รวม stream)
+
+server.start_warmup()   # โหลดโมเดลใน background — /api/ready บอกว่าเสร็จเมื่อไหร่
+
+
+async def stream_camera(request):
+    """MJPEG stream แบบ async — ?annotated=1 เหมือน /api/stream ของ server.py"""
+    lab_id = request.path_params["lab_id"]
+    cam_id = request.path_params["cam_id"]
+    annotated = request.query_params.get("annotated", "0").lower() in ("1", "true", "yes")
+    missing = server._stream_missing(lab_id, cam_id, annotated)
+    if missing:
+        return JSONResponse({"error": missing}, status_code=404)
+    b = server._get_broadcaster(lab_id, cam_id, "annotated" if annotated else "raw")
+    return StreamingResponse(b.subscribe_async(),
+                             media_type="multipart/x-mixed-replace; boundary=frame")
+
+
+async def stream_events(request):
+    """SSE แบบ async — query/header เหมือน /api/events ของ server.py"""
+    def split(name):
+        value = request.query_params.get(name, "")
+        return {v.strip() for v in value.split(",") if v.strip()} or None
+
+    last_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    return StreamingResponse(
+        server.events.subscribe_async(split("labs"), split("types"), last_id, split("all_labs")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+app = Starlette(
+    routes=[
+        Route("/api/stream/{lab_id}/{cam_id:int}", stream_camera),
+        Route("/api/events", stream_events),
+        Mount("/", WSGIMiddleware(server.app, workers=ASGI_WSGI_WORKERS)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"],
+                           allow_headers=["*"])],
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=5000)
@@ -0,0 +1,362 @@
+"""
+🎞️ Batch Analyze - วิเคราะห์วิดีโอที่อัดไว้ / โฟลเดอร์รูปภาพแบบ offline (ไม่ต้องเล่นผ่าน capture แบบ real-time)
+  - แบ่งแต่ละวิดีโอเป็นช่วงเวลา (chunk) แล้วกระจายไปหลาย process พร้อมกัน
+  - สุ่มตัวอย่างตาม --fps ของเวลาในวิดีโอ: grab ทุก frame แต่ decode เฉพาะ frame ที่ใช้
+  - scoring เดียวกับ analyze_frame (analyze_frames แบบ batch ละ --batch frame)
+  - ผลต่อ frame เขียนลงไฟล์ของแต่ละ chunk ทีละแถว (JSONL) หรือเป็น Parquet ต่อ chunk (ต้องมี pyarrow)
+  - checkpoint: manifest.json ใน --out เก็บ chunk ที่เสร็จแล้ว — รันคำสั่งเดิมซ้ำจะทำต่อจากที่ค้าง
+
+    cd backend
+    python batch_analyze.py /data/lectures/*.mp4 --out out/sem1 --workers 4 --fps 1
+    python batch_analyze.py test_images --out out/images --merge
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import cv2
+
+VIDEO_EXTS = (".mp4", ".avi", ".mkv", ".mov", ".m4v", ".webm", ".ts")
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+SUMMARY_KEYS = ("attentive", "sleeping", "looking_down", "looking_away", "unknown")
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+# ─── Sources & chunks ─────────────────────────────────────────────────────────
+def _source_id(path):
+    stem = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f"{stem}-{digest}"
+
+
+def _images_in(directory):
+    return sorted(os.path.join(directory, n) for n in os.listdir(directory)
+                  if n.lower().endswith(IMAGE_EXTS))
+
+
+def expand_inputs(inputs):
+    """ไฟล์วิดีโอ / โฟลเดอร์ (วิดีโอข้างในแยกเป็นแต่ละ source, รูปภาพรวมเป็นหนึ่ง source) / glob"""
+    sources = []
+    for item in inputs:
+        paths = sorted(glob.glob(item)) or [item]
+        for path in paths:
+            if os.path.isdir(path):
+                videos = sorted(os.path.join(path, n) for n in os.listdir(path)
+                                if n.lower().endswith(VIDEO_EXTS))
+                sources += [("video", v) for v in videos]
+                if _images_in(path):
+                    sources.append(("images", path))
+            elif path.lower().endswith(VIDEO_EXTS):
+                sources.append(("video", path))
+            else:
+                print(f"⚠️  ข้าม {path} (ไม่ใช่วิดีโอหรือโฟลเดอร์)")
+    return sources
+
+
+def plan_chunks(sources, fps, chunk_seconds, chunk_images):
+    """
+    แบ่งงาน — chunk ของวิดีโอเริ่มที่ frame ที่เป็นจังหวะสุ่มตัวอย่างเสมอ (ไม่ซ้ำ/ไม่ขาดตรงรอยต่อ)
+    คืน list ของ dict: id, source, path, kind, start, end (end=None = จนจบไฟล์), step, video_fps
+    """
+    chunks = []
+    for kind, path in sources:
+        sid = _source_id(path)
+        if kind == "images":
+            count = len(_images_in(path))
+            for i, start in enumerate(range(0, count, chunk_images)):
+                chunks.append({"id": f"{sid}.{i:05d}", "source": sid, "path": path, "kind": kind,
+                               "start": start, "end": min(count, start + chunk_images),
+                               "step": 1, "video_fps": None})
+            continue
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"⚠️  เปิด {path} ไม่ได้ — ข้าม")
+            continue
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        cap.release()
+        step = max(1, int(round(video_fps / fps)))
+        span = max(step, int(chunk_seconds * video_fps) // step * step)
+        starts = list(range(0, max(total, 1), span))
+        for i, start in enumerate(starts):
+            last = i == len(starts) - 1
+            chunks.append({"id": f"{sid}.{i:05d}", "source": sid, "path": path, "kind": kind,
+                           "start": start, "end": None if last else start + span,
+                           "step": step, "video_fps": video_fps})
+    return chunks
+
+
+# ─── Worker process ───────────────────────────────────────────────────────────
+_worker_opts = {}
+
+
+def _init_worker(opts):
+    """โหลดโมเดลครั้งเดียวต่อ process + จำกัด thread กันแย่ง CPU กันเอง"""
+    import behavior_analyzer
+    import torch
+
+    torch.set_num_threads(opts["threads"])
+    cv2.setNumThreads(1)
+    behavior_analyzer.INFERENCE_BACKEND = opts["backend"]
+    behavior_analyzer.get_pose_model()
+    _worker_opts.update(opts)
+
+
+def _iter_frames(chunk):
+    """(frame index, เวลา (วินาที) หรือ None, ชื่อไฟล์ หรือ None, frame)"""
+    if chunk["kind"] == "images":
+        for idx, path in enumerate(_images_in(chunk["path"])[chunk["start"]:chunk["end"]], chunk["start"]):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield idx, None, os.path.basename(path), frame
+        return
+    cap = cv2.VideoCapture(chunk["path"])
+    try:
+        if chunk["start"]:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, chunk["start"])
+        idx = chunk["start"]
+        while chunk["end"] is None or idx < chunk["end"]:
+            if not cap.grab():
+                break
+            if (idx - chunk["start"]) % chunk["step"] == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    yield idx, round(idx / chunk["video_fps"], 3), None, frame
+            idx += 1
+    finally:
+        cap.release()
+
+
+def _row(chunk, idx, t, name, analysis, with_behaviors):
+    row = {
+        "source":         chunk["source"],
+        "path":           chunk["path"],
+        "frame":          idx,
+        "t":              t,
+        "file":           name,
+        "total_people":   analysis["total_people"],
+        "attention_rate": analysis["attention_rate"],
+        "avg_confidence": analysis["avg_confidence"],
+        **{k: analysis["summary"].get(k, 0) for k in SUMMARY_KEYS},
+    }
+    if with_behaviors:
+        row["behaviors"] = [{
+            "behavior":   b["behavior"],
+            "confidence": b["confidence"],
+            "track_id":   b.get("track_id"),
+            "box":        [round(v, 1) for v in d["box"]],
+        } for b, d in zip(analysis["behaviors"], analysis["detections"])]
+    return row
+
+
+class _JsonlPart:
+    def __init__(self, path):
+        self._f = open(path, "w", encoding="utf-8")
+
+    def write(self, row):
+        self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._f.close()
+
+
+class _ParquetPart:
+    def __init__(self, path):
+        self.path = path
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+    def close(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pylist(self.rows), self.path)
+
+
+def process_chunk(chunk, out_dir):
+    """วิเคราะห์หนึ่ง chunk → parts/<id>.<format> (เขียนไฟล์ชั่วคราวแล้ว rename เมื่อเสร็จ)"""
+    from behavior_analyzer import analyze_frames
+    from tracker import PersonTracker
+
+    opts = _worker_opts
+    started = time.time()
+    final = part_path(out_dir, chunk["id"], opts["format"])
+    tmp = final + ".tmp"
+    part = (_ParquetPart if opts["format"] == "parquet" else _JsonlPart)(tmp)
+    tracker = PersonTracker() if opts["track"] else None
+    rows = 0
+    pending = []
+
+    def flush():
+        nonlocal rows
+        frames = [p[3] for p in pending]
+        results = analyze_frames(frames, [tracker] * len(frames) if tracker else None,
+                                 modes=[opts["preprocess"]] * len(frames))
+        for (idx, t, name, _), analysis in zip(pending, results):
+            part.write(_row(chunk, idx, t, name, analysis, opts["behaviors"]))
+            rows += 1
+        pending.clear()
+
+    try:
+        for item in _iter_frames(chunk):
+            pending.append(item)
+            # analyze_frames อัปเดต tracker ตามลำดับเฟรมใน batch — ใช้ tracker ตัวเดียวกันทั้ง batch ได้
+            if len(pending) >= opts["batch"]:
+                flush()
+        if pending:
+            flush()
+    finally:
+        part.close()
+    os.replace(tmp, final)
+    return chunk["id"], rows, time.time() - started
+
+
+# ─── Checkpoint ───────────────────────────────────────────────────────────────
+def part_path(out_dir, chunk_id, fmt):
+    return os.path.join(out_dir, "parts", f"{chunk_id}.{fmt}")
+
+
+def load_manifest(out_dir, config, restart):
+    path = os.path.join(out_dir, MANIFEST)
+    if restart or not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "config": config, "done": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("config") != config:
+        print("❌ ตั้งค่าไม่ตรงกับ checkpoint เดิมใน", out_dir)
+        print("   เดิม:", manifest.get("config"))
+        print("   ใหม่:", config)
+        print("   ใช้ --restart เพื่อเริ่มใหม่ทั้งหมด หรือเปลี่ยน --out")
+        sys.exit(2)
+    return manifest
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def merge_parts(out_dir, chunks, fmt):
+    """รวม part ของทุก chunk (เรียงตาม source/เวลา) เป็น results.<format> ไฟล์เดียว"""
+    target = os.path.join(out_dir, f"results.{fmt}")
+    paths = [part_path(out_dir, c["id"], fmt) for c in sorted(chunks, key=lambda c: c["id"])]
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = None
+        for p in paths:
+            table = pq.read_table(p)
+            if writer is None:
+                writer = pq.ParquetWriter(target, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    else:
+        with open(target, "wb") as out:
+            for p in paths:
+                with open(p, "rb") as f:
+                    out.write(f.read())
+    return target
+
+
+# ─── CLI ──────────────────────────────────────────────────────────────────────
+def main():
+    from behavior_analyzer import PREPROCESS_MODE, PREPROCESS_MODES
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="ไฟล์วิดีโอ / โฟลเดอร์ / glob")
+    parser.add_argument("--out", required=True, help="โฟลเดอร์ผลลัพธ์ (+ checkpoint)")
+    parser.add_argument("--fps", type=float, default=1.0, help="frame ที่วิเคราะห์ต่อวินาทีของวิดีโอ")
+    parser.add_argument("--chunk-seconds", type=float, default=300, help="ความยาววิดีโอต่อ chunk")
+    parser.add_argument("--chunk-images", type=int, default=200, help="จำนวนรูปต่อ chunk")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads", type=int, default=2, help="torch thread ต่อ worker")
+    parser.add_argument("--batch", type=int, default=8, help="frame ต่อ pose call")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--backend", default="torch", help="inference backend (ดู model_backend.py)")
+    parser.add_argument("--preprocess", choices=PREPROCESS_MODES, default=PREPROCESS_MODE,
+                        help="โหมด normalize แสงก่อน pose (ดู behavior_analyzer.PREPROCESS_MODES)")
+    parser.add_argument("--track", action="store_true",
+                        help="smoothing พฤติกรรมข้ามเฟรมด้วย tracker (เริ่มใหม่ทุก chunk)")
+    parser.add_argument("--no-behaviors", action="store_true", help="ไม่เก็บรายละเอียดต่อคน")
+    parser.add_argument("--merge", action="store_true", help="รวมทุก part เป็นไฟล์เดียวเมื่อเสร็จ")
+    parser.add_argument("--restart", action="store_true", help="ไม่ใช้ checkpoint เดิม")
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ --format parquet ต้องติดตั้ง pyarrow (pip install pyarrow)")
+            sys.exit(2)
+
+    sources = expand_inputs(args.inputs)
+    chunks = plan_chunks(sources, args.fps, args.chunk_seconds, args.chunk_images)
+    if not chunks:
+        print("❌ ไม่พบวิดีโอหรือรูปภาพ")
+        sys.exit(1)
+
+    os.makedirs(os.path.join(args.out, "parts"), exist_ok=True)
+    config = {"fps": args.fps, "chunk_seconds": args.chunk_seconds, "chunk_images": args.chunk_images,
+              "format": args.format, "track": args.track, "behaviors": not args.no_behaviors,
+              "backend": args.backend, "preprocess": args.preprocess}
+    manifest = load_manifest(args.out, config, args.restart)
+    todo = [c for c in chunks if c["id"] not in manifest["done"]
+            or not os.path.exists(part_path(args.out, c["id"], args.format))]
+    print(f"🎞️  {len(sources)} source, {len(chunks)} chunk — เสร็จแล้ว {len(chunks) - len(todo)}, "
+          f"เหลือ {len(todo)} ({args.workers} worker)")
+
+    opts = {"threads": args.threads, "backend": args.backend, "format": args.format,
+            "track": args.track, "behaviors": not args.no_behaviors, "batch": max(1, args.batch),
+            "preprocess": args.preprocess}
+    started = time.time()
+    total_rows = 0
+    if todo:
+        ctx = get_context("spawn")   # torch + fork ไม่ปลอดภัย
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(opts,)) as pool:
+            futures = {pool.submit(process_chunk, c, args.out): c for c in todo}
+            try:
+                for n, future in enumerate(as_completed(futures), 1):
+                    chunk = futures[future]
+                    try:
+                        chunk_id, rows, seconds = future.result()
+                    except Exception as e:
+                        print(f"⚠️  chunk {chunk['id']} ล้มเหลว: {e}")
+                        continue
+                    total_rows += rows
+                    manifest["done"][chunk_id] = {"path": chunk["path"], "rows": rows,
+                                                  "seconds": round(seconds, 2)}
+                    save_manifest(args.out, manifest)
+                    print(f"  ✅ [{n}/{len(todo)}] {chunk_id}: {rows} frame ใน {seconds:.1f}s")
+            except KeyboardInterrupt:
+                print("🛑 หยุด — chunk ที่เสร็จแล้วอยู่ใน checkpoint รันคำสั่งเดิมเพื่อทำต่อ")
+                for f in futures:
+                    f.cancel()
+                raise
+    save_manifest(args.out, manifest)
+
+    elapsed = time.time() - started
+    print(f"📊 วิเคราะห์ {total_rows} frame ใน {elapsed:.1f}s"
+          + (f" ({total_rows / elapsed:.2f} frame/s)" if elapsed > 0 and total_rows else ""))
+    missing = [c["id"] for c in chunks if c["id"] not in manifest["done"]]
+    if missing:
+        print(f"⚠️  ยังไม่เสร็จ {len(missing)} chunk — รันคำสั่งเดิมซ้ำเพื่อทำต่อ")
+        sys.exit(1)
+    if args.merge:
+        print(f"📦 รวมผลที่ {merge_parts(args.out, chunks, args.format)}")
+
+
+if __name__ == "__main__":
+    main()
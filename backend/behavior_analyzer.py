@@ -7,43 +7,116 @@
   - ใช้ yolov8s-pose (small) แทน nano ถ้ามี
   - Calibrate threshold สำหรับกล้องมุมสูงห้องแล็บ
 """
-from ultralytics import YOLO
 import numpy as np
 import cv2
 import os
+import threading
+import time
+
+from model_backend import load_model
+from tiling import merge_detections
 
 # ──────────────────────────────────────────────
 # โมเดล (lazy-loading)
 # ──────────────────────────────────────────────
 pose_model = None
 _MODEL_NAME = "yolov8s-pose.pt"   # small > nano (ดาวน์โหลดอัตโนมัติถ้ายังไม่มี)
+INFERENCE_BACKEND = "torch"       # "torch" | "onnx" | "openvino" | "openvino-int8" (ดู model_backend.py)
+_pose_model_lock = threading.Lock()   # warm-up thread กับ request แรกอาจเรียกพร้อมกัน — โหลดครั้งเดียว
 
 def get_pose_model():
     global pose_model
-    if pose_model is None:
+    if pose_model is not None:
+        return pose_model
+    with _pose_model_lock:
+        if pose_model is not None:
+            return pose_model
         base = os.path.dirname(os.path.abspath(__file__))
         small_path = os.path.join(base, _MODEL_NAME)
         nano_path  = os.path.join(base, "yolov8n-pose.pt")
         if os.path.exists(small_path):
-            pose_model = YOLO(small_path)
+            weights = small_path
         elif os.path.exists(nano_path):
             print("⚠️  yolov8s-pose.pt ไม่พบ — ใช้ yolov8n-pose.pt แทน")
-            pose_model = YOLO(nano_path)
+            weights = nano_path
         else:
-            pose_model = YOLO(_MODEL_NAME)   # ให้ ultralytics ดาวน์โหลดเอง
+            weights = _MODEL_NAME   # ให้ ultralytics ดาวน์โหลดเอง
+        pose_model = load_model(weights, INFERENCE_BACKEND, task="pose")
     return pose_model
 
 
 # ──────────────────────────────────────────────
 # Preprocessing
 # ──────────────────────────────────────────────
+# normalize แสง (หลายระดับในห้องเรียน) ก่อนเข้า pose model — เลือกได้ต่อกล้อง (analyze_frames(modes=...))
+#   "clahe"       : CLAHE บน L ของ LAB ที่ความละเอียด inference (ย่อเหลือ imgsz ก่อน) — ค่าเริ่มต้น
+#   "clahe_full"  : แบบเดิม — CLAHE บนเฟรมเต็มความละเอียด แล้วให้ YOLO ย่อเอง (ใช้เทียบผล)
+#   "clahe_ycrcb" : CLAHE บน Y ของ YCrCb ที่ความละเอียด inference (แปลงสีถูกกว่า LAB)
+#   "gamma"       : gamma ทั้งภาพจากความสว่างเฉลี่ย (LUT เดียว) — ถูกสุด ห้องแสงสม่ำเสมอ
+#   "none"        : ไม่ normalize
+PREPROCESS_MODES = ("clahe", "clahe_full", "clahe_ycrcb", "gamma", "none")
+PREPROCESS_MODE  = "clahe"
+CLAHE_CLIP       = 2.0
+CLAHE_GRID       = (8, 8)
+GAMMA_TARGET     = 0.5    # ความสว่างเฉลี่ย (0-1) ที่ gamma พยายามดึงเข้าหา
+_local = threading.local()   # CLAHE object ใช้ข้าม thread พร้อมกันไม่ได้ — หนึ่งตัวต่อ thread
+
+
+def _clahe():
+    clahe = getattr(_local, "clahe", None)
+    if clahe is None:
+        clahe = _local.clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP, tileGridSize=CLAHE_GRID)
+    return clahe
+
+
 def preprocess_frame(frame: np.ndarray) -> np.ndarray:
-    """CLAHE บน L-channel เพื่อ normalize แสงหลายระดับในห้องเรียน"""
+    """CLAHE บน L-channel เพื่อ normalize แสงหลายระดับในห้องเรียน (เต็มความละเอียด — โหมด "clahe_full")"""
     lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l = clahe.apply(l)
-    return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+    lab[..., 0] = _clahe().apply(np.ascontiguousarray(lab[..., 0]))
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+
+def _normalize(image: np.ndarray, mode: str) -> np.ndarray:
+    """normalize แสงของภาพที่ย่อแล้ว — คืนภาพใหม่ (ไม่แก้ภาพต้นฉบับ)"""
+    if mode == "clahe":
+        return preprocess_frame(image)
+    if mode == "clahe_ycrcb":
+        ycc = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
+        ycc[..., 0] = _clahe().apply(np.ascontiguousarray(ycc[..., 0]))
+        return cv2.cvtColor(ycc, cv2.COLOR_YCrCb2BGR)
+    if mode == "gamma":
+        mean = cv2.mean(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))[0] / 255.0
+        gamma = np.log(GAMMA_TARGET) / np.log(min(max(mean, 0.05), 0.95))
+        lut = np.clip(((np.arange(256) / 255.0) ** gamma) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+        return cv2.LUT(image, lut)
+    return image
+
+
+def prepare_image(image: np.ndarray, mode: str = None, imgsz: int = None) -> tuple:
+    """
+    ภาพ (เฟรม/ROI/tile) → ภาพที่ส่งเข้า pose model
+    ย่อด้านยาวเหลือ imgsz ก่อน (YOLO ย่อเหลือเท่านี้อยู่แล้ว) แล้วค่อย normalize บนภาพเล็ก
+    — ถูกกว่า normalize เต็มความละเอียดหลายเท่าสำหรับกล้อง 1080p/4K
+
+    Returns:
+        (ภาพ, (sx, sy)) — คูณพิกัดของผลลัพธ์ด้วย sx/sy เพื่อกลับเป็นพิกัดของภาพที่ส่งเข้ามา
+    """
+    mode = mode or PREPROCESS_MODE
+    if mode not in PREPROCESS_MODES:
+        raise ValueError(f"preprocess mode ไม่รองรับ: {mode} (เลือกจาก {PREPROCESS_MODES})")
+    if mode == "clahe_full":
+        return preprocess_frame(image), (1.0, 1.0)
+    h, w = image.shape[:2]
+    scale = (imgsz or _POSE_ARGS["imgsz"]) / max(h, w)
+    if scale < 1.0:
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        factors = (w / size[0], h / size[1])
+    else:
+        factors = (1.0, 1.0)
+    if mode == "none":
+        return np.ascontiguousarray(image), factors   # crop ของเฟรมที่ไม่ได้ย่อ
+    return _normalize(image, mode), factors
 
 
 # ──────────────────────────────────────────────
@@ -181,6 +254,25 @@ def _score_behavior(kp) -> dict:
     return scores
 
 
+def decide_behavior(scores: dict) -> tuple:
+    """เลือกพฤติกรรมจาก scores — คืน (behavior, confidence)"""
+    total = sum(scores.values())
+    if total < 1.0:
+        # signal น้อยเกินไป (keypoints ส่วนใหญ่ confidence ต่ำ / คนถูกบดบังมาก)
+        return "unknown", 0
+
+    best  = max(scores, key=scores.get)
+    best_score = scores[best]
+    confidence = min(97, int(round((best_score / total) * 100)))
+
+    # ถ้าคะแนนชนะไม่ชัดเจน ให้ fallback เป็น attentive (กรณี ambiguous)
+    sorted_vals = sorted(scores.values(), reverse=True)
+    if len(sorted_vals) > 1 and best_score - sorted_vals[1] < 0.5 and best != "attentive":
+        best       = "attentive"
+        confidence = max(40, confidence - 15)
+    return best, confidence
+
+
 def analyze_pose(keypoints) -> dict:
     """
     วิเคราะห์ท่าทางจาก keypoints ด้วย multi-signal scoring
@@ -191,23 +283,12 @@ def analyze_pose(keypoints) -> dict:
         return {"behavior": "unknown", "confidence": 0, "details": {}}
 
     scores = _score_behavior(keypoints)
-    total  = sum(scores.values())
+    best, confidence = decide_behavior(scores)
 
-    if total < 1.0:
-        # signal น้อยเกินไป (keypoints ส่วนใหญ่ confidence ต่ำ / คนถูกบดบังมาก)
+    if best == "unknown":
         return {"behavior": "unknown", "confidence": 0,
                 "details": {"scores": {k: round(v, 2) for k, v in scores.items()}}}
 
-    best  = max(scores, key=scores.get)
-    best_score = scores[best]
-    confidence = min(97, int(round((best_score / total) * 100)))
-
-    # ถ้าคะแนนชนะไม่ชัดเจน ให้ fallback เป็น attentive (กรณี ambiguous)
-    sorted_vals = sorted(scores.values(), reverse=True)
-    if len(sorted_vals) > 1 and best_score - sorted_vals[1] < 0.5 and best != "attentive":
-        best       = "attentive"
-        confidence = max(40, confidence - 15)
-
     visible_kp = int(sum(
         1 for kp in keypoints if len(kp) >= 3 and kp[2] >= KP_CONF_THRESHOLD
     ))
@@ -222,54 +303,314 @@ def analyze_pose(keypoints) -> dict:
     }
 
 
+# ──────────────────────────────────────────────
+# Vectorized scoring (ทุกคนในเฟรมพร้อมกัน)
+# ──────────────────────────────────────────────
+BEHAVIOR_KEYS = ("attentive", "looking_down", "sleeping", "looking_away")   # ลำดับเดียวกับ scores dict
+_ATT, _DOWN, _SLEEP, _AWAY = range(4)
+
+
+def _score_matrix(kpd: np.ndarray) -> np.ndarray:
+    """
+    เหมือน _score_behavior แต่คำนวณทุกคนพร้อมกันด้วย masked array operations
+
+    Args:
+        kpd: keypoints shape (N, K, 3), K >= 13
+    Returns:
+        scores shape (N, 4) เรียงตาม BEHAVIOR_KEYS (คลิปค่าลบแล้ว)
+    """
+    n      = len(kpd)
+    xy     = kpd[:, :, :2].astype(np.float64)
+    ok     = kpd[:, :, 2] >= KP_CONF_THRESHOLD
+    scores = np.zeros((n, 4))
+
+    def pt(name):
+        i = _KP_IDX[name]
+        return xy[:, i], ok[:, i]
+
+    def dist(a, b):
+        d = a - b
+        return np.sqrt((d * d).sum(axis=1))
+
+    nose, nose_ok = pt("nose")
+    le, le_ok     = pt("left_eye")
+    re, re_ok     = pt("right_eye")
+    ls, ls_ok     = pt("left_shoulder")
+    rs, rs_ok     = pt("right_shoulder")
+    lw, lw_ok     = pt("left_wrist")
+    rw, rw_ok     = pt("right_wrist")
+    lb, lb_ok     = pt("left_elbow")
+    rb, rb_ok     = pt("right_elbow")
+    lh, lh_ok     = pt("left_hip")
+    rh, rh_ok     = pt("right_hip")
+
+    sc, sc_ok = (ls + rs) / 2, ls_ok & rs_ok
+    hc, hc_ok = (lh + rh) / 2, lh_ok & rh_ok
+    sw = dist(ls, rs)
+    sw = np.where(sc_ok & (sw != 0), sw, 80.0)   # `_dist(...) or 80.0`
+
+    # S1: Head elevation ratio
+    m = nose_ok & sc_ok
+    r = (sc[:, 1] - nose[:, 1]) / sw
+    b1 = m & (r > 0.55)
+    b2 = m & ~b1 & (r > 0.30)
+    b3 = m & ~b1 & ~b2 & (r > 0.10)
+    b4 = m & ~b1 & ~b2 & ~b3 & (r > -0.10)
+    b5 = m & ~b1 & ~b2 & ~b3 & ~b4
+    scores[:, _ATT]   += 2.5 * b1 + 1.5 * b2
+    scores[:, _DOWN]  += 0.5 * b2 + 2.5 * b3 + 1.5 * b4
+    scores[:, _SLEEP] += 1.5 * b4 + 3.0 * b5
+
+    # S2: Trunk uprightness
+    m  = sc_ok & hc_ok
+    dy = sc[:, 1] - hc[:, 1]
+    scores[:, _SLEEP] += 2.0 * (m & (dy > 5))
+    scores[:, _ATT]   += 1.0 * (m & (dy < -20))
+
+    # S3: Eye separation ratio
+    m = le_ok & re_ok
+    r = dist(le, re) / sw
+    e1 = m & (r > 0.25)
+    e2 = m & ~e1 & (r > 0.12)
+    scores[:, _ATT]  += 2.0 * e1 + 0.5 * e2
+    scores[:, _AWAY] += 1.5 * (m & ~e1 & ~e2)
+
+    # S4: Ear symmetry
+    l_ear, r_ear = ok[:, 3], ok[:, 4]
+    scores[:, _ATT]  += 1.0 * (l_ear & r_ear)
+    scores[:, _AWAY] += 1.0 * (l_ear ^ r_ear)
+
+    # S5: Wrist-to-face proximity
+    face    = np.where(nose_ok[:, None], nose, (le + re) / 2)
+    face_ok = nose_ok | (le_ok & re_ok)
+    for w, w_ok in ((lw, lw_ok), (rw, rw_ok)):
+        m = face_ok & w_ok
+        d = dist(w, face)
+        r = np.where(d != 0, d, 9999) / sw   # `_dist(...) or 9999`
+        near = m & (r < 0.6)
+        mid  = m & ~near & (r < 1.0)
+        scores[:, _DOWN] += 2.0 * near + 0.5 * mid
+        scores[:, _ATT]  -= 0.5 * near
+
+    # S6: Elbow raised
+    for e, e_ok, sh, sh_ok in ((lb, lb_ok, ls, ls_ok), (rb, rb_ok, rs, rs_ok)):
+        scores[:, _DOWN] += 0.5 * (e_ok & sh_ok & (sh[:, 1] - e[:, 1] > 10))
+
+    return np.maximum(scores, 0.0)
+
+
+def score_behaviors(keypoints_data) -> list:
+    """
+    วิเคราะห์ท่าทางทุกคนในเฟรมพร้อมกัน — ผลเหมือน [analyze_pose(kp) for kp in keypoints_data]
+
+    Args:
+        keypoints_data: array shape (N, 17, 3) จาก results[0].keypoints.data
+    Returns:
+        list ของ {"behavior": str, "confidence": int, "details": dict}
+    """
+    kpd = np.asarray(keypoints_data)
+    if kpd.ndim != 3 or len(kpd) == 0:
+        return [analyze_pose(kp) for kp in kpd]
+    if kpd.shape[1] < 13:
+        return [{"behavior": "unknown", "confidence": 0, "details": {}} for _ in kpd]
+
+    scores  = _score_matrix(kpd)
+    visible = (kpd[:, :, 2] >= KP_CONF_THRESHOLD).sum(axis=1)
+
+    out = []
+    for i in range(len(kpd)):
+        row = dict(zip(BEHAVIOR_KEYS, scores[i].tolist()))
+        rounded = {k: round(v, 2) for k, v in row.items()}
+        best, confidence = decide_behavior(row)
+        if best == "unknown":
+            out.append({"behavior": "unknown", "confidence": 0,
+                        "details": {"scores": rounded}})
+            continue
+
+        out.append({
+            "behavior":   best,
+            "confidence": confidence,
+            "details": {
+                "scores":            rounded,
+                "visible_keypoints": int(visible[i]),
+            },
+        })
+    return out
+
+
 # ──────────────────────────────────────────────
 # Frame-level analysis
 # ──────────────────────────────────────────────
+_POSE_ARGS = dict(
+    verbose=False,
+    conf=0.35,   # detection confidence ต่ำลงเพื่อจับคนที่ถูกจอบดบัง
+    iou=0.45,    # NMS IoU ป้องกัน duplicate detection
+    imgsz=640,
+)
+
+
 def analyze_frame(frame: np.ndarray) -> dict:
     """
-    วิเคราะห์ภาพทั้งเฟรม พร้อม preprocessing และ annotated output
+    วิเคราะห์ภาพทั้งเฟรม พร้อม preprocessing
 
     Args:
         frame: BGR numpy array
     Returns:
-        dict: total_people, behaviors, summary, attention_rate, annotated_frame
+        dict: total_people, behaviors, summary, attention_rate, detections, keypoints, frame, timings
+        (ภาพ annotated วาดภายหลังด้วย render_annotated เมื่อมีคนขอภาพ)
     """
-    processed = preprocess_frame(frame)
+    return analyze_frames([frame])[0]
+
 
-    model   = get_pose_model()
-    results = model(
-        processed,
-        verbose=False,
-        conf=0.35,   # detection confidence ต่ำลงเพื่อจับคนที่ถูกจอบดบัง
-        iou=0.45,    # NMS IoU ป้องกัน duplicate detection
-        imgsz=640,
-    )
+def analyze_frames(frames: list, trackers: list = None, rois: list = None, layouts: list = None,
+                   modes: list = None) -> list:
+    """
+    วิเคราะห์หลายเฟรม (เช่นจากหลายกล้อง) ด้วย YOLO pose call เดียวแบบ batch
 
+    Args:
+        frames:   list ของ BGR numpy array (ขนาดต่างกันได้)
+        trackers: list ของ PersonTracker (หรือ None) ต่อเฟรม สำหรับ smoothing พฤติกรรมข้ามเฟรม
+        rois:     list ของ (x1, y1, x2, y2) หรือ None ต่อเฟรม — รัน pose เฉพาะส่วนนั้น (เช่นโซนที่นั่ง)
+                  พิกัดในผลลัพธ์เป็นของเฟรมเต็มเสมอ
+        layouts:  list ของ TileLayout (หรือ None) ต่อเฟรม — แบ่งเป็น tile ซ้อนกันแล้วรวมผลด้วย NMS ข้าม tile
+                  (ดู tiling.py) ทุก tile ของทุกเฟรมอยู่ใน batch เดียวกัน
+        modes:    list ของโหมด normalize แสง (หรือ None = PREPROCESS_MODE) ต่อเฟรม — ดู PREPROCESS_MODES
+                  โหมดที่ไม่ใช่ "clahe_full" normalize แต่ละ tile หลังย่อเหลือขนาด inference (prepare_image)
+    Returns:
+        list ของ dict แบบเดียวกับ analyze_frame เรียงตาม frames
+        + "timings": วินาทีของแต่ละขั้น {"preprocess", "inference", "scoring"} ต่อเฟรม
+          (inference ของทั้ง batch แบ่งตามสัดส่วนจำนวนภาพ/tile ของเฟรมนั้น)
+    """
+    if not frames:
+        return []
+    trackers = trackers or [None] * len(frames)
+    rois     = rois or [None] * len(frames)
+    layouts  = layouts or [None] * len(frames)
+    modes    = modes or [None] * len(frames)
+
+    images, owners = [], []   # owners[i] = (index ของเฟรม, offset ของภาพนั้นในเฟรมเต็ม, สเกลกลับ)
+    prep = []
+    for idx, (frame, roi, layout, mode) in enumerate(zip(frames, rois, layouts, modes)):
+        t0 = time.perf_counter()
+        mode = mode or PREPROCESS_MODE
+        x0, y0 = roi[:2] if roi else (0, 0)
+        region = frame if roi is None else frame[roi[1]:roi[3], roi[0]:roi[2]]
+        if mode == "clahe_full":
+            region = preprocess_frame(region)   # แบบเดิม: normalize ทั้งภาพก่อนแบ่ง tile
+        h, w = region.shape[:2]
+        for tx1, ty1, tx2, ty2 in (layout.tiles(w, h) if layout else [(0, 0, w, h)]):
+            if mode == "clahe_full":
+                image, scale = region[ty1:ty2, tx1:tx2], (1.0, 1.0)
+            else:
+                image, scale = prepare_image(region[ty1:ty2, tx1:tx2], mode)
+            images.append(image)
+            owners.append((idx, (x0 + tx1, y0 + ty1), scale))
+        prep.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    results = get_pose_model()(images, **_POSE_ARGS)
+    infer_share = (time.perf_counter() - t0) / len(images)
+
+    parts = [[] for _ in frames]
+    for (idx, offset, scale), result in zip(owners, results):
+        parts[idx].append(_result_arrays(result, offset, scale))
+    out = []
+    for idx, frame in enumerate(frames):
+        t0 = time.perf_counter()
+        keypoints_data, xyxy, confs = (np.concatenate(a) for a in zip(*parts[idx]))
+        if len(parts[idx]) > 1 and len(xyxy) == len(keypoints_data):
+            xyxy, confs, keypoints_data = merge_detections(xyxy, confs, keypoints_data)
+        analysis = _build_analysis(frame, keypoints_data, xyxy, confs, trackers[idx])
+        analysis["timings"] = {"preprocess": prep[idx],
+                               "inference":  infer_share * len(parts[idx]),
+                               "scoring":    time.perf_counter() - t0}
+        out.append(analysis)
+    return out
+
+
+def _result_arrays(result, offset=(0, 0), scale=(1.0, 1.0)) -> tuple:
+    """
+    YOLO result → (keypoints (N, 17, 3), xyxy (N, 4), confs (N,)) ในพิกัดเฟรมเต็ม
+    offset (x, y): result มาจากภาพที่ crop/tile — เลื่อนกล่อง/keypoints กลับเป็นพิกัดของเฟรมเต็ม
+    scale (sx, sy): result มาจากภาพที่ถูกย่อ (prepare_image) — ขยายพิกัดกลับก่อนเลื่อน
+    """
+    empty = (np.empty((0, 17, 3), dtype=np.float32), np.empty((0, 4), dtype=np.float32),
+             np.empty(0, dtype=np.float32))
+    if result is None or result.keypoints is None:
+        return empty
+    keypoints_data = result.keypoints.data.cpu().numpy()
+    # ไม่พบคน ultralytics คืน keypoints shape (1, 0, 51) — ถือว่าว่าง ไม่ใช่ unknown 1 คน
+    if len(keypoints_data) == 0 or keypoints_data.shape[1] == 0:
+        return empty
+    boxes = result.boxes
+    if boxes is not None and len(boxes) > 0:
+        xyxy  = boxes.xyxy.cpu().numpy()
+        confs = boxes.conf.cpu().numpy()
+    else:
+        xyxy, confs = empty[1], empty[2]
+    if scale != (1.0, 1.0):
+        keypoints_data = keypoints_data.copy()
+        keypoints_data[..., 0] *= scale[0]
+        keypoints_data[..., 1] *= scale[1]
+        xyxy = xyxy * (scale[0], scale[1], scale[0], scale[1])
+    if offset != (0, 0):
+        keypoints_data = keypoints_data.copy()
+        keypoints_data[..., 0] += offset[0]
+        keypoints_data[..., 1] += offset[1]
+        xyxy = xyxy + (offset[0], offset[1], offset[0], offset[1])
+    return keypoints_data, xyxy, confs
+
+
+def _build_analysis(frame: np.ndarray, keypoints_data, xyxy, confs, tracker=None) -> dict:
+    """
+    แปลงผล pose ของหนึ่งเฟรมเป็น dict ผลวิเคราะห์ (ไม่วาดภาพ — ดู render_annotated)
+    กล่องของ pose model ใช้นับคน/ความมั่นใจแทน detection model แยก (detections, avg_confidence)
+    ถ้ามี tracker จะใช้พฤติกรรมที่ smooth ข้ามเฟรมแล้ว (พร้อม track_id) แทนผลเฟรมเดียว
+    """
     _empty = {
         "total_people": 0,
         "behaviors": [],
         "summary": {"attentive": 0, "sleeping": 0,
                     "looking_down": 0, "looking_away": 0, "unknown": 0},
         "attention_rate": 0,
-        "annotated_frame": frame,
+        "detections": [],
+        "avg_confidence": 0,
+        "keypoints": None,
+        "frame": frame,
     }
 
-    if not results or results[0].keypoints is None:
+    if len(keypoints_data) == 0:
+        if tracker is not None:
+            tracker.update([], [])   # ให้ track เดิมนับ missed
         return _empty
 
-    keypoints_data = results[0].keypoints.data.cpu().numpy()
-    boxes          = results[0].boxes
+    detections = [{"box": [float(v) for v in b], "conf": float(c)}
+                  for b, c in zip(xyxy, confs)]
+    avg_confidence = (round(sum(d["conf"] for d in detections) / len(detections) * 100, 2)
+                      if detections else 0)
 
-    if len(keypoints_data) == 0:
-        return _empty
+    behaviors = score_behaviors(keypoints_data)
+    if tracker is not None:
+        behaviors = tracker.update(detections, behaviors)
+    behavior_counts, attention_rate = summarize_behaviors(behaviors)
+    total_people = len(behaviors)
 
-    behaviors      = []
+    return {
+        "total_people":    total_people,
+        "behaviors":       behaviors,
+        "summary":         behavior_counts,
+        "attention_rate":  attention_rate,
+        "detections":      detections,
+        "avg_confidence":  avg_confidence,
+        "keypoints":       keypoints_data,
+        "frame":           frame,
+    }
+
+
+def summarize_behaviors(behaviors: list) -> tuple:
+    """นับจำนวนคนต่อพฤติกรรม — คืน (summary, attention_rate)"""
     behavior_counts = {"attentive": 0, "sleeping": 0,
                        "looking_down": 0, "looking_away": 0, "unknown": 0}
-
-    for kp in keypoints_data:
-        analysis = analyze_pose(kp)
-        behaviors.append(analysis)
+    for analysis in behaviors:
         beh = analysis["behavior"]
         if beh in behavior_counts:
             behavior_counts[beh] += 1
@@ -277,53 +618,111 @@ def analyze_frame(frame: np.ndarray) -> dict:
     total_people    = len(behaviors)
     attentive_count = behavior_counts["attentive"]
     attention_rate  = round((attentive_count / total_people) * 100, 1) if total_people else 0
+    return behavior_counts, attention_rate
 
-    # ── Annotated frame ──────────────────────────────────────────
-    annotated_frame = results[0].plot(conf=False, labels=False)
 
-    _COLOR = {
-        "attentive":    ( 50, 205,  50),  # เขียว
-        "sleeping":     (  0,   0, 220),  # แดง
-        "looking_down": (  0, 140, 255),  # ส้ม
-        "looking_away": (  0, 200, 200),  # เหลือง
-        "unknown":      (180, 180, 180),  # เทา
-    }
+_COLOR = {
+    "attentive":    ( 50, 205,  50),  # เขียว
+    "sleeping":     (  0,   0, 220),  # แดง
+    "looking_down": (  0, 140, 255),  # ส้ม
+    "looking_away": (  0, 200, 200),  # เหลือง
+    "unknown":      (180, 180, 180),  # เทา
+}
 
-    if boxes is not None and len(boxes) > 0:
-        for box, beh in zip(boxes, behaviors):
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            color  = _COLOR.get(beh["behavior"], (180, 180, 180))
-            label  = get_behavior_label_th(beh["behavior"])
-            conf_t = beh["confidence"]
-
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-
-            text = f"{label} {conf_t}%"
-            (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 2)
-            label_y = max(y1 - 5, th + 5)
-            cv2.rectangle(annotated_frame,
-                          (x1, label_y - th - 4), (x1 + tw + 4, label_y + 2),
-                          color, cv2.FILLED)
-            cv2.putText(annotated_frame, text, (x1 + 2, label_y),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 2)
+
+# COCO-17 skeleton (index ของ keypoint) และสีแบบ ultralytics: หัว / แขน+ลำตัว / ขา
+_SKELETON = [(15, 13), (13, 11), (16, 14), (14, 12), (11, 12), (5, 11), (6, 12), (5, 6), (5, 7),
+             (6, 8), (7, 9), (8, 10), (1, 2), (0, 1), (0, 2), (1, 3), (2, 4), (3, 5), (4, 6)]
+_LIMB_COLOR = [(255, 128, 0)] * 4 + [(255, 51, 255)] * 3 + [(0, 128, 255)] * 5 + [(51, 255, 51)] * 7
+_KPT_COLOR  = [(51, 255, 51)] * 5 + [(0, 128, 255)] * 6 + [(255, 128, 0)] * 6
+
+
+def _scale_detections(detections: list, scale: float) -> list:
+    if scale == 1.0:
+        return detections
+    return [{**d, "box": [v * scale for v in d["box"]]} for d in detections]
+
+
+def render_annotated(analysis: dict) -> np.ndarray:
+    """
+    วาดภาพ annotated จากผลวิเคราะห์: skeleton + กรอบ/label พฤติกรรม + HUD
+    เรียกเฉพาะตอนมีคนขอภาพ — consumer ที่ใช้แค่ JSON ไม่ต้องจ่ายค่าวาด
+    "frame_scale" (ถ้ามี): analysis["frame"] เป็นเฟรมย่อ — ย่อพิกัดกล่อง/keypoints ตามก่อนวาด
+    """
+    frame = analysis["frame"]
+    if not analysis["behaviors"]:
+        return frame
+    scale = analysis.get("frame_scale", 1.0)
+    out = frame.copy()
+    if analysis.get("keypoints") is not None:
+        keypoints = analysis["keypoints"]
+        draw_skeleton(out, keypoints if scale == 1.0 else keypoints * (scale, scale, 1.0))
+    return draw_behaviors(out, _scale_detections(analysis["detections"], scale), analysis["behaviors"],
+                          analysis["summary"], analysis["attention_rate"])
+
+
+def draw_skeleton(img: np.ndarray, keypoints_data: np.ndarray) -> np.ndarray:
+    """วาดเส้น skeleton + จุด keypoint ที่ confidence ≥ KP_CONF_THRESHOLD (in-place)"""
+    for kpts in keypoints_data:
+        if len(kpts) < 17:
+            continue
+        visible = kpts[:, 2] >= KP_CONF_THRESHOLD
+        pts = kpts[:, :2].astype(int)
+        for (a, b), color in zip(_SKELETON, _LIMB_COLOR):
+            if visible[a] and visible[b]:
+                cv2.line(img, tuple(pts[a]), tuple(pts[b]), color, 2, cv2.LINE_AA)
+        for i, color in enumerate(_KPT_COLOR):
+            if visible[i]:
+                cv2.circle(img, tuple(pts[i]), 4, color, -1, cv2.LINE_AA)
+    return img
+
+
+def draw_behaviors(annotated_frame: np.ndarray, detections: list, behaviors: list,
+                   behavior_counts: dict, attention_rate) -> np.ndarray:
+    """วาดกรอบ + label พฤติกรรมต่อคน และ HUD bar ลงบน annotated_frame (in-place)"""
+    for det, beh in zip(detections, behaviors):
+        x1, y1, x2, y2 = map(int, det["box"])
+        color  = _COLOR.get(beh["behavior"], (180, 180, 180))
+        label  = get_behavior_label_th(beh["behavior"])
+        conf_t = beh["confidence"]
+
+        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+
+        text = f"{label} {conf_t}%"
+        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 2)
+        label_y = max(y1 - 5, th + 5)
+        cv2.rectangle(annotated_frame,
+                      (x1, label_y - th - 4), (x1 + tw + 4, label_y + 2),
+                      color, cv2.FILLED)
+        cv2.putText(annotated_frame, text, (x1 + 2, label_y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 2)
 
     # ── HUD bar ──────────────────────────────────────────────────
     h, w = annotated_frame.shape[:2]
     hud = (f"Attention {attention_rate}%  |  "
-           f"Students: {total_people}  |  "
+           f"Students: {len(behaviors)}  |  "
            f"Sleeping: {behavior_counts['sleeping']}  |  "
            f"Phone/Down: {behavior_counts['looking_down']}")
     cv2.rectangle(annotated_frame, (0, h - 32), (w, h), (30, 30, 30), cv2.FILLED)
     cv2.putText(annotated_frame, hud, (8, h - 10),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.55, (220, 220, 220), 1)
-
-    return {
-        "total_people":    total_people,
-        "behaviors":       behaviors,
-        "summary":         behavior_counts,
-        "attention_rate":  attention_rate,
-        "annotated_frame": annotated_frame,
-    }
+    return annotated_frame
+
+
+def draw_detections(frame: np.ndarray, detections: list, scale: float = 1.0) -> np.ndarray:
+    """วาดกรอบคน + confidence แบบ /api/frame เดิม จาก detections ของ analyze_frame (scale: ดู render_annotated)"""
+    out = frame.copy()
+    for det in _scale_detections(detections, scale):
+        x1, y1, x2, y2 = map(int, det["box"])
+        text = f"person {det['conf']:.2f}"
+        cv2.rectangle(out, (x1, y1), (x2, y2), (255, 56, 56), 2)
+        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 1)
+        label_y = max(y1 - 5, th + 5)
+        cv2.rectangle(out, (x1, label_y - th - 4), (x1 + tw + 4, label_y + 2),
+                      (255, 56, 56), cv2.FILLED)
+        cv2.putText(out, text, (x1 + 2, label_y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1)
+    return out
 
 
 # ──────────────────────────────────────────────
@@ -0,0 +1,103 @@
+"""
+📏 Baseline ของ benchmark — สรุป percentile แล้วเทียบกับผลที่บันทึกไว้ (benchmarks/baseline.json)
+ใช้ร่วมกันระหว่าง bench_stages.py และ load_test.py (แต่ละ script เก็บใน section ของตัวเอง)
+baseline ขึ้นกับเครื่องและ argument — บันทึกด้วย --save-baseline บนเครื่องที่ใช้เทียบ แล้วรัน --check ด้วย argument เดิม
+"""
+import json
+import os
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TOLERANCE     = 1.25   # ช้ากว่า baseline เกิน 25% = regression
+MIN_DELTA_MS  = 0.5    # ต่างกันน้อยกว่านี้ไม่นับ (noise ของ micro-benchmark)
+COMPARED      = ("p50", "p95")   # p99 แกว่งเกินไปสำหรับจำนวนรอบสั้น ๆ — แสดงแต่ไม่ใช้ตัดสิน
+
+
+def summarize(samples_ms, seconds=None) -> dict:
+    """latency (ms) → {n, p50, p95, p99, mean} (+ rate ต่อวินาทีถ้าให้ระยะเวลาที่วัด)"""
+    values = sorted(samples_ms)
+    if not values:
+        return {"n": 0}
+
+    def pct(p):
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    out = {"n": len(values), "p50": round(pct(50), 3), "p95": round(pct(95), 3),
+           "p99": round(pct(99), 3), "mean": round(sum(values) / len(values), 3)}
+    if seconds:
+        out["rate"] = round(len(values) / seconds, 2)
+    return out
+
+
+def print_table(results, title):
+    print(f"\n{title}")
+    print(f"{'name':<28} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rate/s':>9}")
+    for name, r in results.items():
+        if not r.get("n"):
+            print(f"{name:<28} {0:>6}")
+            continue
+        rate = f"{r['rate']:>9.1f}" if "rate" in r else f"{'':>9}"
+        print(f"{name:<28} {r['n']:>6} {r['p50']:>9.2f} {r['p95']:>9.2f} {r['p99']:>9.2f} {rate}")
+
+
+def load(path=BASELINE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(section, results, path=BASELINE_FILE):
+    data = load(path)
+    data[section] = results
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+    print(f"💾 บันทึก baseline [{section}] → {path}")
+
+
+def compare(section, results, path=BASELINE_FILE, tolerance=TOLERANCE) -> list:
+    """
+    คืน list ของข้อความ regression (ว่าง = ผ่าน)
+    latency (p50/p95) ต้องไม่เกิน baseline × tolerance, rate (throughput) ต้องไม่ต่ำกว่า baseline / tolerance
+    """
+    baseline = load(path).get(section)
+    if not baseline:
+        print(f"⚠️  ไม่มี baseline [{section}] ใน {path} — รันด้วย --save-baseline ก่อน")
+        return []
+    failures = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if not current or not current.get("n"):
+            print(f"⚠️  {name}: ไม่มีผลในรอบนี้ — ข้าม")
+            continue
+        for key in COMPARED:
+            if key in base and current[key] > base[key] * tolerance and current[key] - base[key] > MIN_DELTA_MS:
+                failures.append(f"{name} {key}: {current[key]:.2f} ms (baseline {base[key]:.2f})")
+        if "rate" in base and "rate" in current and current["rate"] < base["rate"] / tolerance:
+            failures.append(f"{name} rate: {current['rate']:.1f}/s (baseline {base['rate']:.1f})")
+        if current.get("errors", 0) > base.get("errors", 0):
+            failures.append(f"{name} errors: {current['errors']} (baseline {base.get('errors', 0)})")
+    return failures
+
+
+def report(section, results, args):
+    """จัดการ --save-baseline / --check ให้ทุก script — คืน exit code"""
+    if args.save_baseline:
+        save(section, results, args.baseline)
+        return 0
+    if args.check:
+        failures = compare(section, results, args.baseline, args.tolerance)
+        if failures:
+            print(f"\n❌ regression {len(failures)} รายการ (tolerance {args.tolerance:.2f}x):")
+            for line in failures:
+                print("  -", line)
+            return 1
+        print(f"\n✅ ไม่มี regression เทียบกับ baseline [{section}]")
+    return 0
+
+
+def add_arguments(parser):
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="ไฟล์ baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="บันทึกผลรอบนี้เป็น baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 ถ้าช้ากว่า baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="สัดส่วนที่ยอมให้ช้าลง")
@@ -0,0 +1,84 @@
+"""
+⏱️ Benchmark: เทียบ inference backend (torch / onnx / openvino / openvino-int8)
+วัด latency ต่อภาพ และ parity ของจำนวนคน + การกระจายพฤติกรรมเทียบกับ PyTorch บน backend/test_images/
+
+    cd backend
+    python benchmarks/bench_backends.py --backends torch onnx openvino --rounds 5
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+import cv2
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import behavior_analyzer  # noqa: E402
+from behavior_analyzer import analyze_frame  # noqa: E402
+from model_backend import BACKENDS, load_model  # noqa: E402
+
+
+def load_test_images():
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, "test_images", "*.[pP][nN][gG]")))
+    return [(os.path.basename(p), cv2.imread(p)) for p in paths]
+
+
+def default_weights():
+    for name in ("yolov8s-pose.pt", "yolov8n-pose.pt"):
+        path = os.path.join(BACKEND_DIR, name)
+        if os.path.exists(path):
+            return path
+    return "yolov8s-pose.pt"
+
+
+def run_backend(backend, weights, images, rounds):
+    """คืน (latencies ms ต่อภาพ, {ชื่อภาพ: (total_people, summary)})"""
+    behavior_analyzer.pose_model = load_model(weights, backend, task="pose")
+    for _, frame in images:
+        analyze_frame(frame)   # warm-up
+    latencies, outputs = [], {}
+    for _ in range(rounds):
+        for name, frame in images:
+            t0 = time.perf_counter()
+            result = analyze_frame(frame)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            outputs[name] = (result["total_people"], result["summary"])
+    return latencies, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], choices=BACKENDS)
+    parser.add_argument("--weights", default=default_weights())
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    images = [(n, f) for n, f in load_test_images() if f is not None]
+    if not images:
+        print("❌ ไม่พบภาพใน test_images/")
+        sys.exit(1)
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    results = {b: run_backend(b, args.weights, images, args.rounds) for b in backends}
+    _, reference = results["torch"]
+
+    print(f"\n{'backend':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'people Δ':>10}{'behavior Δ':>12}")
+    for backend, (lat, outputs) in results.items():
+        lat = sorted(lat)
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+        people_diff = sum(abs(outputs[n][0] - reference[n][0]) for n in reference)
+        beh_diff = sum(
+            abs(outputs[n][1][k] - reference[n][1][k])
+            for n in reference for k in reference[n][1]
+        )
+        print(f"{backend:<15}{statistics.mean(lat):>10.1f}{statistics.median(lat):>10.1f}"
+              f"{p95:>10.1f}{people_diff:>10}{beh_diff:>12}")
+    print("\nΔ = ผลต่างรวมทุกภาพเทียบกับ torch (จำนวนคน / จำนวนคนต่อพฤติกรรม)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+⏱️ Benchmark: analyze_frame ทีละภาพ vs analyze_frames แบบ batch
+ใช้ภาพใน backend/test_images/ จำลองเป็นหลายกล้อง แล้ววัด throughput (frames/second) บน CPU
+
+    cd backend
+    python benchmarks/bench_batch.py --cameras 4 --rounds 5
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from behavior_analyzer import analyze_frame, analyze_frames, get_pose_model  # noqa: E402
+
+
+def load_test_images():
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, "test_images", "*.[pP][nN][gG]")))
+    frames = [cv2.imread(p) for p in paths]
+    return [f for f in frames if f is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cameras", type=int, default=4, help="จำนวนกล้องจำลองต่อ batch")
+    parser.add_argument("--rounds", type=int, default=5, help="จำนวนรอบที่วัด")
+    args = parser.parse_args()
+
+    images = load_test_images()
+    if not images:
+        print("❌ ไม่พบภาพใน test_images/")
+        sys.exit(1)
+    frames = [images[i % len(images)] for i in range(args.cameras)]
+
+    get_pose_model()
+    analyze_frames(frames)   # warm-up
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for f in frames:
+            analyze_frame(f)
+    seq = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        analyze_frames(frames)
+    bat = time.perf_counter() - t0
+
+    n = args.cameras * args.rounds
+    print(f"📷 {args.cameras} กล้อง x {args.rounds} รอบ = {n} frames")
+    print(f"  sequential : {n / seq:6.2f} frames/s  ({seq / n * 1000:7.1f} ms/frame)")
+    print(f"  batched    : {n / bat:6.2f} frames/s  ({bat / n * 1000:7.1f} ms/frame)")
+    print(f"  speedup    : {seq / bat:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+⏱️ Benchmark: โหมด normalize แสง (PREPROCESS_MODES) — latency เทียบกับความต่างจากผลแบบเดิม ("clahe_full")
+ต่อโหมดวัด: เวลา normalize อย่างเดียว, เวลา analyze ทั้งเฟรม, PSNR ของภาพเทียบภาพ CLAHE เต็มความละเอียด (ย่อขนาดเท่ากัน),
+recall/precision ของกล่องคนและ attention rate ที่เปลี่ยนไปเทียบผลของ "clahe_full"
+--gains จำลองห้องที่แสงต่างกัน (คูณความสว่างของภาพ) — โหมดถูก ๆ มักต่างจากเดิมมากขึ้นในห้องมืด
+
+    cd backend
+    python benchmarks/bench_preprocess.py --rounds 5
+    python benchmarks/bench_preprocess.py --images "/data/lab_4k/*.jpg" --gains 1.0 0.5 0.3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from behavior_analyzer import PREPROCESS_MODES, analyze_frames, get_pose_model, prepare_image  # noqa: E402
+from bench_tiling import boxes_of, load_images, recall  # noqa: E402
+
+REFERENCE = "clahe_full"
+
+
+def with_gains(images, gains):
+    """ภาพละหนึ่งชุดต่อ gain — gain 1.0 ใช้ภาพเดิม"""
+    out = []
+    for gain in gains:
+        for name, frame in images:
+            if gain == 1.0:
+                out.append((name, frame))
+            else:
+                out.append((f"{name}@{gain:g}", cv2.convertScaleAbs(frame, alpha=gain)))
+    return out
+
+
+def psnr(image, reference):
+    if reference.shape != image.shape:
+        reference = cv2.resize(reference, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_AREA)
+    return cv2.PSNR(image, reference)
+
+
+def run_mode(images, mode, rounds):
+    """คืน (ms normalize, ms analyze, {ชื่อภาพ: ผลวิเคราะห์}) — ทุกภาพ ทุกรอบ"""
+    for _, frame in images:
+        analyze_frames([frame], modes=[mode])   # warm-up
+    prep, total, results = [], [], {}
+    for _ in range(rounds):
+        for name, frame in images:
+            t0 = time.perf_counter()
+            prepare_image(frame, mode)
+            prep.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            results[name] = analyze_frames([frame], modes=[mode])[0]
+            total.append((time.perf_counter() - t0) * 1000)
+    return prep, total, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="glob ของภาพ (ค่าเริ่มต้น backend/test_images/)")
+    parser.add_argument("--modes", nargs="+", choices=PREPROCESS_MODES, default=list(PREPROCESS_MODES))
+    parser.add_argument("--gains", nargs="+", type=float, default=[1.0, 0.4],
+                        help="ตัวคูณความสว่างที่ใช้จำลองแสงในห้อง")
+    parser.add_argument("--rounds", type=int, default=3, help="จำนวนรอบที่วัด")
+    args = parser.parse_args()
+
+    images = with_gains(load_images(args.images), args.gains)
+    if not images:
+        print("❌ ไม่พบภาพ")
+        sys.exit(1)
+
+    get_pose_model()
+    modes = [REFERENCE] + [m for m in args.modes if m != REFERENCE]
+    ref_images = {name: prepare_image(frame, REFERENCE)[0] for name, frame in images}
+    reference = None
+    h, w = images[0][1].shape[:2]
+    print(f"🖼️  {len(images)} ภาพ ({w}x{h}, gain {args.gains}), {args.rounds} รอบ — เทียบกับ {REFERENCE}")
+    print(f"{'mode':<12} {'prep ms':>8} {'analyze ms':>11} {'PSNR dB':>8} {'recall':>7} {'precision':>10} "
+          f"{'Δattention':>11}")
+    for mode in modes:
+        prep, total, results = run_mode(images, mode, args.rounds)
+        if reference is None:
+            reference = results
+        ref_boxes = {n: boxes_of(reference[n]) for n, _ in images}
+        boxes = {n: boxes_of(results[n]) for n, _ in images}
+        n_ref = sum(len(b) for b in ref_boxes.values())
+        n_pred = sum(len(b) for b in boxes.values())
+        rec = (sum(recall(boxes[n], ref_boxes[n]) * len(ref_boxes[n]) for n, _ in images) / n_ref
+               if n_ref else 1.0)
+        prec = (sum(recall(ref_boxes[n], boxes[n]) * len(boxes[n]) for n, _ in images) / n_pred
+                if n_pred else 1.0)
+        d_att = statistics.mean(abs(results[n]["attention_rate"] - reference[n]["attention_rate"])
+                                for n, _ in images)
+        quality = statistics.mean(min(psnr(prepare_image(f, mode)[0], ref_images[n]), 99.0) for n, f in images)
+        print(f"{mode:<12} {statistics.median(prep):>8.2f} {statistics.median(total):>11.1f} {quality:>8.1f} "
+              f"{rec:>7.3f} {prec:>10.3f} {d_att:>10.1f}%")
+
+
+if __name__ == "__main__":
+    main()
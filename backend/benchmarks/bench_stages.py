@@ -0,0 +1,161 @@
+"""
+⏱️ Benchmark: แต่ละขั้นของ pipeline — preprocess, inference, scoring, annotate, JPEG encode, stats store
+ภาพจาก backend/test_images/ และ keypoints สังเคราะห์ (ไม่ต้องมีคนในภาพก็วัด scoring ได้)
+เทียบกับ baseline: --save-baseline บันทึก, --check exit 1 เมื่อช้ากว่า baseline เกิน --tolerance
+
+    cd backend
+    python benchmarks/bench_stages.py --rounds 20
+    python benchmarks/bench_stages.py --no-model --check
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import baseline  # noqa: E402
+import behavior_analyzer  # noqa: E402
+from behavior_analyzer import (_score_behavior, analyze_frame, get_pose_model,  # noqa: E402
+                               prepare_image, preprocess_frame, render_annotated, score_behaviors,
+                               summarize_behaviors)
+from stats_store import StatsStore  # noqa: E402
+
+# ท่านั่งตัวตรงใน box ขนาด 1x1 (ลำดับ keypoint แบบ COCO 17 จุด)
+_POSE_TEMPLATE = np.array([
+    [0.50, 0.15], [0.47, 0.12], [0.53, 0.12], [0.44, 0.13], [0.56, 0.13],   # จมูก ตา หู
+    [0.38, 0.30], [0.62, 0.30], [0.33, 0.45], [0.67, 0.45], [0.40, 0.55],   # ไหล่ ศอก ข้อมือ
+    [0.60, 0.55], [0.42, 0.60], [0.58, 0.60], [0.40, 0.80], [0.60, 0.80],   # ข้อมือ สะโพก เข่า
+    [0.40, 0.98], [0.60, 0.98],                                              # ข้อเท้า
+], dtype=np.float32)
+
+
+def load_images():
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, "test_images", "*.[pP][nN][gG]")))
+    frames = [cv2.imread(p) for p in paths]
+    return [f for f in frames if f is not None]
+
+
+def synthetic_keypoints(n, width=1280, height=720, seed=0) -> np.ndarray:
+    """(n, 17, 3) — ท่าหลากหลาย (ก้มหัว/หันข้าง/หัวตก) ตำแหน่งและ confidence สุ่ม"""
+    rng = np.random.default_rng(seed)
+    out = np.empty((n, 17, 3), dtype=np.float32)
+    for i in range(n):
+        pose = _POSE_TEMPLATE + rng.normal(0, 0.02, _POSE_TEMPLATE.shape)
+        pose[:5, 1] += rng.uniform(-0.05, 0.30)   # หัวก้มลงต่ำกว่าไหล่ได้
+        pose[:5, 0] += rng.uniform(-0.12, 0.12)   # หันซ้าย/ขวา
+        size = rng.uniform(80, 300)
+        x0, y0 = rng.uniform(0, width - size), rng.uniform(0, height - size)
+        out[i, :, 0] = x0 + pose[:, 0] * size
+        out[i, :, 1] = y0 + pose[:, 1] * size
+        out[i, :, 2] = rng.uniform(0.2, 1.0, 17)
+    return out
+
+
+def timed(fn, rounds, warmup=2):
+    """เรียก fn() rounds ครั้ง — คืน (latency ms list, วินาทีรวม)"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples, time.perf_counter() - started
+
+
+def bench_stats_store(rounds, rows):
+    """record_stats (แค่เข้าคิว) ต่อแถว และ commit หนึ่ง batch ของ rows แถว (flush รอ writer thread)"""
+    summary = {"attentive": 10, "sleeping": 1, "looking_down": 3, "looking_away": 2, "unknown": 0}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StatsStore(os.path.join(tmp, "bench.db"))
+        record, commit = [], []
+        ts = time.time()
+        for _ in range(rounds):
+            for _ in range(rows):
+                ts += 1
+                t0 = time.perf_counter()
+                store.record_stats("bench", ts, 62.5, 16, summary)
+                record.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            store.flush()
+            commit.append((time.perf_counter() - t0) * 1000)
+        store.flush()
+    return record, commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20, help="จำนวนรอบต่อขั้น")
+    parser.add_argument("--people", type=int, default=30, help="จำนวนคนสังเคราะห์ต่อเฟรม")
+    parser.add_argument("--stats-rows", type=int, default=50, help="แถวต่อ commit ของ stats store")
+    parser.add_argument("--no-model", action="store_true", help="ข้ามขั้นที่ต้องใช้ pose model")
+    baseline.add_arguments(parser)
+    args = parser.parse_args()
+
+    images = load_images()
+    if not images:
+        print("❌ ไม่พบภาพใน test_images/")
+        sys.exit(1)
+    h, w = images[0].shape[:2]
+    kpd = synthetic_keypoints(args.people, w, h)
+    cycle = {"i": 0}
+
+    def next_image():
+        cycle["i"] += 1
+        return images[cycle["i"] % len(images)]
+
+    results = {}
+
+    def run(name, fn, per=1):
+        samples, seconds = timed(fn, args.rounds)
+        if per > 1:   # รายงานต่อหน่วย (เช่น ต่อคน)
+            samples = [s / per for s in samples]
+        results[name] = baseline.summarize(samples, seconds / per if per > 1 else seconds)
+
+    run("preprocess_frame", lambda: preprocess_frame(next_image()))
+    run(f"prepare_image ({behavior_analyzer.PREPROCESS_MODE})", lambda: prepare_image(next_image()))
+    run("score_behavior (per person)", lambda: [_score_behavior(k) for k in kpd], per=len(kpd))
+    run(f"score_behaviors ({len(kpd)} people)", lambda: score_behaviors(kpd))
+
+    # ผลวิเคราะห์สังเคราะห์สำหรับ annotate/encode — ไม่ขึ้นกับว่า model เจอคนหรือไม่
+    detections = [{"box": [float(k[:, 0].min()), float(k[:, 1].min()),
+                           float(k[:, 0].max()), float(k[:, 1].max())], "conf": 0.8} for k in kpd]
+    behaviors = score_behaviors(kpd)
+    summary, attention_rate = summarize_behaviors(behaviors)
+    analysis = {"frame": images[0], "keypoints": kpd, "detections": detections, "behaviors": behaviors,
+                "summary": summary, "attention_rate": attention_rate}
+    annotated = render_annotated(analysis)
+    run("render_annotated", lambda: render_annotated(analysis))
+    run("jpeg_encode", lambda: cv2.imencode(".jpg", annotated))
+
+    if not args.no_model:
+        model = get_pose_model()
+        pre = [prepare_image(f)[0] for f in images]
+        pre_cycle = {"i": 0}
+
+        def infer():
+            pre_cycle["i"] += 1
+            model(pre[pre_cycle["i"] % len(pre)], **behavior_analyzer._POSE_ARGS)
+
+        run("pose_inference", infer)
+        run("analyze_frame", lambda: analyze_frame(next_image()))
+
+    record, commit = bench_stats_store(max(3, args.rounds // 4), args.stats_rows)
+    results["stats_record (enqueue)"] = baseline.summarize(record)
+    results[f"stats_commit ({args.stats_rows} rows)"] = baseline.summarize(commit)
+
+    print(f"🖼️  {len(images)} ภาพ {w}x{h}, {len(kpd)} คนสังเคราะห์, {args.rounds} รอบ")
+    baseline.print_table(results, "⏱️  stage latency")
+    sys.exit(baseline.report("stages", results, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+⏱️ Benchmark: tiled inference vs ภาพทั้งเฟรม — recall เทียบกับ latency ต่อภาพ
+ground truth จาก --labels (JSON {"ชื่อภาพ": [[x1, y1, x2, y2], ...]}) ถ้ามี
+ไม่มีใช้ pseudo-label จาก pose model เดียวกันที่ imgsz สูง (--ref-imgsz) บนภาพทั้งเฟรม
+
+    cd backend
+    python benchmarks/bench_tiling.py --layouts 2x2 2x3 3x4 --rounds 3
+    python benchmarks/bench_tiling.py --images "/data/lab_4k/*.jpg" --labels labels.json
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import behavior_analyzer  # noqa: E402
+from behavior_analyzer import analyze_frames, get_pose_model  # noqa: E402
+from tiling import TileLayout  # noqa: E402
+
+MATCH_IOU = 0.5
+
+
+def load_images(pattern):
+    pattern = pattern or os.path.join(BACKEND_DIR, "test_images", "*.[pP][nN][gG]")
+    paths = sorted(glob.glob(pattern))
+    images = [(os.path.basename(p), cv2.imread(p)) for p in paths]
+    return [(n, f) for n, f in images if f is not None]
+
+
+def parse_layout(text):
+    """"2x3" หรือ "2x3@0.25" (overlap) → TileLayout"""
+    grid, _, overlap = text.partition("@")
+    rows, cols = (int(v) for v in grid.lower().split("x"))
+    return TileLayout(rows, cols, float(overlap) if overlap else 0.2)
+
+
+def boxes_of(result):
+    return np.array([d["box"] for d in result["detections"]], dtype=np.float64).reshape(-1, 4)
+
+
+def recall(pred, truth):
+    """สัดส่วนของกล่อง truth ที่จับคู่ (IoU ≥ MATCH_IOU แบบ greedy หนึ่งต่อหนึ่ง) กับ pred ได้"""
+    if len(truth) == 0:
+        return 1.0
+    if len(pred) == 0:
+        return 0.0
+    x1 = np.maximum(truth[:, None, 0], pred[None, :, 0])
+    y1 = np.maximum(truth[:, None, 1], pred[None, :, 1])
+    x2 = np.minimum(truth[:, None, 2], pred[None, :, 2])
+    y2 = np.minimum(truth[:, None, 3], pred[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_t = (truth[:, 2] - truth[:, 0]) * (truth[:, 3] - truth[:, 1])
+    area_p = (pred[:, 2] - pred[:, 0]) * (pred[:, 3] - pred[:, 1])
+    iou = inter / (area_t[:, None] + area_p[None, :] - inter)
+    matched = 0
+    while iou.size and iou.max() >= MATCH_IOU:
+        r, c = np.unravel_index(np.argmax(iou), iou.shape)
+        matched += 1
+        iou[r, :] = -1
+        iou[:, c] = -1
+    return matched / len(truth)
+
+
+def reference_boxes(images, labels, ref_imgsz):
+    if labels:
+        return {name: np.array(labels.get(name, []), dtype=np.float64).reshape(-1, 4)
+                for name, _ in images}
+    saved = behavior_analyzer._POSE_ARGS["imgsz"]
+    behavior_analyzer._POSE_ARGS["imgsz"] = ref_imgsz
+    try:
+        return {name: boxes_of(analyze_frames([frame])[0]) for name, frame in images}
+    finally:
+        behavior_analyzer._POSE_ARGS["imgsz"] = saved
+
+
+def run_mode(images, layout, rounds):
+    """คืน (latencies ms ต่อภาพ, {ชื่อภาพ: กล่อง})"""
+    layouts = [layout]
+    for _, frame in images:
+        analyze_frames([frame], None, None, layouts)   # warm-up
+    latencies, boxes = [], {}
+    for _ in range(rounds):
+        for name, frame in images:
+            t0 = time.perf_counter()
+            result = analyze_frames([frame], None, None, layouts)[0]
+            latencies.append((time.perf_counter() - t0) * 1000)
+            boxes[name] = boxes_of(result)
+    return latencies, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="glob ของภาพ (ค่าเริ่มต้น backend/test_images/)")
+    parser.add_argument("--labels", help="JSON ของกล่องคนจริงต่อภาพ")
+    parser.add_argument("--layouts", nargs="+", default=["2x2", "2x3", "3x4"],
+                        help="tile layout แบบ ROWSxCOLS[@OVERLAP]")
+    parser.add_argument("--no-full-frame", action="store_true",
+                        help="ไม่ส่งภาพทั้งเฟรมเพิ่มใน tiled mode")
+    parser.add_argument("--ref-imgsz", type=int, default=1920, help="imgsz ของ pseudo-label")
+    parser.add_argument("--rounds", type=int, default=3, help="จำนวนรอบที่วัด")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        print("❌ ไม่พบภาพ")
+        sys.exit(1)
+    labels = None
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+
+    get_pose_model()
+    truth = reference_boxes(images, labels, args.ref_imgsz)
+    n_truth = sum(len(b) for b in truth.values())
+    source = "labels" if labels else f"pseudo-label imgsz={args.ref_imgsz}"
+    print(f"🖼️  {len(images)} ภาพ, {n_truth} คน ({source}), imgsz={behavior_analyzer._POSE_ARGS['imgsz']}")
+
+    modes = [("full-frame", None)]
+    for text in args.layouts:
+        layout = parse_layout(text)
+        layout.full_frame = not args.no_full_frame
+        modes.append((f"tiles {text}", layout))
+
+    print(f"{'mode':<16} {'tiles':>5} {'recall':>7} {'people':>7} {'median ms':>10} {'p95 ms':>8}")
+    for label, layout in modes:
+        latencies, boxes = run_mode(images, layout, args.rounds)
+        w_recall = sum(recall(boxes[n], truth[n]) * len(truth[n]) for n, _ in images)
+        rec = w_recall / n_truth if n_truth else 1.0
+        people = sum(len(b) for b in boxes.values())
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        h, w = images[0][1].shape[:2]
+        tiles = len(layout.tiles(w, h)) if layout else 1
+        print(f"{label:<16} {tiles:>5} {rec * 100:>6.1f}% {people:>7} "
+              f"{statistics.median(latencies):>10.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+✅ Parity check: score_behaviors (vectorized) vs analyze_pose (ทีละคน)
+ตรวจว่า output เหมือนกันทุก field บน keypoints จริงจาก backend/test_images/
+และ keypoints สังเคราะห์แบบสุ่ม พร้อมรายงานเวลาที่ใช้ — exit code 1 ถ้าไม่ตรงกัน
+หรือถ้าภาพไม่มีคนที่ตรวจได้เลย (ภาพที่ไม่เจอคนถูกข้าม ไม่นับว่าตรงกัน)
+
+    cd backend
+    python benchmarks/check_scoring_parity.py
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from behavior_analyzer import (  # noqa: E402
+    _POSE_ARGS, analyze_pose, get_pose_model, preprocess_frame, score_behaviors,
+)
+
+
+def image_keypoints():
+    """keypoints (N, 17, 3) ของแต่ละภาพใน test_images — ไม่เจอคน keypoints เป็น None หรือ shape (1, 0, 51)"""
+    out = []
+    for path in sorted(glob.glob(os.path.join(BACKEND_DIR, "test_images", "*.[pP][nN][gG]"))):
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        result = get_pose_model()(preprocess_frame(frame), **_POSE_ARGS)[0]
+        kpd = result.keypoints.data.cpu().numpy() if result.keypoints is not None else None
+        if kpd is not None and (len(kpd) == 0 or kpd.shape[1] == 0):
+            kpd = None
+        out.append((os.path.basename(path), kpd))
+    return out
+
+
+def synthetic_keypoints(n, seed):
+    """คนสุ่ม n คน — confidence กระจายรอบ threshold ให้ทุก branch ถูกใช้"""
+    rng = np.random.default_rng(seed)
+    xy   = rng.uniform(0, 640, size=(n, 17, 2))
+    conf = rng.uniform(0.0, 1.0, size=(n, 17, 1))
+    kpd  = np.concatenate([xy, conf], axis=2).astype(np.float32)
+    # คนกลุ่มหนึ่งให้ท่าทางสมจริง (ไหล่กว้าง ~80px) เพื่อครอบคลุม threshold ของแต่ละ signal
+    base = rng.uniform(100, 500, size=(n // 2, 1, 2))
+    kpd[: n // 2, :, :2] = (base + rng.normal(0, 60, size=(n // 2, 17, 2))).astype(np.float32)
+    return kpd
+
+
+def compare(name, kpd):
+    expected = [analyze_pose(kp) for kp in kpd]
+    actual   = score_behaviors(kpd)
+    bad = [i for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+    if len(expected) != len(actual) or bad:
+        print(f"  ❌ {name}: ไม่ตรงกัน {len(bad)}/{len(expected)} คน")
+        for i in bad[:3]:
+            print(f"     [{i}] expected={expected[i]}\n         actual  ={actual[i]}")
+        return False
+    print(f"  ✅ {name}: ตรงกัน {len(expected)} คน")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=5000, help="จำนวนคนสังเคราะห์")
+    parser.add_argument("--no-images", action="store_true", help="ข้ามภาพ test_images (ไม่โหลดโมเดล)")
+    args = parser.parse_args()
+
+    ok = True
+    if not args.no_images:
+        compared = 0
+        for name, kpd in image_keypoints():
+            if kpd is None:
+                print(f"  ⏭️  {name}: ไม่พบคน — ข้าม")
+                continue
+            ok &= compare(name, kpd)
+            compared += len(kpd)
+        if compared == 0:
+            print("  ❌ ไม่มีคนจากภาพที่ตรวจได้เลย — ส่วนภาพไม่ได้เทียบอะไร (ใช้ --no-images ถ้าตั้งใจข้าม)")
+            ok = False
+
+    kpd = synthetic_keypoints(args.people, seed=0)
+    ok &= compare(f"synthetic x{args.people}", kpd)
+
+    frame = kpd[:40]   # ห้องแล็บ 40 ที่นั่ง
+    t0 = time.perf_counter()
+    for _ in range(200):
+        [analyze_pose(kp) for kp in frame]
+    per_person = (time.perf_counter() - t0) / 200
+    t0 = time.perf_counter()
+    for _ in range(200):
+        score_behaviors(frame)
+    vectorized = (time.perf_counter() - t0) / 200
+    print(f"⏱️ 40 คน/เฟรม: per-person {per_person * 1000:.2f} ms, "
+          f"vectorized {vectorized * 1000:.2f} ms ({per_person / vectorized:.1f}x)")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+🔥 Load test: จำลอง N dashboard + M MJPEG viewer ยิง server — p50/p95/p99 latency และ throughput ต่อ endpoint
+dashboard ทำตาม dashboard/shared.js: ตอนเปิดห้องโหลด overview/stats/activities/data/behavior + เปิด SSE
+แล้วโหลด /api/behavior-frame ใหม่ทุก 2 วินาที; viewer เปิด /api/stream?annotated=1 ค้างไว้
+ค่าเริ่มต้นรัน server ใน process นี้ด้วย pose model จำลอง (--stub-ms ต่อภาพ) + วิดีโอสังเคราะห์จาก test_images
+เพื่อวัด overhead ของ server เอง; --url ยิง server ที่รันอยู่จริงแทน (ใช้ source ที่ตั้งไว้แล้ว)
+
+    cd backend
+    python benchmarks/load_test.py --dashboards 20 --viewers 5 --duration 30
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --dashboards 10 --check
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import baseline  # noqa: E402
+from bench_stages import load_images, synthetic_keypoints  # noqa: E402
+
+CAMERAS          = [("9226", 1), ("9226", 2), ("9227", 1), ("9227", 2)]
+FEED_INTERVAL    = 2.0    # วินาที — setInterval(refreshFeedImage, 2000) ใน shared.js
+REQUEST_TIMEOUT  = 30.0
+MJPEG_BOUNDARY   = b"--frame"
+
+
+# ─── Stub model ───────────────────────────────────────────────────────────────
+class _Tensor:
+    def __init__(self, array):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+
+class _StubKeypoints:
+    def __init__(self, kpd):
+        self.data = _Tensor(kpd)
+
+
+class _StubBoxes:
+    def __init__(self, kpd):
+        self.xyxy = _Tensor(np.stack([kpd[..., 0].min(1), kpd[..., 1].min(1),
+                                      kpd[..., 0].max(1), kpd[..., 1].max(1)], axis=1))
+        self.conf = _Tensor(np.full(len(kpd), 0.8, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.conf.numpy())
+
+
+class _StubResult:
+    """เฉพาะส่วนที่ behavior_analyzer._result_arrays อ่านจาก ultralytics Results"""
+
+    def __init__(self, kpd):
+        self.keypoints = _StubKeypoints(kpd)
+        self.boxes     = _StubBoxes(kpd)
+
+
+class StubPoseModel:
+    """แทน YOLO pose — หน่วงเวลา latency ต่อภาพ แล้วคืนคนสังเคราะห์ people คน (ใช้ CPU น้อยมาก)"""
+
+    def __init__(self, latency_ms, people):
+        self.latency = latency_ms / 1000
+        self.people  = people
+        self._cache  = {}
+        self._lock   = threading.Lock()   # inference จริงก็รันทีละ call
+
+    def __call__(self, images, **kwargs):
+        images = images if isinstance(images, list) else [images]
+        with self._lock:
+            time.sleep(self.latency * len(images))
+        out = []
+        for img in images:
+            h, w = img.shape[:2]
+            if (w, h) not in self._cache:
+                self._cache[(w, h)] = synthetic_keypoints(self.people, w, h)
+            out.append(_StubResult(self._cache[(w, h)]))
+        return out
+
+
+def start_local_server(args):
+    """server.py ใน thread ของ process นี้ + stub model + stats store ชั่วคราว — คืน (base url, tmp dir)"""
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import behavior_analyzer
+    behavior_analyzer.pose_model = StubPoseModel(args.stub_ms, args.people)
+    import server
+    from stats_store import StatsStore
+
+    tmp = tempfile.TemporaryDirectory()
+    server.stats_store = StatsStore(os.path.join(tmp.name, "stats.db"))
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)   # ไม่ log ทุก request
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_port}", tmp
+
+
+def write_video(path, seconds=10, fps=10):
+    """วิดีโอสังเคราะห์จากภาพใน test_images (ขยับเล็กน้อยทุก frame ให้ change gating เห็นว่าเปลี่ยน)"""
+    images = load_images()
+    h, w = images[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    for i in range(seconds * fps):
+        frame = cv2.resize(images[(i // fps) % len(images)], (w, h))
+        writer.write(np.roll(frame, i * 4, axis=1))
+    writer.release()
+
+
+# ─── Client ───────────────────────────────────────────────────────────────────
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors  = {}
+        self.lock    = threading.Lock()
+
+    def add(self, name, ms, ok):
+        with self.lock:
+            self.samples.setdefault(name, [])
+            self.errors.setdefault(name, 0)
+            if ok:
+                self.samples[name].append(ms)
+            else:
+                self.errors[name] += 1
+
+    def results(self, seconds):
+        out = {}
+        for name in sorted(self.samples):
+            out[name] = baseline.summarize(self.samples[name], seconds)
+            out[name]["errors"] = self.errors[name]
+        return out
+
+
+class Client:
+    def __init__(self, base_url, recorder):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = recorder
+
+    def connect(self, timeout=REQUEST_TIMEOUT):
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def get(self, path, name, method="GET", body=None):
+        conn = self.connect()
+        t0 = time.perf_counter()
+        ok, data = False, None
+        try:
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            ok = resp.status < 400
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+        self.recorder.add(name, (time.perf_counter() - t0) * 1000, ok)
+        return data if ok else None
+
+
+def dashboard(client, lab, cam, stop, events):
+    """หนึ่งแท็บของ dashboard ที่เปิดห้อง lab กล้อง cam"""
+    sse = threading.Thread(target=sse_listener, args=(client, lab, stop, events), daemon=True)
+    sse.start()
+    client.get("/api/overview", "GET /api/overview")
+    client.get(f"/api/stats/{lab}", "GET /api/stats")
+    client.get(f"/api/activities/{lab}", "GET /api/activities")
+    client.get(f"/api/data/{lab}/{cam}", "GET /api/data")
+    client.get(f"/api/behavior/{lab}/{cam}", "GET /api/behavior")
+    stop.wait(random.uniform(0, FEED_INTERVAL))   # แต่ละแท็บเปิดไม่พร้อมกัน
+    next_due = time.monotonic()
+    while not stop.is_set():
+        client.get(f"/api/behavior-frame/{lab}/{cam}?t={int(time.time() * 1000)}", "GET /api/behavior-frame")
+        next_due += FEED_INTERVAL
+        stop.wait(max(0.0, next_due - time.monotonic()))
+
+
+def sse_listener(client, lab, stop, events):
+    conn = client.connect(timeout=None)   # thread เป็น daemon — ค้างรอ event ตอนจบได้
+    try:
+        conn.request("GET", f"/api/events?labs={lab}")
+        resp = conn.getresponse()
+        while not stop.is_set():
+            line = resp.fp.readline()
+            if not line:
+                break
+            if line.startswith(b"event:"):
+                with events["lock"]:
+                    events["count"] += 1
+    except (OSError, http.client.HTTPException):
+        with events["lock"]:
+            events["errors"] += 1
+    finally:
+        conn.close()
+
+
+def mjpeg_viewer(client, lab, cam, stop, recorder):
+    """นับ frame จาก multipart stream — บันทึกเวลาถึง frame แรกและช่วงห่างระหว่าง frame"""
+    conn = client.connect(timeout=10.0)
+    t0 = time.perf_counter()
+    last, tail = None, b""
+    try:
+        conn.request("GET", f"/api/stream/{lab}/{cam}?annotated=1")
+        resp = conn.getresponse()
+        if resp.status >= 400:
+            recorder.add("MJPEG first frame", 0, False)
+            return
+        while not stop.is_set():
+            chunk = resp.read1(65536)
+            if not chunk:
+                break
+            data = tail + chunk
+            for _ in range(data.count(MJPEG_BOUNDARY)):
+                now = time.perf_counter()
+                if last is None:
+                    recorder.add("MJPEG first frame", (now - t0) * 1000, True)
+                else:
+                    recorder.add("MJPEG frame gap", (now - last) * 1000, True)
+                last = now
+            tail = data[-(len(MJPEG_BOUNDARY) - 1):]
+    except (OSError, http.client.HTTPException):
+        if not stop.is_set():
+            recorder.add("MJPEG first frame" if last is None else "MJPEG frame gap", 0, False)
+    finally:
+        conn.close()
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="server ที่รันอยู่แล้ว (ไม่ระบุ = รันใน process นี้ด้วย stub model)")
+    parser.add_argument("--dashboards", type=int, default=10, help="จำนวนแท็บ dashboard")
+    parser.add_argument("--viewers", type=int, default=4, help="จำนวน MJPEG viewer")
+    parser.add_argument("--duration", type=float, default=20, help="วินาทีที่วัด")
+    parser.add_argument("--stub-ms", type=float, default=30, help="latency ของ stub model ต่อภาพ")
+    parser.add_argument("--people", type=int, default=20, help="คนสังเคราะห์ต่อภาพของ stub model")
+    parser.add_argument("--analysis-fps", type=float, default=2.0, help="เพดาน analysis fps ของ source จำลอง")
+    baseline.add_arguments(parser)
+    args = parser.parse_args()
+
+    tmp = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        base_url, tmp = start_local_server(args)
+        video = os.path.join(tmp.name, "synthetic.avi")
+        write_video(video)
+        setup = Client(base_url, Recorder())
+        for lab, cam in CAMERAS:
+            if setup.get(f"/api/sources/{lab}/{cam}", "setup", "POST",
+                         {"source": video, "analysis_fps": args.analysis_fps}) is None:
+                print(f"❌ ตั้ง source {lab}/{cam} ไม่ได้")
+                sys.exit(1)
+        time.sleep(2.0)   # ให้ capture/analysis worker เริ่มมีผล
+    print(f"🔥 {base_url}: {args.dashboards} dashboard, {args.viewers} MJPEG viewer, {args.duration:.0f}s"
+          + ("" if args.url else f" (stub model {args.stub_ms:.0f} ms/ภาพ)"))
+
+    recorder = Recorder()
+    client = Client(base_url, recorder)
+    stop = threading.Event()
+    events = {"count": 0, "errors": 0, "lock": threading.Lock()}
+    threads = []
+    for i in range(args.dashboards):
+        lab, cam = CAMERAS[i % len(CAMERAS)]
+        threads.append(threading.Thread(target=dashboard, args=(client, lab, cam, stop, events), daemon=True))
+    for i in range(args.viewers):
+        lab, cam = CAMERAS[i % len(CAMERAS)]
+        threads.append(threading.Thread(target=mjpeg_viewer, args=(client, lab, cam, stop, recorder),
+                                        daemon=True))
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    try:
+        stop.wait(args.duration)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for t in threads:
+        t.join(timeout=2.0)
+
+    results = recorder.results(elapsed)
+    baseline.print_table(results, "📈 latency ต่อ endpoint")
+    errors = {n: r["errors"] for n, r in results.items() if r["errors"]}
+    print(f"\n📣 SSE events: {events['count']} ({events['count'] / elapsed:.1f}/s), "
+          f"connection errors: {events['errors']}")
+    if errors:
+        print(f"⚠️  errors: {errors}")
+    if tmp is not None:
+        tmp.cleanup()
+    sys.exit(baseline.report("load", results, args))
+
+
+if __name__ == "__main__":
+    main()
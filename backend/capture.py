@@ -0,0 +1,258 @@
+"""
+🎥 Capture Source - อ่านภาพจากกล้อง (webcam / ไฟล์วิดีโอ / RTSP / HTTP) ลง FrameRing
+  - reconnect อัตโนมัติพร้อม exponential backoff เมื่อเปิดไม่ได้หรือสตรีมหลุด
+  - grab() ทุก frame (ไม่ให้ buffer ของ RTSP ค้างจนภาพช้ากว่าจริง) แต่ retrieve() (decode) เฉพาะ
+    frame ที่ต้องใช้ตาม decode_fps — frame ที่เหลือทิ้งโดยไม่ decode
+  - max_width: ย่อภาพทันทีหลัง decode (webcam ขอความละเอียดต่ำจากอุปกรณ์ตั้งแต่แรก) ก่อนเข้า ring
+  - ขอ hardware decode (CAP_PROP_HW_ACCELERATION) ถ้า OpenCV รองรับ — เปิดไม่ได้ก็กลับไปใช้ software
+  - stats(): fps_in (grab), fps_decoded, drops, errors, reconnects, state, decode_seconds (เวลา decode+ย่อรวม)
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+
+RECONNECT_MIN   = 1.0    # วินาที — backoff แรกหลังหลุด
+RECONNECT_MAX   = 30.0   # วินาที — backoff สูงสุด
+MAX_GRAB_ERRORS = 50     # webcam: grab ไม่สำเร็จติดกันเท่านี้ (~1s) ถือว่าหลุด → reconnect
+NET_GRAB_ERRORS = 3      # สตรีมเครือข่าย: แต่ละครั้งรอ READ_TIMEOUT_MS มาแล้ว
+OPEN_TIMEOUT_MS = 5000   # timeout ตอนเปิด/อ่านสตรีมเครือข่าย (backend FFMPEG)
+READ_TIMEOUT_MS = 5000
+FILE_FPS        = 30.0   # อัตราเล่นไฟล์วิดีโอเมื่อไฟล์ไม่บอก fps
+RATE_WINDOW     = 5.0    # วินาที — หน้าต่างคำนวณ fps ใน stats
+
+
+def source_kind(source) -> str:
+    """"webcam" | "network" (rtsp/http) | "file" """
+    if isinstance(source, int):
+        return "webcam"
+    if str(source).lower().startswith(("rtsp://", "rtsps://", "http://", "https://", "rtmp://", "udp://")):
+        return "network"
+    return "file"
+
+
+class _RateMeter:
+    def __init__(self):
+        self._times = deque()
+
+    def tick(self, now):
+        self._times.append(now)
+        while self._times and now - self._times[0] > RATE_WINDOW:
+            self._times.popleft()
+
+    def rate(self, now):
+        while self._times and now - self._times[0] > RATE_WINDOW:
+            self._times.popleft()
+        if len(self._times) < 2:
+            return 0.0
+        return (len(self._times) - 1) / max(now - self._times[0], 1e-6)
+
+
+class CaptureSource:
+    """
+    Args:
+        source:     int (webcam index) หรือ str (path ไฟล์ / URL rtsp:// http://)
+        ring:       FrameRing ปลายทาง
+        decode_fps: decode สูงสุดกี่ frame ต่อวินาที (None = ทุก frame)
+        max_width:  ย่อให้กว้างไม่เกินนี้ (None = ขนาดเดิม)
+        hw_accel:   ขอ hardware decode ถ้ามี
+    """
+
+    def __init__(self, source, ring, decode_fps=None, max_width=None, hw_accel=True, name=""):
+        self.source     = source
+        self.ring       = ring
+        self.decode_fps = decode_fps
+        self.max_width  = max_width
+        self.hw_accel   = hw_accel
+        self.name       = name or str(source)
+        self.kind       = source_kind(source)
+        self.running    = False
+        self.state      = "stopped"   # connecting | streaming | backoff | stopped
+        self._thread    = None
+        self._wake      = threading.Event()   # ปลุกจาก backoff ตอน stop
+        self._in        = _RateMeter()
+        self._decoded   = _RateMeter()
+        self.frames_in  = 0
+        self.frames_decoded = 0
+        self.drops      = 0     # grab แล้วไม่ decode (เกิน decode_fps)
+        self.errors     = 0     # grab/retrieve ไม่สำเร็จ
+        self.reconnects = 0
+        self.decode_seconds = 0.0   # เวลารวมที่ใช้ retrieve + ย่อ (ไม่รวม grab)
+        self.last_error = None
+        self.last_frame_ts = None
+        self.resolution = None  # (w, h) หลังย่อ
+        self.source_fps = None
+        self.hw         = False
+        self._shape     = None    # ขนาดที่ decode ได้ล่าสุด (ก่อนย่อ)
+        self._resized   = False
+
+    # ─── Lifecycle ──────────────────────────────────────────────
+    def start(self):
+        self.running = True
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"capture-{self.name}")
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        self._wake.set()
+        t = self._thread
+        if t and t.is_alive() and t is not threading.current_thread():
+            t.join(timeout)
+
+    def _open(self):
+        """เปิด VideoCapture — ลอง hardware decode ก่อน (ถ้าเปิด) แล้วค่อย software"""
+        attempts = []
+        if self.kind != "webcam":
+            params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, OPEN_TIMEOUT_MS,
+                      cv2.CAP_PROP_READ_TIMEOUT_MSEC, READ_TIMEOUT_MS]
+            if self.hw_accel and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+                attempts.append((cv2.CAP_FFMPEG, params + [cv2.CAP_PROP_HW_ACCELERATION,
+                                                           cv2.VIDEO_ACCELERATION_ANY], True))
+            attempts.append((cv2.CAP_FFMPEG, params, False))
+        attempts.append((cv2.CAP_ANY, None, False))
+
+        for api, params, hw in attempts:
+            try:
+                if params:
+                    cap = cv2.VideoCapture(self.source, api, params)
+                else:
+                    cap = cv2.VideoCapture(self.source, api)
+            except cv2.error:
+                continue
+            if cap.isOpened():
+                # ขอ hw แล้วแต่ backend อาจ fallback เป็น software เอง — ดูค่าที่ได้จริง
+                self.hw = hw and cap.get(cv2.CAP_PROP_HW_ACCELERATION) > 0
+                if self.kind == "webcam" and self.max_width:
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.max_width)   # ขอขนาดเล็กจากอุปกรณ์เลย
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                self.source_fps = fps if fps and 0 < fps < 240 else None
+                return cap
+            cap.release()
+        return None
+
+    # ─── Loop ───────────────────────────────────────────────────
+    def _run(self):
+        backoff = RECONNECT_MIN
+        first = True
+        while self.running:
+            self.state = "connecting"
+            cap = self._open()
+            if cap is None:
+                self.last_error = "open failed"
+                print(f"⚠️  เปิด {self.name} ไม่ได้ — ลองใหม่ใน {backoff:.1f}s")
+            else:
+                if not first:
+                    self.reconnects += 1
+                print(f"🎥 เปิด {self.kind} {self.name} → {self.source}{' (hw decode)' if self.hw else ''}")
+                streamed = self._stream(cap)
+                cap.release()
+                if streamed:
+                    backoff = RECONNECT_MIN   # เคยได้ภาพแล้ว — เริ่ม backoff ใหม่
+            first = False
+            if not self.running:
+                break
+            self.state = "backoff"
+            self._wake.wait(backoff)
+            backoff = min(RECONNECT_MAX, backoff * 2)
+        self.state = "stopped"
+        self.ring.wake_all()
+        print(f"🛑 ปิด {self.kind} {self.name}")
+
+    def _stream(self, cap) -> bool:
+        """อ่านจน stop / สตรีมหลุด — คืน True ถ้าได้ภาพอย่างน้อยหนึ่ง frame"""
+        self.state = "streaming"
+        got_frame = False
+        rewound = False
+        fail_streak = 0
+        last_decode = 0.0
+        pace = 1.0 / (self.source_fps or FILE_FPS) if self.kind == "file" else 0.0
+        next_due = time.monotonic()
+        while self.running:
+            if not cap.grab():
+                if self.kind == "file" and got_frame and not rewound:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)   # วนซ้ำตั้งแต่ต้น
+                    rewound = True
+                    continue
+                self.errors += 1
+                fail_streak += 1
+                limit = NET_GRAB_ERRORS if self.kind == "network" else MAX_GRAB_ERRORS
+                if self.kind == "file" or fail_streak >= limit:
+                    self.last_error = "stream ended" if self.kind == "file" else "grab failed"
+                    return got_frame
+                time.sleep(0.02)
+                continue
+            rewound = False
+            fail_streak = 0
+            now = time.monotonic()
+            self.frames_in += 1
+            self._in.tick(now)
+
+            if self.decode_fps and now - last_decode < 1.0 / self.decode_fps:
+                self.drops += 1   # ไม่ decode — frame นี้ไม่มีใครใช้
+            elif self._decode(cap):
+                last_decode = now
+                got_frame = True
+            if pace:
+                # ไฟล์อ่านได้เร็วกว่าเวลาจริง — เล่นตาม fps ของไฟล์
+                next_due += pace
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_due = time.monotonic()
+        return got_frame
+
+    def _decode(self, cap) -> bool:
+        """retrieve (+ ย่อ) ลง slot ถัดไปของ ring — ไม่ allocate ต่อ frame เมื่อรู้ขนาดแล้ว"""
+        t0 = time.perf_counter()
+        slot = self.ring.next_slot(self._shape) if self._shape and not self._resized else None
+        ok, frame = cap.retrieve(slot)
+        if not ok or frame is None:
+            self.errors += 1
+            return False
+        h, w = frame.shape[:2]
+        if self.max_width and w > self.max_width:
+            size = (self.max_width, int(round(h * self.max_width / w)))
+            out = self.ring.next_slot((size[1], size[0]) + frame.shape[2:], frame.dtype)
+            cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_AREA)
+            self.ring.commit()
+            self._resized = True
+            self.resolution = size
+        else:
+            if frame is slot:
+                self.ring.commit()       # decode ลง slot แล้ว — ไม่ต้อง copy
+            else:
+                self.ring.write(frame)   # frame แรก / ขนาดเปลี่ยน — copy ครั้งเดียวแล้วใช้ slot ต่อ
+            self._resized = False
+            self.resolution = (w, h)
+        self._shape = frame.shape
+        self.decode_seconds += time.perf_counter() - t0
+        self.frames_decoded += 1
+        self.last_frame_ts = time.time()
+        self._decoded.tick(time.monotonic())
+        return True
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "source":         self.source,
+            "kind":           self.kind,
+            "state":          self.state,
+            "hw_decode":      self.hw,
+            "source_fps":     round(self.source_fps, 2) if self.source_fps else None,
+            "fps_in":         round(self._in.rate(now), 2),
+            "fps_decoded":    round(self._decoded.rate(now), 2),
+            "frames_in":      self.frames_in,
+            "frames_decoded": self.frames_decoded,
+            "drops":          self.drops,
+            "errors":         self.errors,
+            "reconnects":     self.reconnects,
+            "decode_seconds": round(self.decode_seconds, 3),
+            "last_error":     self.last_error,
+            "last_frame_age": round(time.time() - self.last_frame_ts, 2) if self.last_frame_ts else None,
+            "resolution":     list(self.resolution) if self.resolution else None,
+            "decode_fps":     self.decode_fps,
+            "max_width":      self.max_width,
+        }
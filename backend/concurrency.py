@@ -0,0 +1,159 @@
+"""
+🚦 Concurrency helpers
+  - BoundedExecutor : thread pool ขนาดคงที่ + คิวรับงานจำกัด — เต็มแล้ว raise Saturated (ให้ API ตอบ 503)
+  - SingleFlight    : คำนวณครั้งเดียวเมื่อมีหลาย request ขอ key เดียวกันพร้อมกัน
+  - AsyncWaiters    : ปลุก coroutine ที่รออยู่ใน event loop จาก thread ธรรมดา (ใช้กับ stream ในโหมด ASGI)
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Saturated(Exception):
+    """executor รับงานเพิ่มไม่ได้ — ให้ client ลองใหม่หลัง retry_after วินาที"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Args:
+        max_workers: จำนวนงานที่รันพร้อมกันได้
+        max_queue:   จำนวนงานที่รอคิวได้เพิ่มจาก max_workers
+        retry_after: วินาทีที่แนะนำให้ client รอเมื่อเต็ม (Retry-After)
+    """
+
+    def __init__(self, max_workers=2, max_queue=8, retry_after=2, name="inference"):
+        self.max_workers = max_workers
+        self.max_queue   = max_queue
+        self.retry_after = retry_after
+        self._pool       = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock       = threading.Lock()
+        self._pending    = 0
+        self.submitted   = 0
+        self.rejected    = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """คืน Future — raise Saturated ถ้างานที่รัน + รอคิวเต็มแล้ว"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Saturated(self.retry_after)
+            self._pending  += 1
+            self.submitted += 1
+        future = self._pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """submit แล้ว block รอผล (ใช้จาก request thread ของ Flask)"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _done(self, _):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue":   self.max_queue,
+            "pending":     self._pending,
+            "submitted":   self.submitted,
+            "rejected":    self.rejected,
+        }
+
+
+class AsyncWaiters:
+    """ชุดของ asyncio.Event ที่ notify_all() ปลุกได้จากทุก thread"""
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._waiters = {}   # {asyncio.Event: loop}
+
+    def register(self) -> asyncio.Event:
+        """ต้องเรียกจากใน event loop — ลงทะเบียนก่อนเช็คเงื่อนไข เพื่อไม่พลาด notify ที่มาระหว่างนั้น"""
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters[event] = asyncio.get_running_loop()
+        return event
+
+    def discard(self, event):
+        with self._lock:
+            self._waiters.pop(event, None)
+
+    def notify_all(self):
+        with self._lock:
+            waiters = list(self._waiters.items())
+        for event, loop in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:   # loop ปิดไปแล้ว
+                self.discard(event)
+
+    async def wait(self, check, timeout):
+        """
+        รอจน check() เป็นจริง (เช็คซ้ำทุกครั้งที่ถูกปลุก) — คืนค่า check() สุดท้าย
+        check ต้องไม่ block (ถือ lock สั้นๆ ได้)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            event = self.register()
+            try:
+                result = check()
+                if result:
+                    return result
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return result
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return check()
+            finally:
+                self.discard(event)
+
+
+class _Call:
+    def __init__(self):
+        self.done   = threading.Event()
+        self.result = None
+        self.error  = None
+
+
+class SingleFlight:
+    """
+    รวมการเรียกซ้อนกันของ key เดียวกันให้เหลือการคำนวณเดียว
+    คนแรกเป็นคนคำนวณ คนที่มาระหว่างนั้นรอรับผลเดียวกัน (หรือ exception เดียวกัน)
+    """
+
+    def __init__(self):
+        self._lock      = threading.Lock()
+        self._calls     = {}
+        self.coalesced  = 0   # จำนวนครั้งที่ได้ผลจากการคำนวณของคนอื่น
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
@@ -4,6 +4,8 @@ import json
 import os
 import sys
 
+from seat_map import DEFAULT_SEATS, load_seat_map
+
 # ✅ รองรับ path จาก argument ถ้าอยากทดสอบหลายภาพ
 if len(sys.argv) > 1:
     image_path = sys.argv[1]
@@ -27,11 +29,23 @@ num_people = len(boxes)
 confidences = [float(box.conf[0]) for box in boxes]
 avg_conf = round(sum(confidences) / len(confidences) * 100, 2) if confidences else 0
 
+# 💺 ชื่อไฟล์ {lab_id}_{cam_id}.png — มี seat map ของกล้องนี้ก็นับที่นั่งที่มีคนจริง
+lab_id, _, cam_id = os.path.splitext(os.path.basename(image_path))[0].partition("_")
+seat_map = load_seat_map(lab_id, cam_id) if cam_id else None
+if seat_map is not None:
+    h, w = results[0].orig_shape
+    detections = [{"box": [float(v) for v in box.xyxy[0]]} for box in boxes]
+    computers = len(seat_map)
+    used = len({s for s in seat_map.assign(detections, frame_size=(w, h)) if s is not None})
+else:
+    computers = DEFAULT_SEATS  # ยังไม่มี seat map — สมมุติไว้ก่อน
+    used = min(num_people, computers)
+
 # ✅ ส่งออก JSON ให้ backend อื่นอ่านได้
 output = {
     "students": num_people,
-    "computers": 30,  # สมมุติไว้ก่อน
-    "usage": f"{int((num_people/30)*100)}%",
+    "computers": computers,
+    "usage": f"{int((used / computers) * 100) if computers else 0}%",
     "avg_confidence": f"{avg_conf}%",
     "image": os.path.basename(image_path)
 }
@@ -0,0 +1,128 @@
+"""
+📣 Event Hub - กระจาย event ของ pipeline (analysis/stats/alert/overview) ให้ dashboard ผ่าน SSE
+  - publish() ให้ id เพิ่มขึ้นเรื่อยๆ และเก็บ event ล่าสุดไว้ใน ring (history)
+  - subscriber กรองตาม lab และชนิด event ได้
+  - resume ด้วย Last-Event-ID: ส่ง event ที่พลาดไปจาก ring ก่อน — ถ้าเก่ากว่า ring ส่ง "reset"
+    ให้ client โหลด snapshot ใหม่เอง
+  - subscribe() สำหรับ Flask (thread ต่อ client), subscribe_async() สำหรับโหมด ASGI (ไม่กิน thread)
+"""
+import json
+import threading
+from collections import deque
+
+from concurrency import AsyncWaiters
+
+
+def format_sse(event_id, event, data) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventHub:
+    """
+    Args:
+        history:   จำนวน event ล่าสุดที่เก็บไว้สำหรับ resume
+        keepalive: ส่ง comment ทุกกี่วินาทีเมื่อไม่มี event (กัน proxy ตัดการเชื่อมต่อ + ตรวจ client หลุด)
+    """
+
+    def __init__(self, history=500, keepalive=15.0):
+        self.keepalive = keepalive
+        self._events   = deque(maxlen=history)   # (id, event, lab_id, data)
+        self._last_id  = 0
+        self._cond     = threading.Condition()
+        self._async    = AsyncWaiters()
+        self._subscribers = 0
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, event, data, lab_id=None) -> int:
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, event, lab_id, data))
+            self._cond.notify_all()
+            event_id = self._last_id
+        self._async.notify_all()
+        return event_id
+
+    def _pending(self, after_id, labs, types, all_labs):
+        """event ที่ id > after_id และผ่าน filter — คืน (events, reset)"""
+        events = self._events
+        reset = bool(events) and after_id < events[0][0] - 1 and after_id != 0
+        out = []
+        for item in events:
+            event_id, event, lab_id, _ = item
+            if event_id <= after_id:
+                continue
+            if labs and lab_id is not None and lab_id not in labs and event not in all_labs:
+                continue
+            if types and event not in types:
+                continue
+            out.append(item)
+        return out, reset
+
+    def _open(self, last_id):
+        """เริ่ม subscriber — คืน (cursor, ข้อความแรก)"""
+        with self._cond:
+            self._subscribers += 1
+            stale  = last_id is not None and last_id > self._last_id   # server เริ่มใหม่ — id นับใหม่แล้ว
+            cursor = self._last_id if last_id is None or stale else last_id
+        first = ["retry: 3000\n\n"]
+        if stale:
+            first.append(format_sse(cursor, "reset", {"last_id": cursor}))
+        return cursor, first
+
+    def _close(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def _drain(self, cursor, labs, types, all_labs):
+        """ข้อความ SSE ของ event หลัง cursor — คืน (cursor ใหม่, ข้อความ)"""
+        with self._cond:
+            pending, reset = self._pending(cursor, labs, types, all_labs)
+            cursor = self._last_id
+        if reset:
+            return cursor, [format_sse(cursor, "reset", {"last_id": cursor})]
+        if not pending:
+            return cursor, [": keepalive\n\n"]
+        return cursor, [format_sse(event_id, event, data) for event_id, event, _, data in pending]
+
+    def subscribe(self, labs=None, types=None, last_id=None, all_labs=None):
+        """
+        Generator ของข้อความ SSE
+        Args:
+            labs:    set ของ lab_id ที่สนใจ (None = ทุกห้อง; event ที่ไม่ผูกห้องส่งเสมอ)
+            types:   set ของชนิด event ที่สนใจ (None = ทุกชนิด)
+            last_id: Last-Event-ID จาก client (None = เริ่มจาก event ถัดไป ไม่ replay)
+            all_labs: ชนิด event ที่ส่งจากทุกห้องแม้จะกรอง labs (เช่น alert)
+        """
+        labs, types, all_labs = set(labs or ()), set(types or ()), set(all_labs or ())
+        cursor, messages = self._open(last_id)
+        try:
+            yield from messages
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._last_id > cursor, self.keepalive)
+                cursor, messages = self._drain(cursor, labs, types, all_labs)
+                yield from messages
+        finally:
+            self._close()
+
+    async def subscribe_async(self, labs=None, types=None, last_id=None, all_labs=None):
+        """เหมือน subscribe() แต่เป็น async generator — รอ event ใน event loop ไม่ block thread"""
+        labs, types, all_labs = set(labs or ()), set(types or ()), set(all_labs or ())
+        cursor, messages = self._open(last_id)
+        try:
+            for message in messages:
+                yield message
+            while True:
+                await self._async.wait(lambda: self._last_id > cursor, self.keepalive)
+                cursor, messages = self._drain(cursor, labs, types, all_labs)
+                for message in messages:
+                    yield message
+        finally:
+            self._close()
@@ -0,0 +1,113 @@
+"""
+📦 Frame Batcher - รวม frame จากหลายกล้องเป็น batch เดียวก่อนส่งเข้า pose model
+  - analysis worker ของแต่ละกล้อง submit() frame แล้วรอผล
+  - batcher รอรวม frame ภายในช่วงเวลาสั้นๆ (window) แล้วเรียก analyze_frames ครั้งเดียว
+  - กล้องเดียวกันส่งซ้ำระหว่างรอ → ใช้ frame ล่าสุด ทิ้ง frame เก่า
+"""
+import threading
+import time
+
+
+class _Pending:
+    """frame ที่รอเข้า batch พร้อม event สำหรับปลุก caller เมื่อได้ผล"""
+    __slots__ = ("key", "frame", "event", "result", "error")
+
+    def __init__(self, key, frame):
+        self.key    = key
+        self.frame  = frame
+        self.event  = threading.Event()
+        self.result = None
+        self.error  = None
+
+
+class FrameBatcher:
+    """
+    รวม frame จากหลาย (lab_id, cam_id) เป็น batch เดียว
+
+    Args:
+        analyze_fn: ฟังก์ชัน (frames, keys) คืน list ของผลวิเคราะห์เรียงตาม frames
+        window:     เวลารอรวม frame หลังได้ frame แรกของ batch (วินาที)
+        max_batch:  จำนวน frame สูงสุดต่อ batch — ครบแล้วรันทันทีไม่ต้องรอ window
+    """
+
+    def __init__(self, analyze_fn, window=0.05, max_batch=8):
+        self.analyze_fn = analyze_fn
+        self.window     = window
+        self.max_batch  = max_batch
+        self._pending   = {}          # { key: _Pending } — หนึ่ง frame ต่อกล้อง
+        self._cond      = threading.Condition()
+        self._thread    = None
+        self.batches    = 0
+        self.frames     = 0
+
+    def submit(self, key, frame, timeout=None):
+        """
+        ส่ง frame ของ key เข้าคิว batch แล้วรอผล — คืน dict ผลวิเคราะห์
+        timeout (วินาที) → TimeoutError ถ้า batch ค้างนานกว่านั้น; None = รอจนได้ผล/error
+        """
+        with self._cond:
+            self._ensure_thread()
+            item = self._pending.get(key)
+            if item is None:
+                item = _Pending(key, frame)
+                self._pending[key] = item
+            else:
+                # กล้องเดียวกันยังรอเข้า batch — ใช้ frame ใหม่ล่าสุด ผู้รอทุกคนได้ผลเดียวกัน
+                item.frame = frame
+            self._cond.notify()
+        if not item.event.wait(timeout):
+            raise TimeoutError(f"batch inference timeout: {key}")
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.time() + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            keys = list(self._pending)[:self.max_batch]
+            return [self._pending.pop(k) for k in keys]
+
+    def _run(self):
+        try:
+            while True:
+                self._run_batch(self._take_batch())
+        finally:
+            # thread จบด้วยเหตุที่ไม่ใช่ Exception (เช่น KeyboardInterrupt/SystemExit) — ปล่อยผู้รอที่ค้างในคิว
+            with self._cond:
+                stranded = list(self._pending.values())
+                self._pending.clear()
+            self._release(stranded, RuntimeError("batch thread หยุดทำงาน"))
+
+    def _run_batch(self, batch):
+        try:
+            results = self.analyze_fn([item.frame for item in batch],
+                                      [item.key for item in batch])
+            self.batches += 1
+            self.frames  += len(batch)
+            for item, result in zip(batch, results):
+                item.result = result
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        finally:
+            # ทุก item ต้องถูกปลุกเสมอ — ผลไม่ครบ/thread กำลังจะตาย ได้ error แทนการรอตลอดไป
+            self._release(batch, RuntimeError("batch inference ไม่ได้ผลลัพธ์"))
+
+    @staticmethod
+    def _release(items, error):
+        for item in items:
+            if item.result is None and item.error is None:
+                item.error = error
+            item.event.set()
@@ -0,0 +1,71 @@
+"""
+🚦 Frame Change Gate - ข้าม inference เมื่อภาพแทบไม่เปลี่ยน
+  - ย่อ frame เป็น grayscale ขนาดเล็ก (thumbnail) แล้วเทียบกับ frame ที่วิเคราะห์ครั้งล่าสุด
+  - ค่าเฉลี่ย |diff| (0-255) ต่ำกว่า threshold → ใช้ผลวิเคราะห์เดิม
+  - แยก state และ threshold ต่อ (lab_id, cam_id) พร้อมตัวนับ analyzed/skipped
+"""
+import threading
+
+import cv2
+import numpy as np
+
+THUMB_SIZE = (64, 36)   # (w, h) — เล็กพอให้ diff แทบไม่มีต้นทุน แต่ยังเห็นคนขยับ
+
+
+def frame_signature(frame: np.ndarray) -> np.ndarray:
+    """thumbnail grayscale (int16) สำหรับเทียบความต่างระหว่าง frame"""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class FrameChangeGate:
+    """
+    Args:
+        threshold: ค่าเฉลี่ย |diff| ของ thumbnail (0-255) ที่ถือว่าภาพเปลี่ยน — ยิ่งต่ำยิ่งไว
+    """
+
+    def __init__(self, threshold=3.0):
+        self.threshold   = threshold
+        self._thresholds = {}   # { key: float } — override ต่อกล้อง
+        self._last_sig   = {}   # { key: signature ของ frame ที่วิเคราะห์ล่าสุด }
+        self._counters   = {}   # { key: {"analyzed": int, "skipped": int} }
+        self._lock       = threading.Lock()
+
+    def set_threshold(self, key, threshold):
+        with self._lock:
+            if threshold is None:
+                self._thresholds.pop(key, None)
+            else:
+                self._thresholds[key] = float(threshold)
+
+    def changed(self, key, frame, force=False) -> bool:
+        """
+        True ถ้าต้องวิเคราะห์ frame นี้ใหม่ (เก็บ signature ไว้เทียบครั้งต่อไป)
+        force=True เมื่อไม่มีผลเดิมให้ใช้ซ้ำ
+        """
+        sig = frame_signature(frame)
+        with self._lock:
+            counters = self._counters.setdefault(key, {"analyzed": 0, "skipped": 0})
+            prev = self._last_sig.get(key)
+            threshold = self._thresholds.get(key, self.threshold)
+            if (not force and prev is not None and prev.shape == sig.shape
+                    and float(np.abs(sig - prev).mean()) < threshold):
+                counters["skipped"] += 1
+                return False
+            self._last_sig[key] = sig
+            counters["analyzed"] += 1
+            return True
+
+    def reset(self, key):
+        with self._lock:
+            self._last_sig.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                key: {
+                    **counters,
+                    "threshold": self._thresholds.get(key, self.threshold),
+                }
+                for key, counters in self._counters.items()
+            }
@@ -0,0 +1,82 @@
+"""
+🔁 Frame Ring - ring buffer ของ frame ต่อกล้องแบบ preallocated
+  - capture thread decode ลง slot ที่จองไว้แล้วโดยตรง (cap.read(image=slot)) — ไม่ allocate ต่อ frame
+  - ทุก frame มี sequence number เพิ่มขึ้นเรื่อยๆ
+  - reader ได้ view แบบ read-only ของ frame ล่าสุด (ไม่ copy) และ block รอ sequence ใหม่ได้
+  - view ใช้ได้จนกว่า writer จะวนกลับมาเขียน slot เดิม (slots - 1 frame ถัดไป)
+    ถ้าต้องเก็บ frame ไว้นานกว่านั้น (เช่นเก็บลง cache) ให้ .copy() เอง หรือเช็ค is_valid(seq)
+"""
+import threading
+
+import numpy as np
+
+
+class FrameRing:
+    def __init__(self, slots=4):
+        self.slots  = slots
+        self._buf   = None      # ndarray (slots, h, w, c) ที่ frame ล่าสุดที่ commit แล้วอยู่
+        self._next  = None      # ชุด slot ใหม่เมื่อขนาด frame เปลี่ยน — ใช้แทน _buf ตอน commit แรก
+        self._seq   = 0         # sequence ของ frame ล่าสุดที่ commit แล้ว (0 = ยังไม่มี)
+        self._cond  = threading.Condition()
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def _ensure(self, shape, dtype) -> np.ndarray:
+        """
+        ชุด slot ที่ writer ใช้ — ขนาด/dtype เปลี่ยนจองชุดใหม่ไว้ที่ _next ก่อน
+        reader ยังอ่าน frame ล่าสุดจากชุดเดิมได้จนกว่า commit แรกของชุดใหม่ (ไม่ได้ slot ที่ยังไม่ถูกเขียน)
+        """
+        buf = self._next if self._next is not None else self._buf
+        if buf is None or buf.shape[1:] != shape or buf.dtype != dtype:
+            buf = self._next = np.empty((self.slots, *shape), dtype=dtype)
+        return buf
+
+    def next_slot(self, shape, dtype=np.uint8) -> np.ndarray:
+        """slot ที่ writer จะเขียน frame ถัดไป (ต้องเรียก commit() หลังเขียนเสร็จ)"""
+        with self._cond:
+            return self._ensure(tuple(shape), np.dtype(dtype))[(self._seq + 1) % self.slots]
+
+    def commit(self) -> int:
+        """ประกาศว่า slot จาก next_slot() เขียนเสร็จแล้ว — ปลุก reader ที่รออยู่"""
+        with self._cond:
+            if self._next is not None:
+                self._buf, self._next = self._next, None
+            self._seq += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def write(self, frame: np.ndarray) -> int:
+        """copy frame ลง slot ถัดไป (ใช้เมื่อ decode ลง slot ตรงๆ ไม่ได้ เช่นขนาด frame เปลี่ยน)"""
+        slot = self.next_slot(frame.shape, frame.dtype)
+        slot[...] = frame
+        return self.commit()
+
+    def _view(self, seq):
+        view = self._buf[seq % self.slots].view()
+        view.flags.writeable = False
+        return view
+
+    def latest(self):
+        """(seq, read-only view) ของ frame ล่าสุด หรือ (0, None) ถ้ายังไม่มี frame"""
+        with self._cond:
+            if self._seq == 0:
+                return 0, None
+            return self._seq, self._view(self._seq)
+
+    def wait_newer(self, seq: int, timeout: float = None):
+        """block จนมี frame ที่ sequence > seq — คืน (seq, view) หรือ (seq เดิม, None) เมื่อ timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > seq, timeout):
+                return seq, None
+            return self._seq, self._view(self._seq)
+
+    def is_valid(self, seq: int) -> bool:
+        """view ของ seq ยังไม่ถูกเขียนทับ"""
+        return 0 < seq and self._seq - seq < self.slots - 1
+
+    def wake_all(self):
+        """ปลุก reader ทั้งหมด (ใช้ตอนหยุด capture)"""
+        with self._cond:
+            self._cond.notify_all()
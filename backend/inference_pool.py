@@ -0,0 +1,288 @@
+"""
+🏭 Inference Pool - รัน pose inference ใน worker process หลายตัว (หลบ GIL)
+  - แต่ละ process โหลด pose model ของตัวเอง
+  - ส่ง frame ผ่าน multiprocessing.shared_memory (ไม่ pickle ndarray) — ส่งแค่ metadata ทาง Queue
+  - ผลลัพธ์กลับมาเป็น dict เล็กๆ (กล่อง/keypoints/พฤติกรรม) — ภาพ annotated วาดทีหลังฝั่ง server
+  - กระจายงานแบบ per-camera affinity (กล้องเดิม → process เดิม เก็บ tracker ไว้ได้) หรือ round-robin
+  - worker ตาย → start ใหม่อัตโนมัติแล้วลองงานเดิมซ้ำหนึ่งครั้ง
+"""
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# ──────────────────────────────────────────────
+# Worker process
+# ──────────────────────────────────────────────
+def _attach(cache, name):
+    """เปิด shared memory ตามชื่อ (cache ไว้ — parent สร้างใหม่เมื่อต้องขยายขนาด)"""
+    shm = cache.get(name)
+    if shm is None:
+        for old in cache.values():
+            old.close()
+        cache.clear()
+        shm = cache[name] = shared_memory.SharedMemory(name=name)
+    return shm
+
+
+def _worker_main(req_q, res_q, use_trackers):
+    from behavior_analyzer import analyze_frames, get_pose_model
+    from tracker import PersonTracker
+
+    get_pose_model()
+    in_cache = {}
+    trackers = {}
+    while True:
+        msg = req_q.get()
+        if msg is None:
+            break
+        job_id = msg["job"]
+        if "predict" in msg:
+            # รอบที่ไม่รัน pose ของกล้องนี้ — tracker อยู่ใน process นี้ จึงต้อง predict ที่นี่
+            tracker = trackers.get(msg["predict"])
+            res_q.put((job_id, tracker.predict() if tracker is not None else [], None))
+            continue
+        try:
+            in_shm = _attach(in_cache, msg["in"])
+            frames = [np.ndarray(shape, dtype=np.uint8, buffer=in_shm.buf, offset=off)
+                      for off, shape in msg["frames"]]
+            keys = msg["keys"]
+            if use_trackers:
+                # เฉพาะกล้องที่ parent ขอ (กล้อง live) — รูปนิ่งไม่ smooth เหมือนกรณีไม่มี pool
+                batch_trackers = [trackers.setdefault(k, PersonTracker()) if t else None
+                                  for k, t in zip(keys, msg.get("track") or [False] * len(keys))]
+            else:
+                batch_trackers = None
+            results = analyze_frames(frames, batch_trackers, msg.get("rois"), msg.get("layouts"),
+                                     msg.get("modes"))
+            for result in results:
+                result.pop("frame", None)   # parent มี frame อยู่แล้ว (และ view นี้ชี้เข้า shm)
+            del frames
+            res_q.put((job_id, results, None))
+        except Exception as e:
+            res_q.put((job_id, None, f"{type(e).__name__}: {e}"))
+
+
+# ──────────────────────────────────────────────
+# Parent side
+# ──────────────────────────────────────────────
+class _WorkerHandle:
+    def __init__(self, ctx, index, use_trackers):
+        self.ctx          = ctx
+        self.index        = index
+        self.use_trackers = use_trackers
+        self.lock         = threading.Lock()   # หนึ่งงานต่อ worker — shm slot ไม่ชนกัน
+        self.proc         = None
+        self.req_q        = None
+        self.res_q        = None
+        self.in_shm       = None
+        self.restarts     = 0
+        self.jobs         = 0
+
+    def start(self):
+        self.req_q = self.ctx.Queue()
+        self.res_q = self.ctx.Queue()
+        self.proc  = self.ctx.Process(target=_worker_main,
+                                      args=(self.req_q, self.res_q, self.use_trackers),
+                                      daemon=True, name=f"inference-{self.index}")
+        self.proc.start()
+
+    def ensure_capacity(self, nbytes):
+        if self.in_shm is not None and self.in_shm.size >= nbytes:
+            return
+        self.release_shm()
+        self.in_shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1 << 20))
+
+    def release_shm(self):
+        if self.in_shm is not None:
+            self.in_shm.close()
+            self.in_shm.unlink()
+        self.in_shm = None
+
+    def stop(self):
+        if self.proc is not None and self.proc.is_alive():
+            self.req_q.put(None)
+            self.proc.join(timeout=5.0)
+            if self.proc.is_alive():
+                self.proc.terminate()
+        self.release_shm()
+
+
+class InferencePool:
+    """
+    Args:
+        num_workers: จำนวน process
+        affinity:    "camera" = กล้องเดิมไป process เดิม (มี tracker ต่อกล้องใน worker)
+                     "round_robin" = วนแจกทีละ process (ไม่มี tracker)
+        timeout:     เวลารอผลต่อ batch (วินาที) ก่อนถือว่า worker ค้าง
+    """
+
+    def __init__(self, num_workers=2, affinity="camera", timeout=60.0):
+        if affinity not in ("camera", "round_robin"):
+            raise ValueError(f"affinity ไม่รองรับ: {affinity}")
+        self.affinity = affinity
+        self.timeout  = timeout
+        ctx = mp.get_context("spawn")   # ไม่ fork process ที่มี thread + torch อยู่แล้ว
+        self._workers = [_WorkerHandle(ctx, i, affinity == "camera") for i in range(num_workers)]
+        self._rr      = itertools.count()
+        self._job_ids = itertools.count(1)
+        self._started = False
+        self._lock    = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._started:
+                for w in self._workers:
+                    w.start()
+                self._started = True
+
+    def stop(self):
+        with self._lock:
+            for w in self._workers:
+                w.stop()
+            self._started = False
+
+    def _pick(self, key):
+        if self.affinity == "camera":
+            return zlib.crc32(repr(key).encode()) % len(self._workers)
+        return next(self._rr) % len(self._workers)
+
+    def analyze(self, frames: list, keys: list, rois: list = None, layouts: list = None,
+                modes: list = None, track: list = None) -> list:
+        """
+        วิเคราะห์ frames (จาก keys) — แบ่งไปแต่ละ worker แล้วรันขนานกัน คืนผลเรียงตาม frames
+        track: list ของ bool ต่อเฟรม — True = smooth ด้วย tracker ของกล้องนั้นใน worker (affinity "camera")
+        """
+        self.start()
+        rois    = rois or [None] * len(frames)
+        layouts = layouts or [None] * len(frames)
+        modes   = modes or [None] * len(frames)
+        track   = track or [False] * len(frames)
+        groups = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(self._pick(key), []).append(i)
+
+        results = [None] * len(frames)
+        errors  = []
+
+        def run(widx, idxs):
+            try:
+                out = self._run_on(self._workers[widx], [frames[i] for i in idxs],
+                                   [keys[i] for i in idxs], [rois[i] for i in idxs],
+                                   [layouts[i] for i in idxs], [modes[i] for i in idxs],
+                                   [track[i] for i in idxs])
+                for i, r in zip(idxs, out):
+                    results[i] = r
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(w, idxs)) for w, idxs in groups.items()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def predict(self, key) -> list:
+        """
+        tracker.predict() ของกล้อง key ใน worker ที่ถือ tracker นั้น (รอบที่ไม่รัน pose — ดู propagate_analysis)
+        ไม่มี tracker (round_robin / worker เพิ่ง restart) → [] = ใช้กล่องเดิม
+        """
+        if self.affinity != "camera":
+            return []
+        self.start()
+        worker = self._workers[self._pick(key)]
+        with worker.lock:
+            job_id = next(self._job_ids)
+            worker.req_q.put({"job": job_id, "predict": key})
+            reply = self._wait(worker, job_id)
+        return reply[1] if reply is not None else []
+
+    def _run_on(self, worker, frames, keys, rois=None, layouts=None, modes=None, track=None, retry=True):
+        with worker.lock:
+            frames = [np.ascontiguousarray(f, dtype=np.uint8) for f in frames]
+            layout, off = [], 0
+            for f in frames:
+                layout.append((off, f.shape))
+                off += f.nbytes
+            worker.ensure_capacity(off)
+            for (o, _), f in zip(layout, frames):
+                worker.in_shm.buf[o:o + f.nbytes] = f.reshape(-1).data
+
+            job_id = next(self._job_ids)
+            worker.req_q.put({"job": job_id, "in": worker.in_shm.name,
+                              "frames": layout, "keys": keys, "rois": rois, "layouts": layouts,
+                              "modes": modes, "track": track})
+            reply = self._wait(worker, job_id)
+            if reply is None:
+                # worker ตาย/ค้าง — start ใหม่แล้วลองซ้ำหนึ่งครั้ง
+                self._restart(worker)
+                if not retry:
+                    raise RuntimeError(f"inference worker {worker.index} ล้มเหลวซ้ำ")
+            else:
+                _, results, error = reply
+                if error:
+                    raise RuntimeError(f"inference worker {worker.index}: {error}")
+                worker.jobs += 1
+                for f, r in zip(frames, results):
+                    r["frame"] = f
+                return results
+        return self._run_on(worker, frames, keys, rois, layouts, modes, track, retry=False)
+
+    def _wait(self, worker, job_id):
+        waited = 0.0
+        while waited < self.timeout:
+            try:
+                reply = worker.res_q.get(timeout=0.5)
+            except queue.Empty:
+                waited += 0.5
+                if not worker.proc.is_alive():
+                    return None
+                continue
+            if reply[0] == job_id:
+                return reply
+        return None
+
+    def _restart(self, worker):
+        print(f"♻️  inference worker {worker.index} ล่ม/ค้าง — กำลัง start ใหม่")
+        if worker.proc is not None and worker.proc.is_alive():
+            worker.proc.terminate()
+            worker.proc.join(timeout=2.0)
+        worker.restarts += 1
+        worker.start()
+
+    def warm_up(self, frame):
+        """start ทุก worker แล้วส่ง frame ให้วิเคราะห์หนึ่งครั้งพร้อมกัน (โหลดโมเดล + warm-up ของทุก process)"""
+        self.start()
+        errors = []
+
+        def run(worker):
+            try:
+                self._run_on(worker, [frame], [("_warmup", worker.index)])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(w,), daemon=True) for w in self._workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {"index": w.index, "alive": bool(w.proc and w.proc.is_alive()),
+                 "jobs": w.jobs, "restarts": w.restarts}
+                for w in self._workers
+            ],
+            "affinity": self.affinity,
+        }
@@ -0,0 +1,145 @@
+"""
+📈 Metrics - histogram/counter แบบเบา ๆ + export เป็น Prometheus text format (GET /metrics)
+  - observe()/inc() แค่ bisect หา bucket แล้วบวกตัวเลขใต้ lock ของ metric นั้น — ไม่มี I/O ไม่มี allocation ต่อครั้ง
+    (หลังจากชุด label นั้นถูกสร้างแล้ว)
+  - ค่าที่มีอยู่แล้วในระบบ (capture stats, cache) ไม่เก็บซ้ำ — add_collector() อ่านตอนมีคน scrape เท่านั้น
+  - render() สร้าง text ตอน scrape — ไม่มีใคร scrape ก็ไม่มีค่าใช้จ่ายส่วนนี้
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# วินาที — ครอบตั้งแต่ CLAHE บนภาพเล็ก (~ms) ถึง inference หลาย tile บน CPU (~วินาที)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE    = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Args:
+        name:    ชื่อ metric (ลงท้าย _seconds ตามธรรมเนียม Prometheus)
+        labels:  ชื่อ label เรียงตาม tuple ที่ส่งให้ observe()
+        buckets: ขอบบนของแต่ละ bucket (วินาที) เรียงจากน้อยไปมาก
+    """
+
+    def __init__(self, name, help_, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name    = name
+        self.help    = help_
+        self.labels  = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values → [counts ต่อ bucket (ไม่สะสม) + ช่อง +Inf, sum]
+        self._lock   = threading.Lock()
+
+    def observe(self, label_values, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, label_values):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_values, time.perf_counter() - t0)
+
+    def render(self) -> list:
+        with self._lock:
+            snapshot = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, counts, total in sorted(snapshot, key=lambda item: tuple(map(str, item[0]))):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_, labels=()):
+        self.name    = name
+        self.help    = help_
+        self.labels  = tuple(labels)
+        self._values = {}
+        self._lock   = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            snapshot = sorted(self._values.items(), key=lambda item: tuple(map(str, item[0])))
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in snapshot]
+        return lines
+
+
+class MetricsRegistry:
+    """รวม metric ทั้งหมดของ process — render() คืน text ทั้งหน้าของ /metrics"""
+
+    def __init__(self):
+        self._metrics    = []
+        self._collectors = []
+
+    def histogram(self, name, help_, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_, labels=()) -> Counter:
+        metric = Counter(name, help_, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """
+        fn() → list ของ (name, type ("gauge" | "counter"), help, labels (tuple ชื่อ), [(label values, value)])
+        เรียกเฉพาะตอน render — ใช้กับค่าที่ component อื่นนับไว้อยู่แล้ว
+        """
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for fn in self._collectors:
+            try:
+                families = fn()
+            except Exception as e:   # collector พังไม่ควรทำให้ทั้งหน้า /metrics พัง
+                lines.append(f"# collector {getattr(fn, '__name__', fn)} failed: {_escape(e)}")
+                continue
+            for name, type_, help_, labels, samples in families:
+                lines += [f"# HELP {name} {help_}", f"# TYPE {name} {type_}"]
+                lines += [f"{name}{_labels(labels, values)} {_number(value)}"
+                          for values, value in samples if value is not None]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,153 @@
+"""
+📡 MJPEG Broadcaster - encode JPEG ครั้งเดียวต่อ frame แล้วกระจายให้ทุก viewer
+  - encoder thread หนึ่งตัวต่อกล้อง (ต่อโหมด raw/annotated) — เริ่มเมื่อมี viewer คนแรก หยุดเมื่อไม่มีใคร
+  - viewer ทุกคนได้ bytes ชุดเดียวกัน; viewer ที่ช้าจะข้ามไปเอา frame ล่าสุด ไม่ถ่วง encoder
+  - subscribe() สำหรับ Flask (thread ต่อ viewer), subscribe_async() สำหรับโหมด ASGI (ไม่กิน thread)
+"""
+import threading
+import time
+
+import cv2
+
+from concurrency import AsyncWaiters
+
+_BOUNDARY = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+
+
+class MjpegBroadcaster:
+    """
+    Args:
+        wait_frame:   ฟังก์ชัน (token, timeout) → (token ใหม่, frame | None) — block จนมี frame ใหม่กว่า token
+                      frame เป็น bytes (JPEG ที่ encode ไว้แล้ว) ได้ — ส่งต่อเลยไม่ encode ซ้ำ
+        quality:      JPEG quality
+        max_fps:      อัตรา encode สูงสุด
+        idle_timeout: ไม่มี frame ใหม่นานเท่านี้ (วินาที) → ปิด stream
+    """
+
+    def __init__(self, wait_frame, quality=80, max_fps=25, idle_timeout=5.0, name=""):
+        self.wait_frame   = wait_frame
+        self.quality      = quality
+        self.max_fps      = max_fps
+        self.idle_timeout = idle_timeout
+        self.name         = name
+        self._cond        = threading.Condition()
+        self._async       = AsyncWaiters()
+        self._seq         = 0
+        self._jpeg        = None
+        self._subscribers = 0
+        self._running     = False
+        self._thread      = None
+        self._closed      = False
+        self.encodes      = 0
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def _join(self) -> int:
+        """เพิ่ม viewer (start encoder ถ้ายังไม่รัน) — คืน seq เริ่มต้นของ viewer"""
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None and not self._closed:
+                self._running = True
+                self._thread  = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            # ส่ง frame ล่าสุดที่ encode ไว้แล้วให้ทันที ไม่ต้องรอ frame ถัดไป
+            return self._seq - 1 if self._jpeg is not None else self._seq
+
+    def _leave(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def _ready(self, seq):
+        return self._seq > seq or not self._running
+
+    def _take(self, seq):
+        """(seq, jpeg) ถัดไปสำหรับ viewer — (None, None) ถ้า stream จบ (ต้องถือ self._cond)"""
+        if self._seq <= seq:
+            return None, None
+        return self._seq, self._jpeg
+
+    def subscribe(self):
+        """Generator ของ multipart MJPEG สำหรับ viewer หนึ่งคน"""
+        seq = self._join()
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._ready(seq), self.idle_timeout)
+                    seq, jpeg = self._take(seq)
+                if seq is None:
+                    break
+                yield _BOUNDARY + jpeg + b"\r\n"
+        finally:
+            self._leave()
+
+    async def subscribe_async(self):
+        """เหมือน subscribe() แต่เป็น async generator — รอ frame ใน event loop ไม่ block thread"""
+        seq = self._join()
+        try:
+            while True:
+                await self._async.wait(lambda: self._ready(seq), self.idle_timeout)
+                with self._cond:
+                    seq, jpeg = self._take(seq)
+                if seq is None:
+                    break
+                yield _BOUNDARY + jpeg + b"\r\n"
+        finally:
+            self._leave()
+
+    def close(self):
+        """หยุด encoder และปลุก viewer ทุกคนให้จบ stream (ใช้ตอนลบ source)"""
+        with self._cond:
+            self._closed  = True
+            self._running = False
+            self._cond.notify_all()
+        self._async.notify_all()
+
+    def _stop_locked(self):
+        """ปิด encoder thread ปัจจุบัน (ต้องถือ self._cond อยู่)"""
+        self._thread  = None
+        self._running = False
+        self._jpeg    = None   # viewer ใหม่ไม่ควรได้ frame ค้างจาก stream ที่จบไปแล้ว
+        self._cond.notify_all()
+        self._async.notify_all()
+
+    def _run(self):
+        try:
+            self._encode_loop()
+        finally:
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._stop_locked()
+
+    def _encode_loop(self):
+        token, last = None, 0.0
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while True:
+            with self._cond:
+                # เช็คและปิดใน lock เดียวกัน — viewer ที่เข้ามาหลังจากนี้จะ start thread ใหม่เอง
+                if self._closed or self._subscribers == 0:
+                    self._stop_locked()
+                    return
+            wait = last + 1 / self.max_fps - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            token, frame = self.wait_frame(token, self.idle_timeout)
+            if frame is None:
+                if not self._closed:
+                    print(f"⏱️ MJPEG stream หมดเวลารอ frame: {self.name}")
+                return
+            if isinstance(frame, bytes):
+                ok, jpeg = True, frame
+            else:
+                ok, buf = cv2.imencode(".jpg", frame, params)
+                jpeg = buf.tobytes() if ok else None
+            last = time.time()
+            if not ok:
+                continue
+            with self._cond:
+                self._seq += 1
+                self._jpeg = jpeg
+                self.encodes += 1
+                self._cond.notify_all()
+            self._async.notify_all()
@@ -0,0 +1,73 @@
+"""
+⚙️ Model Backend - โหลดโมเดล YOLO ผ่าน runtime ที่เลือกได้ (hardware-agnostic)
+  - torch          : ultralytics PyTorch เดิม
+  - onnx           : export เป็น .onnx (dynamic batch) แล้วรันด้วย ONNX Runtime (CPU)
+  - openvino       : export เป็น OpenVINO IR แล้วรันด้วย OpenVINO Runtime
+  - openvino-int8  : OpenVINO IR แบบ INT8 quantized (calibrate ด้วย INT8_CALIBRATION_DATA)
+ไฟล์ที่ export แล้วถูก cache ไว้ข้างไฟล์ .pt — ครั้งต่อไปโหลดตรงไม่ export ซ้ำ
+ultralytics (+ torch) import ตอนโหลดโมเดลครั้งแรก ไม่ใช่ตอน import module นี้ — import ใช้เวลาหลายวินาที
+"""
+import os
+
+BACKENDS = ("torch", "onnx", "openvino", "openvino-int8")
+
+# dataset สำหรับ calibrate INT8 (ultralytics ดาวน์โหลดให้อัตโนมัติ)
+INT8_CALIBRATION_DATA = {"pose": "coco8-pose.yaml", "detect": "coco8.yaml"}
+
+
+def exported_path(weights: str, backend: str) -> str:
+    """path ของไฟล์/โฟลเดอร์ที่ ultralytics export ออกมาสำหรับ backend นี้"""
+    stem = os.path.splitext(weights)[0]
+    return {
+        "torch":         weights,
+        "onnx":          f"{stem}.onnx",
+        "openvino":      f"{stem}_openvino_model",
+        "openvino-int8": f"{stem}_int8_openvino_model",
+    }[backend]
+
+
+def export_model(weights: str, backend: str, task: str, imgsz: int = 640) -> str:
+    """export weights (.pt) สำหรับ backend ถ้ายังไม่มีใน cache — คืน path ที่ใช้โหลดได้"""
+    if backend == "torch":
+        return weights
+    from ultralytics import YOLO
+
+    model = YOLO(weights)   # ถ้ายังไม่มีไฟล์ ultralytics จะดาวน์โหลดให้
+    weights = model.ckpt_path or weights
+    target = exported_path(weights, backend)
+    if os.path.exists(target):
+        return target
+
+    print(f"📦 export {os.path.basename(weights)} → {backend} ...")
+    if backend == "onnx":
+        model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    elif backend == "openvino":
+        model.export(format="openvino", imgsz=imgsz, dynamic=True)
+    elif backend == "openvino-int8":
+        model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=True,
+                     data=INT8_CALIBRATION_DATA.get(task, "coco8.yaml"))
+    if not os.path.exists(target):
+        raise RuntimeError(f"export ไม่พบไฟล์ผลลัพธ์: {target}")
+    return target
+
+
+def load_model(weights: str, backend: str = "torch", task: str = "pose", imgsz: int = 640):
+    """
+    โหลด YOLO model ผ่าน backend ที่กำหนด — ถ้า export/โหลด runtime ไม่ได้ fallback เป็น torch
+
+    Args:
+        weights: path หรือชื่อไฟล์ .pt (เช่น yolov8s-pose.pt)
+        backend: หนึ่งใน BACKENDS
+        task:    "pose" หรือ "detect" (โมเดลที่ export แล้วต้องระบุ task เอง)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend ไม่รองรับ: {backend} (เลือกจาก {BACKENDS})")
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(weights)
+    try:
+        return YOLO(export_model(weights, backend, task, imgsz), task=task)
+    except Exception as e:
+        print(f"⚠️  ใช้ backend {backend} ไม่ได้ ({e}) — ใช้ torch แทน")
+        return YOLO(weights)
@@ -0,0 +1,216 @@
+"""
+🎛️ Rate Controller - กำหนดรอบวิเคราะห์ของแต่ละกล้องตามความเคลื่อนไหวของห้อง + งบ CPU รวม
+  - วัด latency ต่อ inference ของแต่ละกล้อง (EWMA) = ต้นทุนต่อหนึ่งรอบ
+  - กล้องที่พฤติกรรม/จำนวนคนเพิ่งเปลี่ยนหรือมี alert → เร็วขึ้น, ห้องว่าง/นิ่ง → ช้าลง
+  - ผลรวม (rate × latency) ของทุกกล้องต้องไม่เกินงบ cpu_budget (ลดลงเมื่อ CPU ทั้งเครื่องเกือบเต็ม)
+    เกินงบเมื่อไหร่ลดทุกกล้องตามสัดส่วน (ไม่ต่ำกว่า 1 / max_interval)
+  - load วัดจาก CPU time ของ process นี้ (ทุก thread) และ load average ของเครื่องถ้า OS มีให้
+"""
+import os
+import threading
+import time
+
+ACTIVITY_DECAY   = 30.0   # วินาที — activity ลดลงครึ่งหนึ่งทุกช่วงนี้
+ACTIVITY_BOOST   = 4.0    # น้ำหนักสูงสุดของกล้องที่ activity เต็ม (เทียบกับกล้องปกติ = 1)
+EMPTY_WEIGHT     = 0.2    # ห้องว่างต่อเนื่อง
+STABLE_WEIGHT    = 0.5    # ผลเหมือนเดิมต่อเนื่อง (หรือ frame ไม่เปลี่ยน)
+STABLE_AFTER     = 5      # จำนวนรอบติดกันก่อนถือว่าว่าง/นิ่ง
+LATENCY_ALPHA    = 0.3    # น้ำหนัก EWMA ของ latency ใหม่
+COLD_SAMPLES     = 1      # inference แรกของแต่ละกล้องไม่นับ latency (โหลดโมเดล / warm-up / ขนาด input ใหม่)
+REBALANCE_EVERY  = 1.0    # วินาที
+LOAD_HIGH        = 0.85   # CPU load เกินนี้เริ่มลดงบ (เหลือ 1/4 เมื่อ load เต็ม)
+
+
+class _Camera:
+    def __init__(self, max_fps):
+        self.max_fps     = max_fps
+        self.latency     = None    # วินาทีต่อ inference (EWMA)
+        self.activity    = 0.0     # 0-1
+        self.activity_ts = time.time()
+        self.last        = None    # (total_people, summary) ของรอบก่อน
+        self.empty_runs  = 0
+        self.stable_runs = 0
+        self.interval    = None
+        self.inferences  = 0
+
+    def decayed_activity(self, now):
+        return self.activity * 0.5 ** ((now - self.activity_ts) / ACTIVITY_DECAY)
+
+    def bump(self, amount, now):
+        self.activity    = min(1.0, self.decayed_activity(now) + amount)
+        self.activity_ts = now
+
+    def state(self):
+        if self.empty_runs >= STABLE_AFTER:
+            return "empty"
+        if self.stable_runs >= STABLE_AFTER:
+            return "stable"
+        return "active"
+
+
+class RateController:
+    """
+    Args:
+        base_interval: รอบวิเคราะห์ของกล้องปกติเมื่อ CPU พอ (วินาที)
+        min_interval:  เร็วสุดที่ให้ได้ (วินาที) — กล้องที่ตั้ง max_fps ไว้ใช้ค่าที่ช้ากว่า
+        max_interval:  ช้าสุด (ห้องว่าง/เกินงบ)
+        cpu_budget:    สัดส่วนเวลาที่ inference ทุกกล้องรวมกันใช้ได้ (1.0 = เต็มหนึ่ง inference ตลอดเวลา)
+    """
+
+    def __init__(self, base_interval=1.0, min_interval=0.25, max_interval=10.0, cpu_budget=0.8):
+        self.base_interval = base_interval
+        self.min_interval  = min_interval
+        self.max_interval  = max_interval
+        self.cpu_budget    = cpu_budget
+        self._cams         = {}
+        self._lock         = threading.Lock()
+        self._cores        = os.cpu_count() or 1
+        self._cpu_mark     = (time.time(), time.process_time())
+        self._load         = 0.0
+        self._cost         = 0.0
+        self._scale        = 1.0
+        self._rebalanced   = 0.0
+
+    # ─── Inputs ─────────────────────────────────────────────────
+    def register(self, key, max_fps=None):
+        with self._lock:
+            cam = self._cams.setdefault(key, _Camera(max_fps))
+            cam.max_fps = max_fps
+            self._rebalance_locked(force=True)
+
+    def unregister(self, key):
+        with self._lock:
+            self._cams.pop(key, None)
+
+    def record_latency(self, keys, seconds, cold=False):
+        """
+        inference หนึ่ง call ที่รวม frame ของ keys — แบ่งเวลาเท่ากันต่อกล้อง
+        cold=True (เช่น ระหว่างโหลด/warm-up โมเดล) นับจำนวนแต่ไม่ใช้เวลาประมาณต้นทุน — เช่นเดียวกับ
+        COLD_SAMPLES รอบแรกของแต่ละกล้อง ไม่งั้นเวลาโหลดโมเดล (~วินาที) ทำให้กล้องใหม่ได้รอบช้ามาก
+        """
+        share = seconds / max(1, len(keys))
+        with self._lock:
+            for key in keys:
+                cam = self._cams.setdefault(key, _Camera(None))
+                cam.inferences += 1
+                if cold or cam.inferences <= COLD_SAMPLES:
+                    continue
+                cam.latency = share if cam.latency is None else (
+                    LATENCY_ALPHA * share + (1 - LATENCY_ALPHA) * cam.latency)
+
+    def observe(self, key, analysis, changed=True):
+        """ผลวิเคราะห์รอบใหม่ — changed=False เมื่อ frame แทบไม่เปลี่ยน (change gating ใช้ผลเดิม)"""
+        now = time.time()
+        with self._lock:
+            cam = self._cams.setdefault(key, _Camera(None))
+            current = (analysis["total_people"], analysis["summary"])
+            if current[0] == 0:
+                cam.empty_runs += 1
+            else:
+                cam.empty_runs = 0
+            if cam.last is not None and changed:
+                people_diff = abs(current[0] - cam.last[0])
+                beh_diff = sum(abs(current[1].get(k, 0) - v) for k, v in cam.last[1].items())
+                if people_diff or beh_diff:
+                    cam.bump(min(1.0, 0.25 * (people_diff + beh_diff)), now)
+                    cam.stable_runs = 0
+                else:
+                    cam.stable_runs += 1
+            elif not changed:
+                cam.stable_runs += 1
+            cam.last = current
+            self._rebalance_locked()
+
+    def alert(self, lab_id):
+        """มี alert ในห้อง — เร่งทุกกล้องของห้องนั้นเต็มที่ (key = (lab_id, cam_id))"""
+        now = time.time()
+        with self._lock:
+            for key, cam in self._cams.items():
+                if key[0] == lab_id:
+                    cam.bump(1.0, now)
+                    cam.stable_runs = cam.empty_runs = 0
+            self._rebalance_locked(force=True)
+
+    # ─── Outputs ────────────────────────────────────────────────
+    def latency(self, key):
+        """เวลา inference ต่อ frame ของกล้อง (EWMA, วินาที) — None ถ้ายังไม่มีข้อมูล"""
+        with self._lock:
+            cam = self._cams.get(key)
+            return cam.latency if cam is not None else None
+
+    def interval(self, key) -> float:
+        with self._lock:
+            cam = self._cams.get(key)
+            if cam is None or cam.interval is None:
+                return self.base_interval
+            return cam.interval
+
+    def schedule(self) -> dict:
+        now = time.time()
+        with self._lock:
+            self._rebalance_locked(force=True)
+            return {
+                "cpu_budget":    self.cpu_budget,
+                "cpu_load":      round(self._load, 3),
+                "cost":          round(self._cost, 3),
+                "scale":         round(self._scale, 3),
+                "base_interval": self.base_interval,
+                "min_interval":  self.min_interval,
+                "max_interval":  self.max_interval,
+                "cameras": {key: {
+                    "interval":   round(cam.interval or self.base_interval, 3),
+                    "fps":        round(1.0 / (cam.interval or self.base_interval), 3),
+                    "max_fps":    cam.max_fps,
+                    "latency_ms": round(cam.latency * 1000, 1) if cam.latency is not None else None,
+                    "activity":   round(cam.decayed_activity(now), 3),
+                    "state":      cam.state(),
+                    "inferences": cam.inferences,
+                } for key, cam in self._cams.items()},
+            }
+
+    # ─── Allocation ─────────────────────────────────────────────
+    def _measure_load(self, now):
+        """สัดส่วน CPU ที่ถูกใช้ (0-1) — process นี้ หรือทั้งเครื่องถ้ามี load average ที่สูงกว่า"""
+        wall0, cpu0 = self._cpu_mark
+        cpu = time.process_time()
+        if now - wall0 >= REBALANCE_EVERY:
+            self._load = min(1.0, (cpu - cpu0) / ((now - wall0) * self._cores))
+            self._cpu_mark = (now, cpu)
+            if hasattr(os, "getloadavg"):
+                self._load = max(self._load, min(1.0, os.getloadavg()[0] / self._cores))
+        return self._load
+
+    def _weight(self, cam, now):
+        state = cam.state()
+        activity = cam.decayed_activity(now)
+        if state == "empty" and activity < 0.1:
+            return EMPTY_WEIGHT
+        if state == "stable" and activity < 0.1:
+            return STABLE_WEIGHT
+        return 1.0 + (ACTIVITY_BOOST - 1.0) * activity
+
+    def _rebalance_locked(self, force=False):
+        now = time.time()
+        if not force and now - self._rebalanced < REBALANCE_EVERY:
+            return
+        self._rebalanced = now
+        load = self._measure_load(now)
+
+        rates = {}
+        for key, cam in self._cams.items():
+            ceiling = 1.0 / self.min_interval
+            if cam.max_fps:
+                ceiling = min(ceiling, cam.max_fps)
+            rates[key] = min(ceiling, self._weight(cam, now) / self.base_interval)
+
+        # งบ: inference รวมใช้ได้ cpu_budget ของเวลา — ลดลงเมื่อ CPU ทั้งเครื่องเกือบเต็ม
+        budget = self.cpu_budget
+        if load > LOAD_HIGH:
+            budget *= max(0.25, (1.0 - load) / (1.0 - LOAD_HIGH))
+        cost = sum(rates[k] * (cam.latency or 0.0) for k, cam in self._cams.items())
+        scale = min(1.0, budget / cost) if cost > 0 else 1.0
+        floor = 1.0 / self.max_interval
+        for key, cam in self._cams.items():
+            cam.interval = 1.0 / max(floor, rates[key] * scale)
+        self._cost  = sum(cam.latency / cam.interval for cam in self._cams.values() if cam.latency)
+        self._scale = scale
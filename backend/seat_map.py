@@ -0,0 +1,191 @@
+"""
+💺 Seat Map - ตำแหน่งที่นั่ง (polygon) ต่อกล้อง + จับคู่คนกับที่นั่ง
+  - config: seat_maps/{lab_id}_{cam_id}.json
+        {"image_size": [w, h], "seats": [{"id": "A1", "polygon": [[x, y], ...]}, ...]}
+    polygon เป็นพิกัด pixel ของภาพขนาด image_size — frame ขนาดอื่นถูก scale ให้อัตโนมัติ
+  - spatial index แบบ slab สองชั้น (x แล้ว y) คำนวณไว้ตอนโหลด:
+    หา seat ของจุดหนึ่งด้วย bisect สองครั้ง O(log n) แล้วเช็ค point-in-polygon เฉพาะตัวเลือกใน cell นั้น
+  - จุดอ้างอิงของคน: กึ่งกลางสะโพก → กึ่งกลางไหล่ → กึ่งกลางกล่อง (ตาม keypoint ที่มองเห็น)
+"""
+import bisect
+import json
+import os
+
+import numpy as np
+
+SEAT_MAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seat_maps")
+ANCHOR_KP_CONF = 0.40   # keypoint ที่ conf ต่ำกว่านี้ไม่ใช้เป็นจุดอ้างอิง
+DEFAULT_SEATS  = 30     # จำนวนเครื่องที่สมมุติเมื่อกล้องยังไม่มี seat map
+
+
+def _point_in_polygon(x, y, poly) -> bool:
+    """ray casting — poly: ndarray (N, 2)"""
+    inside = False
+    n = len(poly)
+    j = n - 1
+    for i in range(n):
+        xi, yi = poly[i]
+        xj, yj = poly[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _slabs(intervals):
+    """
+    แบ่งแกนเป็นช่วงตามขอบของ intervals [(lo, hi, item)] — คืน (breakpoints, [items ที่ทับแต่ละช่วง])
+    ช่วงที่ i คือ [breakpoints[i], breakpoints[i + 1])
+    """
+    edges = sorted({v for lo, hi, _ in intervals for v in (lo, hi)})
+    cells = []
+    for lo, hi in zip(edges, edges[1:]):
+        cells.append([item for a, b, item in intervals if a < hi and b > lo])
+    return edges, cells
+
+
+def _locate(edges, value):
+    i = bisect.bisect_right(edges, value) - 1
+    return i if 0 <= i < len(edges) - 1 else None
+
+
+def _parse_image_size(image_size) -> tuple:
+    """[w, h] → (w, h) — ValueError ถ้าไม่ใช่ตัวเลขบวกสองค่า (ใช้เป็นตัวหารตอน scale polygon)"""
+    try:
+        w, h = image_size
+    except (TypeError, ValueError):
+        raise ValueError("image_size must be [width, height]") from None
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (w, h)):
+        raise ValueError("image_size must be [width, height]")
+    w, h = float(w), float(h)
+    if not (np.isfinite(w) and np.isfinite(h) and w > 0 and h > 0):
+        raise ValueError("image_size must be positive")
+    return (int(w) if w.is_integer() else w, int(h) if h.is_integer() else h)
+
+
+class SeatMap:
+    def __init__(self, seats: list, image_size=None):
+        """
+        Args:
+            seats:      [{"id": str, "polygon": [[x, y], ...]}, ...]
+            image_size: (w, h) ของภาพที่ใช้วาด polygon (None = ใช้พิกัดตามนั้นเลย)
+        """
+        self.seats      = [{"id": str(s["id"]), "polygon": np.asarray(s["polygon"], dtype=np.float32)}
+                           for s in seats]
+        self.image_size = _parse_image_size(image_size) if image_size else None
+        self.ids        = [s["id"] for s in self.seats]
+        self._pos       = {sid: i for i, sid in enumerate(self.ids)}
+        self._scaled    = {}   # {(w, h): (polys, bboxes, x_edges, x_cells)}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("seats", []), data.get("image_size"))
+
+    def to_dict(self) -> dict:
+        return {
+            "image_size": list(self.image_size) if self.image_size else None,
+            "seats": [{"id": s["id"], "polygon": s["polygon"].tolist()} for s in self.seats],
+        }
+
+    def __len__(self):
+        return len(self.seats)
+
+    # ─── Spatial index ──────────────────────────────────────────
+    def _index(self, frame_size):
+        """polygon ที่ scale ตามขนาด frame + slab index (cache ต่อขนาด frame)"""
+        idx = self._scaled.get(frame_size)
+        if idx is not None:
+            return idx
+        if self.image_size and frame_size and tuple(frame_size) != self.image_size:
+            sx = frame_size[0] / self.image_size[0]
+            sy = frame_size[1] / self.image_size[1]
+            polys = [s["polygon"] * (sx, sy) for s in self.seats]
+        else:
+            polys = [s["polygon"] for s in self.seats]
+
+        bboxes = [(p[:, 0].min(), p[:, 1].min(), p[:, 0].max(), p[:, 1].max()) for p in polys]
+        x_edges, x_cells = _slabs([(b[0], b[2], i) for i, b in enumerate(bboxes)])
+        # ชั้นที่สอง: แต่ละ x-slab แบ่งตาม y อีกที
+        x_cells = [_slabs([(bboxes[i][1], bboxes[i][3], i) for i in cell]) for cell in x_cells]
+        idx = self._scaled[frame_size] = (polys, bboxes, x_edges, x_cells)
+        return idx
+
+    def seat_at(self, x, y, frame_size=None):
+        """index ของที่นั่งที่มีจุด (x, y) อยู่ข้างใน หรือ None"""
+        polys, _, x_edges, x_cells = self._index(frame_size)
+        xi = _locate(x_edges, x)
+        if xi is None:
+            return None
+        y_edges, y_cells = x_cells[xi]
+        yi = _locate(y_edges, y)
+        if yi is None:
+            return None
+        for i in y_cells[yi]:
+            if _point_in_polygon(x, y, polys[i]):
+                return i
+        return None
+
+    def region(self, seat_ids=None, frame_size=None, pad=0.15):
+        """
+        bounding box (x1, y1, x2, y2) ที่ครอบที่นั่ง seat_ids (None = ทุกที่นั่ง)
+        ขยายขอบ pad (สัดส่วนของขนาด) เผื่อหัว/ไหล่ที่ยื่นออกนอก polygon
+        """
+        _, bboxes, _, _ = self._index(frame_size)
+        if seat_ids is None:
+            indices = range(len(bboxes))
+        else:
+            indices = [self._pos[s] for s in seat_ids if s in self._pos]
+        boxes = [bboxes[i] for i in indices]
+        if not boxes:
+            return None
+        x1 = min(b[0] for b in boxes)
+        y1 = min(b[1] for b in boxes)
+        x2 = max(b[2] for b in boxes)
+        y2 = max(b[3] for b in boxes)
+        px, py = (x2 - x1) * pad, (y2 - y1) * pad
+        w, h = frame_size if frame_size else (x2 + px, y2 + py)
+        return (int(max(0, x1 - px)), int(max(0, y1 - py)),
+                int(min(w, x2 + px)), int(min(h, y2 + py)))
+
+    # ─── Assignment ─────────────────────────────────────────────
+    def assign(self, detections: list, keypoints=None, frame_size=None) -> list:
+        """seat id ของแต่ละคน (เรียงตาม detections) — None ถ้าไม่อยู่ในที่นั่งไหน"""
+        out = []
+        for i, det in enumerate(detections):
+            kp = keypoints[i] if keypoints is not None and i < len(keypoints) else None
+            x, y = anchor_point(det["box"], kp)
+            seat = self.seat_at(x, y, frame_size)
+            out.append(self.ids[seat] if seat is not None else None)
+        return out
+
+
+def anchor_point(box, keypoints=None):
+    """จุดอ้างอิงตำแหน่งนั่งของคน: สะโพก (11, 12) → ไหล่ (5, 6) → กึ่งกลางกล่อง"""
+    if keypoints is not None and len(keypoints) >= 13:
+        for a, b in ((11, 12), (5, 6)):
+            pts = [keypoints[k] for k in (a, b) if keypoints[k][2] >= ANCHOR_KP_CONF]
+            if pts:
+                return (float(sum(p[0] for p in pts) / len(pts)),
+                        float(sum(p[1] for p in pts) / len(pts)))
+    x1, y1, x2, y2 = box
+    return (x1 + x2) / 2, (y1 + y2) / 2
+
+
+def seat_map_path(lab_id, cam_id) -> str:
+    return os.path.join(SEAT_MAP_DIR, f"{lab_id}_{cam_id}.json")
+
+
+def load_seat_map(lab_id, cam_id):
+    """SeatMap ของกล้อง หรือ None ถ้ายังไม่มี config"""
+    path = seat_map_path(lab_id, cam_id)
+    if not os.path.exists(path):
+        return None
+    return SeatMap.load(path)
+
+
+def save_seat_map(lab_id, cam_id, seat_map: SeatMap):
+    os.makedirs(SEAT_MAP_DIR, exist_ok=True)
+    with open(seat_map_path(lab_id, cam_id), "w", encoding="utf-8") as f:
+        json.dump(seat_map.to_dict(), f, ensure_ascii=False, indent=2)
@@ -1,40 +1,149 @@
-from flask import Flask, jsonify, send_from_directory, Response, request
+import time
+_import_started = time.perf_counter()   # phase "imports" ของ startup (ดู /api/ready)
+
+from flask import Flask, jsonify, send_from_directory, Response, request, g
 from flask_cors import CORS
-from ultralytics import YOLO
-import cv2, os, json, time, threading
+import cv2, os, threading, atexit, itertools
+import numpy as np
 from datetime import datetime
-from collections import deque
-from behavior_analyzer import analyze_frame, get_behavior_label_th
+from collections import OrderedDict, deque
+from behavior_analyzer import (INFERENCE_BACKEND, PREPROCESS_MODE, PREPROCESS_MODES, analyze_frames,
+                               draw_detections, get_behavior_label_th, get_pose_model, render_annotated)
+from frame_batcher import FrameBatcher
+from model_backend import load_model
+from frame_gate import FrameChangeGate
+from frame_ring import FrameRing
+from mjpeg_broadcaster import MjpegBroadcaster
+from inference_pool import InferencePool
+from stats_store import RESOLUTIONS, StatsStore
+from event_hub import EventHub
+from concurrency import BoundedExecutor, Saturated, SingleFlight
+from tracker import PersonTracker, propagate_analysis
+from capture import CaptureSource, source_kind
+from seat_map import SeatMap, load_seat_map, save_seat_map
+from tiling import TileLayout
+from rate_controller import RateController
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from startup import StartupTracker
 
 app = Flask(__name__, static_folder="../dashboard")
 CORS(app)
 
-# โหลดโมเดล YOLO สำหรับตรวจจับคน — ลอง yolov8s ก่อน fallback ไป nano
+# 🚀 Startup — import ไม่โหลดโมเดล (ultralytics/torch import ตอนโหลดครั้งแรก) server ตอบ request ได้ทันที
+# start_warmup() โหลด pose (+ detection) model ใน background แล้วรัน warm-up inference หนึ่งครั้ง
+# request แรกจริงจึงไม่ต้องรอโหลดโมเดล — /api/health ตอบทันที, /api/ready ตอบ 200 เมื่อ warm-up เสร็จ
+WARMUP_ON_START = True
+startup = StartupTracker()
+startup.record("imports", time.perf_counter() - _import_started)
+
+# 🧠 Single-pass: กล่องจาก pose model ใช้นับคน/ความมั่นใจด้วย — /api/frame, /api/data,
+# /api/behavior, /api/behavior-frame ใช้ inference เดียวกันจาก analysis_cache
+# ตั้ง USE_DETECTION_MODEL = True เพื่อกลับไปใช้ detection model แยกสำหรับ /api/frame และ /api/data
+USE_DETECTION_MODEL = False
+
 _base_dir = os.path.dirname(os.path.abspath(__file__))
-_small_det = os.path.join(_base_dir, "yolov8s.pt")
-_nano_det  = os.path.join(_base_dir, "yolov8n.pt")
-if os.path.exists(_small_det):
-    model = YOLO(_small_det)
-else:
-    model = YOLO(_nano_det)
-model.classes = [0]  # เฉพาะ class คน
-
-# 📊 เก็บสถิติย้อนหลัง
-stats_history = {}  # {lab_id: deque of stats}
-activity_log = {}   # {lab_id: deque of activities}
-MAX_HISTORY = 30
+model = None
+_model_lock = threading.Lock()
+
+
+def get_detection_model():
+    """โหลดโมเดล YOLO สำหรับตรวจจับคนครั้งแรกที่ใช้ (หรือตอน warm-up) — ลอง yolov8s ก่อน fallback ไป nano"""
+    global model
+    with _model_lock:
+        if model is None:
+            small_det = os.path.join(_base_dir, "yolov8s.pt")
+            nano_det  = os.path.join(_base_dir, "yolov8n.pt")
+            det_path  = small_det if os.path.exists(small_det) else nano_det
+            det = load_model(det_path, INFERENCE_BACKEND, task="detect")
+            det.classes = [0]  # เฉพาะ class คน
+            model = det
+    return model
+
+# 📊 เก็บสถิติย้อนหลัง — อยู่ใน SQLite (stats_store) ไม่จำกัดจำนวน
+MAX_HISTORY  = 30   # จำนวนจุดเริ่มต้นที่ /api/stats ส่งให้กราฟ (ปรับได้ด้วย ?limit=)
+MAX_ACTIVITY = 20
 
 # 🔄 Inference cache — ป้องกัน double inference (behavior-frame + behavior ต่อ tick เดียวกัน)
-analysis_cache = {}   # { (lab_id, cam_id): {"result": dict, "ts": float} }
+# LRU: เก็บได้ ANALYSIS_CACHE_MAX กล้อง — กล้องที่มี analysis worker ไม่ถูกไล่ออก
+# ผลวิเคราะห์เก็บแค่กล่อง/keypoints/พฤติกรรม + frame ดิบที่ย่อแล้ว (CACHE_FRAME_MAX_WIDTH); ภาพ annotated
+# วาด+encode ตอนมีคนขอ แล้ว cache JPEG ไว้ใน entry ("jpeg": {variant: (etag, bytes)}) — version ใหม่ทุกครั้งที่ผลเปลี่ยน
+analysis_cache = OrderedDict()   # { (lab_id, cam_id): {"result": dict, "ts": float, "version": int, "jpeg": dict} }
+ANALYSIS_CACHE_MAX = 16
+CACHE_FRAME_MAX_WIDTH = 960   # 1080p ดิบ ~6 MB → ~1.5 MB ต่อ entry
 CACHE_TTL = 4.0       # วินาที (มากกว่า poll interval 2s เล็กน้อย)
+# analysis worker ของกล้อง live วิเคราะห์ทุก ~1 วินาที แต่บันทึก stats + ตรวจ alert ไม่ถี่กว่านี้ต่อกล้อง
+# (จังหวะเดียวกับรูปนิ่งที่บันทึกครั้งละ cache miss) — ฐานข้อมูล/activity log ไม่โตตามรอบวิเคราะห์
+STATS_RECORD_INTERVAL = CACHE_TTL
+_analysis_cond = threading.Condition()   # lock ของ analysis_cache + ปลุกผู้รอผลวิเคราะห์ใหม่ (เช่น annotated MJPEG stream)
+_analysis_flight = SingleFlight()        # cache miss พร้อมกันของกล้องเดียวกัน → inference ครั้งเดียว
+_analysis_version = itertools.count(1)
+_ETAG_PREFIX = f"{int(time.time()):x}"   # ETag ของ server รอบก่อนจะไม่ชนกับรอบนี้
+
+# 📣 Push channel — pipeline publish event (analysis/stats/activity/alert/overview) แล้ว /api/events ส่งต่อแบบ SSE
+events = EventHub(history=500)
 
 # 🔔 Alerts — รายการแจ้งเตือนสำหรับ frontend
 alerts_list = []
 _alert_id_ctr = [0]  # ใช้ list เพื่อให้ nested function แก้ไขได้
 
-# 💾 Persistence — path สำหรับบันทึกข้อมูลลง disk
+# 📈 Metrics (metrics.py) — เวลาแต่ละขั้นต่อกล้อง + เวลาตอบของแต่ละ endpoint + cache hit/miss → GET /metrics
+# ตอนเกิดเหตุการณ์แค่บวกตัวเลขใน histogram/counter; ตัวนับที่มีอยู่แล้ว (capture, gating, คิว inference)
+# อ่านจาก component ตอนมีคน scrape เท่านั้น — METRICS_ENABLED = False ปิดการเก็บทั้งหมด
+METRICS_ENABLED = True
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    "classmood_stage_seconds", "Time spent in each pipeline stage per camera",
+    ("stage", "lab_id", "cam_id"))
+http_seconds = metrics.histogram(
+    "classmood_http_request_seconds", "HTTP handler time until the response object is returned",
+    ("endpoint", "method", "status", "lab_id", "cam_id"))
+cache_lookups = metrics.counter(
+    "classmood_cache_lookups_total", "Analysis and JPEG cache lookups by result",
+    ("cache", "result", "lab_id", "cam_id"))
+
+
+# label lab_id/cam_id ใส่เฉพาะกล้อง/ห้องที่มีอยู่จริง — ค่าจาก URL ของ client (เช่น 404 ของห้องที่ไม่มี)
+# สร้าง series ใหม่ได้ไม่จำกัด จึงรวมไว้ที่ label ว่าง ("") แทน
+def _known_camera(key):
+    return key in frame_buffers or key in analysis_cache or _get_image_path(*key) is not None
+
+
+def _known_lab(lab_id):
+    if any(k[0] == lab_id for k in list(frame_buffers) + list(analysis_cache)):
+        return True
+    images = os.path.join(_base_dir, "test_images")
+    return os.path.isdir(images) and any(n.split("_", 1)[0] == lab_id for n in os.listdir(images))
+
+
+def _camera_labels(key):
+    return (key[0], key[1]) if key and _known_camera(key) else ("", "")
+
+
+def _observe_stage(stage, key, seconds):
+    if METRICS_ENABLED:
+        stage_seconds.observe((stage,) + _camera_labels(key), seconds)
+
+
+def _record_timings(key, result):
+    """timings ที่ analyze_frames แนบมา (preprocess / inference / scoring) → histogram ของกล้องนั้น"""
+    if METRICS_ENABLED and result is not None:
+        labels = _camera_labels(key)
+        for stage, seconds in (result.get("timings") or {}).items():
+            stage_seconds.observe((stage,) + labels, seconds)
+
+
+def _count_cache(cache, hit, key):
+    if METRICS_ENABLED:
+        cache_lookups.inc((cache, "hit" if hit else "miss") + _camera_labels(key))
+
+
+# 💾 Persistence — SQLite (WAL) แบบ append-only; stats.json เดิมถูกนำเข้าครั้งแรกที่ฐานข้อมูลยังว่าง
 DATA_DIR   = os.path.join(_base_dir, "data")
 STATS_FILE = os.path.join(DATA_DIR, "stats.json")
+STATS_DB   = os.path.join(DATA_DIR, "stats.db")
+# commit ของ writer thread รวมหลายห้องใน batch เดียว — นับเป็น stage "stats_commit" ไม่แยกกล้อง
+stats_store = StatsStore(STATS_DB, on_commit=lambda seconds, rows: _observe_stage("stats_commit", None, seconds))
+atexit.register(stats_store.flush)
 
 
 def _get_image_path(lab_id, cam_id):
@@ -48,84 +157,433 @@ def _get_image_path(lab_id, cam_id):
 
 
 def _get_cached(lab_id, cam_id):
-    entry = analysis_cache.get((lab_id, cam_id))
-    if entry and (time.time() - entry["ts"]) < CACHE_TTL:
+    key = (lab_id, cam_id)
+    with _analysis_cond:
+        entry = analysis_cache.get(key)
+        if not entry:
+            return None
+        analysis_cache.move_to_end(key)
+    # กล้อง live ที่มี analysis worker — คืนผลล่าสุดเสมอ (worker อัปเดตเองตามรอบ)
+    # กล้องอื่น (รูปนิ่ง) วิเคราะห์ใหม่เมื่อเก่ากว่า CACHE_TTL หรือรอบที่ rate_controller ให้ (ที่ยาวกว่า)
+    ttl = max(CACHE_TTL, rate_controller.interval(key)) if ADAPTIVE_RATE else CACHE_TTL
+    if key in analysis_workers or (time.time() - entry["ts"]) < ttl:
         return entry["result"]
     return None
 
 
+def _compact_result(result):
+    """
+    แทน "frame" เต็มความละเอียดด้วยเฟรมย่อ (กว้างไม่เกิน CACHE_FRAME_MAX_WIDTH) + "frame_scale"
+    ภาพ annotated วาดจากเฟรมย่อตอนมีคนขอ — entry ใน cache ไม่ถือเฟรมเต็มของทุกกล้องไว้
+    """
+    frame = result.get("frame")
+    if frame is None or "frame_scale" in result:
+        return result   # ย่อแล้ว (gating คืนผลเดิม)
+    h, w = frame.shape[:2]
+    if w <= CACHE_FRAME_MAX_WIDTH:
+        return {**result, "frame_scale": 1.0, "frame_size": (w, h)}
+    scale = CACHE_FRAME_MAX_WIDTH / w
+    small = cv2.resize(frame, (CACHE_FRAME_MAX_WIDTH, max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    return {**result, "frame": small, "frame_scale": scale, "frame_size": (w, h)}
+
+
 def _set_cached(lab_id, cam_id, result):
-    analysis_cache[(lab_id, cam_id)] = {"result": result, "ts": time.time()}
+    """
+    เก็บผลวิเคราะห์ลง cache — ผลเดิม (gating คืน entry ที่ cache ไว้) แค่ต่อ ts
+    คง version + JPEG ที่ encode แล้วไว้ (ETag เดิม → 304 ได้, ไม่วาดซ้ำ)
+    """
+    key = (lab_id, cam_id)
+    with _analysis_cond:
+        entry = analysis_cache.get(key)
+    if entry is None or entry["result"] is not result:
+        result = _compact_result(_assign_seats(lab_id, cam_id, result))
+        entry = None
+    with _analysis_cond:
+        if entry is not None and analysis_cache.get(key) is entry:
+            entry["ts"] = time.time()
+        else:
+            analysis_cache[key] = {"result": result, "ts": time.time(),
+                                   "version": next(_analysis_version), "jpeg": {}}
+        analysis_cache.move_to_end(key)
+        _evict_cache()
+        _analysis_cond.notify_all()
+    events.publish("analysis", {
+        "lab_id":         lab_id,
+        "camera_id":      cam_id,
+        "total_people":   result["total_people"],
+        "attention_rate": result["attention_rate"],
+        "summary":        result["summary"],
+        "avg_confidence": result["avg_confidence"],
+        "seats":          result.get("seats"),
+    }, lab_id)
+    return result
+
+
+def _evict_cache():
+    """ไล่ entry ที่ใช้ล่าสุดนานที่สุดออกจนเหลือ ANALYSIS_CACHE_MAX (ต้องถือ _analysis_cond)"""
+    while len(analysis_cache) > ANALYSIS_CACHE_MAX:
+        victim = next((k for k in analysis_cache if k not in analysis_workers), None)
+        if victim is None:
+            break   # เหลือแต่กล้อง live — ไม่ไล่
+        del analysis_cache[victim]
+
+
+def _render_jpeg(lab_id, cam_id, analysis, variant, quality=None):
+    """
+    JPEG ของผลวิเคราะห์ — variant "behavior" (render_annotated) หรือ "detections" (draw_detections)
+    วาด + encode ครั้งเดียวต่อ version ต่อ variant ต่อ quality แล้วเก็บใน entry ของ analysis_cache — คืน (etag, bytes)
+    quality None = ค่าเริ่มต้นของ cv2.imencode (API ภาพนิ่ง), MJPEG stream ส่ง STREAM_JPEG_QUALITY
+    """
+    key = (lab_id, cam_id)
+    name = variant if quality is None else f"{variant}-q{quality}"
+    with _analysis_cond:
+        entry = analysis_cache.get(key)
+    if entry is None or entry["result"] is not analysis:
+        entry = None   # ผลนี้ไม่อยู่ใน cache แล้ว (ถูกแทน/ไล่ออก) — วาดให้แต่ไม่เก็บ
+    elif name in entry["jpeg"]:
+        _count_cache("jpeg", True, key)
+        return entry["jpeg"][name]
+    _count_cache("jpeg", False, key)
+
+    def render():
+        t0 = time.perf_counter()
+        image = (render_annotated(analysis) if variant == "behavior"
+                 else draw_detections(analysis["frame"], analysis["detections"], analysis.get("frame_scale", 1.0)))
+        t1 = time.perf_counter()
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)] if quality is not None else []
+        _, buffer = cv2.imencode(".jpg", image, params)
+        _observe_stage("annotate", key, t1 - t0)
+        _observe_stage("jpeg_encode", key, time.perf_counter() - t1)
+        version = entry["version"] if entry else f"x{id(analysis):x}"
+        jpeg = (f"{_ETAG_PREFIX}-{lab_id}-{cam_id}-{name}-{version}", buffer.tobytes())
+        if entry is not None:
+            with _analysis_cond:
+                entry["jpeg"][name] = jpeg
+        return jpeg
+
+    if entry is None:
+        return render()
+    return _analysis_flight.do(("jpeg", key, name, entry["version"]), render)
+
+
+def _jpeg_response(etag, data):
+    """image/jpeg พร้อม ETag — ตอบ 304 ถ้า If-None-Match ตรงกับ version ปัจจุบัน"""
+    response = Response(data, mimetype="image/jpeg")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 
 # ─── Video Source Manager ─────────────────────────────────────────────────────
 # video_sources: { (lab_id, cam_id): source }  source = int (webcam) หรือ str (path วิดีโอ)
 video_sources: dict = {}
-# frame_buffers: { (lab_id, cam_id): {"frame": ndarray|None, "lock": Lock, "running": bool, "thread": Thread|None} }
+# frame_buffers: { (lab_id, cam_id): {"ring": FrameRing, "running": bool, "capture": CaptureSource} }
 frame_buffers: dict = {}
+FRAME_RING_SLOTS = 4   # จำนวน slot ต่อกล้อง — view ที่อ่านไปใช้ได้ ~3 frame ก่อนถูกเขียนทับ
+# 🎥 Capture (capture.py) — reconnect + backoff, grab ทุก frame แต่ decode ตาม CAPTURE_DECODE_FPS
+# (stream MJPEG ดิบก็ใช้ frame ชุดนี้ — ไม่ต้องเกิน STREAM_MAX_FPS) และย่อเหลือ CAPTURE_MAX_WIDTH ถ้าตั้งไว้
+CAPTURE_DECODE_FPS = 15.0
+CAPTURE_MAX_WIDTH  = None   # เช่น 1920 สำหรับกล้อง 4K (ตั้งต่อกล้องด้วย "max_width")
+
+# ─── Analysis Workers ─────────────────────────────────────────────────────────
+# analysis_workers: { (lab_id, cam_id): {"fps": float, "pose_every_n": int, "tracker": PersonTracker,
+#                                         "running": bool, "thread": Thread|None} }
+# วิเคราะห์ pose เบื้องหลังต่อเนื่อง แยกจาก HTTP request — API แค่อ่านผลล่าสุดจาก analysis_cache
+analysis_workers: dict = {}
+ANALYSIS_FPS = 1.0    # อัตราวิเคราะห์เป้าหมายต่อกล้อง (ครั้ง/วินาที) ถ้าไม่ได้กำหนดมา
+POSE_EVERY_N = 1      # รัน pose ทุก N รอบ — รอบที่เหลือเลื่อนกล่องตาม tracker แทน inference
+
+# 🎛️ Adaptive rate — รอบวิเคราะห์ต่อกล้องมาจาก rate_controller (ดู rate_controller.py / GET /api/schedule)
+# ห้องที่พฤติกรรมเปลี่ยน/มี alert ถี่ขึ้น ห้องว่าง/นิ่งห่างขึ้น ภายใต้งบ CPU รวม
+# analysis_fps ที่ตั้งตอนเพิ่ม source กลายเป็นเพดานของกล้องนั้น; ADAPTIVE_RATE = False ใช้ fps คงที่แบบเดิม
+ADAPTIVE_RATE = True
+rate_controller = RateController(base_interval=1.0 / ANALYSIS_FPS, min_interval=0.25,
+                                 max_interval=10.0, cpu_budget=0.8)
+
+# รวม frame จากทุกกล้องที่ส่งเข้ามาภายใน BATCH_WINDOW เป็น YOLO pose call เดียว
+BATCH_WINDOW = 0.05   # วินาที
+BATCH_MAX    = 8      # frame สูงสุดต่อ batch
+# analysis worker รอผล batch ไม่เกิน BATCH_TIMEOUT_FACTOR เท่าของเวลา batch เต็มที่คาดไว้ (ไม่ต่ำกว่า BATCH_TIMEOUT_MIN)
+# batch thread ค้างในโมเดล → worker ได้ TimeoutError แล้ววนรอบใหม่ แทนการค้างตลอดไป
+BATCH_TIMEOUT_MIN    = 10.0   # วินาที — ครอบคลุมโหลดโมเดลรอบแรก
+BATCH_TIMEOUT_FACTOR = 4
+
+# 🧩 Tiled inference — กล้องมุมกว้างความละเอียดสูง แบ่งเฟรมเป็น tile ซ้อนกันก่อนเข้า pose model
+# (คนแถวหลังไม่หายตอนย่อเหลือ imgsz=640) ตั้งต่อกล้องผ่าน /api/tiles หรือ "tiles" ตอนตั้ง source
+# tile_layouts: { (lab_id, cam_id): TileLayout } — ไม่มี = ทั้งเฟรมภาพเดียว
+tile_layouts: dict = {}
+
+# 🌗 Normalize แสงก่อน pose — เลือกโหมดต่อกล้องผ่าน /api/preprocess หรือ "preprocess" ตอนตั้ง source
+# (ดู behavior_analyzer.PREPROCESS_MODES: ห้องแสงสม่ำเสมอใช้ "gamma"/"none" ประหยัด CPU ได้)
+# preprocess_modes: { (lab_id, cam_id): mode } — ไม่มี = PREPROCESS_MODE
+preprocess_modes: dict = {}
+
+# 🏭 Process pool — INFERENCE_PROCESSES > 0 ย้าย inference ไปรันใน worker process (หลบ GIL)
+# POOL_AFFINITY: "camera" = กล้องเดิมไป process เดิม (smoothing ด้วย tracker ใน worker) | "round_robin"
+INFERENCE_PROCESSES = 0
+POOL_AFFINITY       = "camera"
+_pool = InferencePool(INFERENCE_PROCESSES, affinity=POOL_AFFINITY) if INFERENCE_PROCESSES > 0 else None
+if _pool is not None:
+    atexit.register(_pool.stop)
+
+# 🚦 Admission control — inference ที่เกิดจาก HTTP request (cache miss) รันได้พร้อมกันแค่ INFERENCE_WORKERS งาน
+# รอคิวได้อีก INFERENCE_QUEUE งาน เกินนั้นตอบ 503 + Retry-After แทนการเปิด thread/inference เพิ่มไม่จำกัด
+INFERENCE_WORKERS = 2
+INFERENCE_QUEUE   = 8
+RETRY_AFTER       = 2   # วินาที
+_inference_executor = BoundedExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE, retry_after=RETRY_AFTER)
+
+
+def _saturated_response(e):
+    return (jsonify({"error": "Server busy", "retry_after": e.retry_after}), 503,
+            {"Retry-After": str(e.retry_after)})
+
+
+def _model_cold():
+    """
+    warm-up ใน background ยังไม่เสร็จ — latency รอบนี้รวมเวลารอโหลดโมเดล ไม่ใช้ประมาณต้นทุน (rate_controller)
+    ไม่ได้เปิด warm-up โมเดลโหลดใน inference แรก — ตัดออกด้วย COLD_SAMPLES ของ rate_controller
+    """
+    return startup.state == "warming"
+
+
+def _analyze_batch(frames, keys):
+    """analyze_frames พร้อม tracker ของแต่ละกล้อง (smoothing พฤติกรรมข้ามเฟรม)"""
+    rois    = [_seat_roi(k, f) for k, f in zip(keys, frames)]
+    layouts = [tile_layouts.get(k) for k in keys]
+    modes   = [preprocess_modes.get(k) for k in keys]
+    cold    = _model_cold()
+    started = time.perf_counter()
+    if _pool is not None:
+        track   = [k in analysis_workers for k in keys]   # เหมือน tracker ของ analysis worker ด้านล่าง
+        results = _pool.analyze(frames, keys, rois, layouts, modes, track)
+    else:
+        trackers = [analysis_workers.get(k, {}).get("tracker") for k in keys]
+        results = analyze_frames(frames, trackers, rois, layouts, modes)
+    rate_controller.record_latency(keys, time.perf_counter() - started, cold=cold)
+    for key, result in zip(keys, results):
+        _record_timings(key, result)
+    return results
+
+
+def _analyze_single(key, frame):
+    """วิเคราะห์ frame เดียวนอก analysis worker (เช่น รูปนิ่ง) — ผ่าน process pool ถ้าเปิดไว้"""
+    rois    = [_seat_roi(key, frame)]
+    layouts = [tile_layouts.get(key)]
+    modes   = [preprocess_modes.get(key)]
+    cold    = _model_cold()
+    started = time.perf_counter()
+    if _pool is not None:
+        result = _pool.analyze([frame], [key], rois, layouts, modes)[0]
+    else:
+        result = analyze_frames([frame], None, rois, layouts, modes)[0]
+    rate_controller.record_latency([key], time.perf_counter() - started, cold=cold)
+    _record_timings(key, result)
+    return result
+
+
+_batcher = FrameBatcher(_analyze_batch, window=BATCH_WINDOW, max_batch=BATCH_MAX)
+
+
+def _batch_timeout(key):
+    """เวลารอผล batch ของกล้อง — จาก latency ต่อ frame ที่ rate_controller วัดได้"""
+    latency = rate_controller.latency(key)
+    if latency is None:
+        return BATCH_TIMEOUT_MIN
+    return max(BATCH_TIMEOUT_MIN, BATCH_TIMEOUT_FACTOR * BATCH_MAX * latency + BATCH_WINDOW)
+
+
+# 💺 Seat map — polygon ที่นั่งต่อกล้อง (seat_maps/{lab_id}_{cam_id}.json) ใช้นับที่นั่งที่มีคนจริง
+# แทนการสมมุติ 30 เครื่อง + เก็บพฤติกรรมย้อนหลังต่อที่นั่ง
+# เฟรมใหญ่ (≥ SEAT_ROI_MIN_PIXELS) รัน pose เฉพาะกรอบที่ครอบที่นั่งที่มีคนรอบก่อน
+# ทุก SEAT_ROI_REFRESH รอบ (หรือเมื่อยังไม่มีใครนั่ง) ใช้กรอบของทุกที่นั่ง เพื่อเจอคนที่เพิ่งมานั่ง
+# seat_states: { (lab_id, cam_id): {"map": SeatMap, "occupied": {seat_id: behavior},
+#                                    "history": {seat_id: deque[(ts, behavior)]}, "rounds": int} | None }
+seat_states: dict = {}
+_seat_lock = threading.Lock()
+SEAT_HISTORY        = 120           # จำนวนพฤติกรรมย้อนหลังที่เก็บต่อที่นั่ง
+SEAT_ROI_MIN_PIXELS = 1920 * 1080
+SEAT_ROI_REFRESH    = 10
+
+
+def _seat_state(lab_id, cam_id):
+    """state ของ seat map กล้องนี้ (โหลด config ครั้งแรกที่ใช้) — None ถ้าไม่มี config"""
+    key = (lab_id, cam_id)
+    with _seat_lock:
+        if key not in seat_states:
+            try:
+                seat_map = load_seat_map(lab_id, cam_id)
+            except Exception as e:
+                print(f"⚠️ โหลด seat map {key} ล้มเหลว: {e}")
+                seat_map = None
+            seat_states[key] = (None if seat_map is None else
+                                {"map": seat_map, "occupied": {}, "history": {}, "rounds": 0})
+        return seat_states[key]
+
+
+def _seat_roi(key, frame):
+    """กรอบ (x1, y1, x2, y2) ที่จะรัน pose ของเฟรมนี้ หรือ None = ทั้งเฟรม"""
+    state = _seat_state(*key)
+    h, w = frame.shape[:2]
+    if state is None or w * h < SEAT_ROI_MIN_PIXELS:
+        return None
+    with _seat_lock:
+        state["rounds"] += 1
+        occupied = list(state["occupied"])
+        refresh  = not occupied or state["rounds"] % SEAT_ROI_REFRESH == 0
+    return state["map"].region(None if refresh else occupied, (w, h))
+
+
+def _assign_seats(lab_id, cam_id, result):
+    """
+    จับคู่คนในผลวิเคราะห์กับที่นั่ง — คืน dict ใหม่ที่มี "seats" และ seat_id ในแต่ละ behavior
+    ผลที่ assign แล้ว (gating ใช้ผลเดิม / propagate จากผลก่อนหน้า) คืนตามเดิม ไม่นับ history ซ้ำ
+    """
+    state = _seat_state(lab_id, cam_id)
+    if state is None or "seats" in result:
+        return result
+    h, w = result["frame"].shape[:2]
+    w, h = result.get("frame_size", (w, h))   # ผลใน cache เก็บเฟรมย่อ — พิกัดยังเป็นของเฟรมเต็ม
+    seat_ids = state["map"].assign(result["detections"], result.get("keypoints"), (w, h))
+    behaviors = [{**b, "seat_id": seat_ids[i] if i < len(seat_ids) else None}
+                 for i, b in enumerate(result["behaviors"])]
+    occupied = {b["seat_id"]: b["behavior"] for b in behaviors if b["seat_id"] is not None}
+    now = time.time()
+    with _seat_lock:
+        state["occupied"] = occupied
+        for seat_id, behavior in occupied.items():
+            state["history"].setdefault(seat_id, deque(maxlen=SEAT_HISTORY)).append((now, behavior))
+    total = len(state["map"])
+    return {**result, "behaviors": behaviors, "seats": {
+        "total":          total,
+        "occupied":       len(occupied),
+        "occupancy_rate": round(len(occupied) / total * 100, 1) if total else 0,
+    }}
+
+
+# 🚦 Change gating — ภาพแทบไม่เปลี่ยน (ห้องนิ่ง / รูปนิ่งเดิม) ใช้ผลวิเคราะห์เดิมแทน inference ใหม่
+CHANGE_GATING    = True
+CHANGE_THRESHOLD = 3.0   # ค่าเฉลี่ย |diff| ของ thumbnail grayscale (0-255) — ยิ่งต่ำยิ่งไว
+_gate = FrameChangeGate(threshold=CHANGE_THRESHOLD)
+
+
+def _analyze_gated(key, frame, analyze_fn):
+    """เรียก analyze_fn(frame) เฉพาะเมื่อภาพเปลี่ยนจาก frame ที่วิเคราะห์ล่าสุด ไม่งั้นคืนผลเดิม"""
+    prev = analysis_cache.get(key)
+    if CHANGE_GATING and not _gate.changed(key, frame, force=prev is None):
+        return prev["result"]
+    return analyze_fn(frame)
+
+
+def _analysis_loop(key):
+    """
+    Background thread วิเคราะห์ frame ล่าสุดของ (lab_id, cam_id) ตามอัตรา fps ที่กำหนด
+    frame ที่มาระหว่าง inference จะถูกทิ้ง — ใช้เฉพาะ frame ใหม่ล่าสุดเสมอ ไม่ต่อคิว
+    """
+    worker = analysis_workers[key]
+    lab_id, cam_id = key
+    last_seq = 0
+    tick = 0
+    last_recorded = 0.0
+    while worker["running"]:
+        started = time.time()
+        buf = frame_buffers.get(key)
+        seq, view = buf["ring"].wait_newer(last_seq, timeout=1.0) if buf else (last_seq, None)
+        if view is not None:
+            last_seq = seq
+            frame = view.copy()   # ผลวิเคราะห์เก็บ frame ไว้ใน cache — ต้องเป็นเจ้าของเอง
+            prev = analysis_cache.get(key)
+            # รอบระหว่าง pose inference — เลื่อนกล่องตาม tracker ไม่นับเป็น stats ใหม่
+            propagate = prev is not None and tick % worker["pose_every_n"] != 0
+            tick += 1
+            t0 = time.perf_counter()
+            try:
+                if propagate:
+                    predicted = _pool.predict(key) if _pool is not None else worker["tracker"].predict()
+                    analysis = propagate_analysis(prev["result"], frame, predicted)
+                else:
+                    analysis = _analyze_gated(key, frame, lambda f: _batcher.submit(key, f, timeout=_batch_timeout(key)))
+            except Exception as e:
+                print(f"⚠️ วิเคราะห์ {key} ล้มเหลว: {e}")
+                analysis = None
+            # "analyze" = ทั้งรอบรวมรอ batch; แยกขั้นย่อยดูจาก preprocess/inference/scoring
+            _observe_stage("propagate" if propagate else "analyze", key, time.perf_counter() - t0)
+            if analysis is not None and worker["running"]:
+                changed = prev is None or analysis is not prev["result"]
+                analysis = _set_cached(lab_id, cam_id, analysis)
+                if not propagate:
+                    if time.time() - last_recorded >= STATS_RECORD_INTERVAL:
+                        record_stats(lab_id, analysis)
+                        last_recorded = time.time()
+                    rate_controller.observe(key, analysis, changed)
+        interval = rate_controller.interval(key) if ADAPTIVE_RATE else 1.0 / worker["fps"]
+        time.sleep(max(0.01, interval - (time.time() - started)))
+
+
+def _start_analysis(lab_id, cam_id, fps=None, pose_every_n=None):
+    """เริ่ม analysis worker สำหรับ (lab_id, cam_id)"""
+    key = (lab_id, cam_id)
+    _stop_analysis(lab_id, cam_id)
+    worker = {"fps": fps or ANALYSIS_FPS, "pose_every_n": pose_every_n or POSE_EVERY_N,
+              "tracker": PersonTracker(), "running": True, "thread": None}
+    analysis_workers[key] = worker
+    rate_controller.register(key, max_fps=fps)
+    t = threading.Thread(target=_analysis_loop, args=(key,), daemon=True)
+    worker["thread"] = t
+    t.start()
 
 
-def _capture_loop(key):
-    """Background thread อ่าน frame ต่อเนื่องจาก VideoCapture"""
-    buf = frame_buffers[key]
-    src = video_sources.get(key)
-    cap = cv2.VideoCapture(src)
-    if not cap.isOpened():
-        print(f"⚠️  VideoCapture เปิดไม่ได้: {src}")
-        buf["running"] = False
-        return
-    is_file = isinstance(src, str)
-    print(f"🎥 เปิด {'วิดีโอ' if is_file else 'เว็บแคม'} {key} → {src}")
-    while buf["running"]:
-        ok, frame = cap.read()
-        if not ok:
-            if is_file:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # วนซ้ำตั้งแต่ต้น
-                ok, frame = cap.read()
-            else:
-                time.sleep(0.05)
-                continue
-        if ok and frame is not None:
-            with buf["lock"]:
-                buf["frame"] = frame
-        time.sleep(0.033)  # ~30 FPS max
-    cap.release()
-    print(f"🛑 ปิด {'วิดีโอ' if is_file else 'เว็บแคม'} {key}")
+def _stop_analysis(lab_id, cam_id):
+    """หยุด analysis worker ของ (lab_id, cam_id)"""
+    worker = analysis_workers.pop((lab_id, cam_id), None)
+    rate_controller.unregister((lab_id, cam_id))
+    if worker:
+        worker["running"] = False
+        t = worker.get("thread")
+        if t and t.is_alive():
+            t.join(timeout=2.0)
 
 
-def _start_capture(lab_id, cam_id, source):
-    """เริ่ม background thread สำหรับ (lab_id, cam_id)"""
+def _start_capture(lab_id, cam_id, source, analysis_fps=None, pose_every_n=None,
+                   decode_fps=None, max_width=None):
+    """เริ่ม capture (CaptureSource) สำหรับ (lab_id, cam_id) พร้อม analysis worker"""
     key = (lab_id, cam_id)
     _stop_capture(lab_id, cam_id)  # หยุด thread เก่าก่อน
     video_sources[key] = source
-    buf = {"frame": None, "lock": threading.Lock(), "running": True, "thread": None}
-    frame_buffers[key] = buf
-    t = threading.Thread(target=_capture_loop, args=(key,), daemon=True)
-    buf["thread"] = t
-    t.start()
+    ring = FrameRing(FRAME_RING_SLOTS)
+    capture = CaptureSource(source, ring, decode_fps=decode_fps or CAPTURE_DECODE_FPS,
+                            max_width=max_width or CAPTURE_MAX_WIDTH, name=f"{lab_id}/{cam_id}")
+    frame_buffers[key] = {"ring": ring, "running": True, "capture": capture}
+    capture.start()
+    _start_analysis(lab_id, cam_id, analysis_fps, pose_every_n)
 
 
 def _stop_capture(lab_id, cam_id):
     """หยุด background thread ของ (lab_id, cam_id)"""
     key = (lab_id, cam_id)
+    _stop_analysis(lab_id, cam_id)
     if key in frame_buffers:
         frame_buffers[key]["running"] = False
-        t = frame_buffers[key].get("thread")
-        if t and t.is_alive():
-            t.join(timeout=2.0)
+        frame_buffers[key]["capture"].stop()
+        frame_buffers[key]["ring"].wake_all()
         del frame_buffers[key]
     video_sources.pop(key, None)
-    analysis_cache.pop(key, None)
+    with _analysis_cond:
+        analysis_cache.pop(key, None)
+    for mode in ("raw", "annotated"):
+        b = broadcasters.pop((key, mode), None)
+        if b:
+            b.close()
+    _gate.reset(key)
 
 
 def get_live_frame(lab_id, cam_id):
-    """คืน frame ล่าสุดจาก buffer หรือ None ถ้าไม่มี live source"""
+    """คืน copy ของ frame ล่าสุดจาก ring buffer หรือ None ถ้าไม่มี live source"""
     buf = frame_buffers.get((lab_id, cam_id))
     if buf:
-        with buf["lock"]:
-            f = buf["frame"]
-        if f is not None:
-            return f.copy()
+        _, view = buf["ring"].latest()
+        if view is not None:
+            return view.copy()
     return None
 
 
@@ -141,75 +599,121 @@ def _read_frame(lab_id, cam_id):
     image_path = _get_image_path(lab_id, cam_id)
     if not image_path:
         return None, (jsonify({"error": "Image not found"}), 404)
+    t0 = time.perf_counter()
     frame = cv2.imread(image_path)
+    _observe_stage("image_read", (lab_id, cam_id), time.perf_counter() - t0)
     if frame is None:
         return None, (jsonify({"error": "Unable to read image"}), 400)
     return frame, None
 
 
-def push_alert(lab_id, alert_type, message):
+def push_alert(lab_id, alert_type, message, ts=None):
+    ts = ts or time.time()
     _alert_id_ctr[0] += 1
     alerts_list.append({
         "id":      _alert_id_ctr[0],
-        "time":    datetime.now().strftime("%H:%M:%S"),
+        "time":    datetime.fromtimestamp(ts).strftime("%H:%M:%S"),
         "lab_id":  lab_id,
         "type":    alert_type,
         "message": message,
     })
     if len(alerts_list) > 50:
         alerts_list.pop(0)
+    events.publish("alert", alerts_list[-1], lab_id)
+    rate_controller.alert(lab_id)
+    stats_store.record_alert(_alert_id_ctr[0], lab_id, ts, alert_type, message)
 
 
-def save_stats():
-    """บันทึก stats_history และ activity_log ลง disk"""
-    os.makedirs(DATA_DIR, exist_ok=True)
+def init_stats_store():
+    """เตรียม stats_store เมื่อ server เริ่ม — นำเข้า stats.json เดิมถ้าฐานข้อมูลยังว่าง"""
     try:
-        with open(STATS_FILE, "w", encoding="utf-8") as f:
-            json.dump({
-                "stats_history": {k: list(v) for k, v in stats_history.items()},
-                "activity_log":  {k: list(v) for k, v in activity_log.items()},
-            }, f, ensure_ascii=False, indent=2)
+        if stats_store.is_empty() and os.path.exists(STATS_FILE):
+            count = stats_store.import_json(STATS_FILE)
+            print(f"📂 นำเข้าข้อมูลเดิมจาก stats.json: {count} รายการ")
+        _alert_id_ctr[0] = stats_store.max_alert_id()   # id ของ alert ต่อจากรอบก่อน
+        print(f"📂 stats store: {STATS_DB} (ห้อง {stats_store.labs()})")
     except Exception as e:
-        print(f"⚠️ บันทึกข้อมูลล้มเหลว: {e}")
+        print(f"⚠️ เตรียม stats store ล้มเหลว: {e}")
 
 
-def load_stats():
-    """โหลดข้อมูลเดิมจาก disk เมื่อ server เริ่ม"""
-    if not os.path.exists(STATS_FILE):
-        return
-    try:
-        with open(STATS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        for lab_id, items in data.get("stats_history", {}).items():
-            stats_history[lab_id] = deque(items, maxlen=MAX_HISTORY)
-        for lab_id, items in data.get("activity_log", {}).items():
-            activity_log[lab_id] = deque(items, maxlen=20)
-        print(f"📂 โหลดข้อมูลเดิม: {list(data.get('stats_history', {}).keys())}")
-    except Exception as e:
-        print(f"⚠️ โหลดข้อมูลเดิมล้มเหลว: {e}")
+def _get_analysis(lab_id, cam_id):
+    """
+    ผลวิเคราะห์ของ (lab_id, cam_id) จาก cache หรือ inference ใหม่ (นับ stats ครั้งเดียวต่อ cache miss)
+    คืน (analysis, error_tuple_or_None)
+    """
+    analysis = _get_cached(lab_id, cam_id)
+    _count_cache("analysis", analysis is not None, (lab_id, cam_id))
+    if analysis is None:
+        frame, err = _read_frame(lab_id, cam_id)
+        if err:
+            return None, err
+        try:
+            analysis = _analysis_flight.do((lab_id, cam_id), lambda: _analyze_miss(lab_id, cam_id, frame))
+        except Saturated as e:
+            return None, _saturated_response(e)
+    return analysis, None
+
+
+def _analyze_miss(lab_id, cam_id, frame):
+    """inference หนึ่งครั้งต่อ cache miss (รันภายใต้ _analysis_flight — request อื่นที่ miss พร้อมกันรอผลนี้)"""
+    analysis = _get_cached(lab_id, cam_id)   # flight ก่อนหน้าอาจเพิ่งเติม cache ให้แล้ว
+    if analysis is not None:
+        return analysis
+    key = (lab_id, cam_id)
+    prev = analysis_cache.get(key)
+    analysis = _inference_executor.run(_analyze_gated, key, frame, lambda f: _analyze_single(key, f))
+    changed = prev is None or analysis is not prev["result"]
+    analysis = _set_cached(lab_id, cam_id, analysis)
+    record_stats(lab_id, analysis)
+    rate_controller.observe(key, analysis, changed)
+    print(f"🧠 [{lab_id}/{cam_id}] {analysis['summary']} | Attention: {analysis['attention_rate']}%")
+    return analysis
 
 
 # ✅ API 1: ส่งเฟรมภาพพร้อมกรอบตรวจจับ
 @app.route("/api/frame/<lab_id>/<int:cam_id>")
 def get_lab_frame(lab_id, cam_id):
-    frame, err = _read_frame(lab_id, cam_id)
+    if USE_DETECTION_MODEL:
+        frame, err = _read_frame(lab_id, cam_id)
+        if err:
+            return err
+        try:
+            annotated_frame = _inference_executor.run(lambda: get_detection_model()(frame)[0].plot())
+        except Saturated as e:
+            return _saturated_response(e)
+        _, buffer = cv2.imencode(".jpg", annotated_frame)
+        return Response(buffer.tobytes(), mimetype="image/jpeg")
+
+    analysis, err = _get_analysis(lab_id, cam_id)
     if err:
         return err
-
-    results = model(frame)
-    annotated_frame = results[0].plot()
-    _, buffer = cv2.imencode(".jpg", annotated_frame)
-    return Response(buffer.tobytes(), mimetype="image/jpeg")
+    return _jpeg_response(*_render_jpeg(lab_id, cam_id, analysis, "detections"))
 
 
 # ✅ API 2: ส่งข้อมูลการตรวจจับ (จำนวนคน, ความมั่นใจเฉลี่ย)
 @app.route("/api/data/<lab_id>/<int:cam_id>")
 def get_lab_data(lab_id, cam_id):
+    if not USE_DETECTION_MODEL:
+        analysis, err = _get_analysis(lab_id, cam_id)
+        if err:
+            return err
+        return jsonify({
+            "lab_id": lab_id,
+            "camera_id": cam_id,
+            "num_people": analysis["total_people"],
+            "avg_confidence": analysis["avg_confidence"],
+            "detected_objects": len(analysis["detections"]),
+            "seats": analysis.get("seats")
+        })
+
     frame, err = _read_frame(lab_id, cam_id)
     if err:
         return err
 
-    results = model(frame)
+    try:
+        results = _inference_executor.run(lambda: get_detection_model()(frame))
+    except Saturated as e:
+        return _saturated_response(e)
     boxes = results[0].boxes
 
     num_people = 0
@@ -238,15 +742,9 @@ def get_lab_data(lab_id, cam_id):
 @app.route("/api/behavior/<lab_id>/<int:cam_id>")
 def get_behavior_analysis(lab_id, cam_id):
     # ใช้ cache ก่อน — ป้องกัน double inference กับ behavior-frame
-    analysis = _get_cached(lab_id, cam_id)
-    if analysis is None:
-        frame, err = _read_frame(lab_id, cam_id)
-        if err:
-            return err
-        analysis = analyze_frame(frame)
-        _set_cached(lab_id, cam_id, analysis)
-        record_stats(lab_id, analysis)
-        print(f"🧠 [{lab_id}/{cam_id}] {analysis['summary']} | Attention: {analysis['attention_rate']}%")
+    analysis, err = _get_analysis(lab_id, cam_id)
+    if err:
+        return err
 
     return jsonify({
         "lab_id": lab_id,
@@ -258,44 +756,94 @@ def get_behavior_analysis(lab_id, cam_id):
             {
                 "behavior": b["behavior"],
                 "behavior_th": get_behavior_label_th(b["behavior"]),
-                "confidence": b["confidence"]
+                "confidence": b["confidence"],
+                "track_id": b.get("track_id"),
+                "seat_id": b.get("seat_id")
             } for b in analysis["behaviors"]
-        ]
+        ],
+        "seats": analysis.get("seats")
     })
 
 
 # ✅ API 4: ส่งภาพพร้อม behavior annotation
 @app.route("/api/behavior-frame/<lab_id>/<int:cam_id>")
 def get_behavior_frame(lab_id, cam_id):
-    frame, err = _read_frame(lab_id, cam_id)
+    # ใช้ cache ก่อน — ป้องกัน double inference (กล้อง live ได้ผลจาก analysis worker)
+    analysis, err = _get_analysis(lab_id, cam_id)
     if err:
         return err
 
-    # ใช้ cache ก่อน — ป้องกัน double inference
-    analysis = _get_cached(lab_id, cam_id)
-    if analysis is None:
-        analysis = analyze_frame(frame)
-        _set_cached(lab_id, cam_id, analysis)
-        record_stats(lab_id, analysis)
+    return _jpeg_response(*_render_jpeg(lab_id, cam_id, analysis, "behavior"))
+
+
+# 💺 ที่นั่งของกล้อง: polygon + สถานะ (มีคน/พฤติกรรมล่าสุด) + พฤติกรรมย้อนหลังต่อที่นั่ง
+@app.route("/api/seats/<lab_id>/<int:cam_id>")
+def get_seats(lab_id, cam_id):
+    """?history=N จำนวนพฤติกรรมย้อนหลังต่อที่นั่ง (ค่าเริ่มต้น 20, 0 = ไม่ส่ง)"""
+    state = _seat_state(lab_id, cam_id)
+    if state is None:
+        return jsonify({"error": "No seat map"}), 404
+    limit = max(0, min(request.args.get("history", 20, type=int), SEAT_HISTORY))
+    with _seat_lock:
+        occupied = dict(state["occupied"])
+        history  = {sid: list(h)[-limit:] if limit else [] for sid, h in state["history"].items()}
+    seat_map = state["map"].to_dict()
+    seats = [{
+        **seat,
+        "occupied":    seat["id"] in occupied,
+        "behavior":    occupied.get(seat["id"]),
+        "behavior_th": get_behavior_label_th(occupied[seat["id"]]) if seat["id"] in occupied else None,
+        "history":     [{"ts": round(ts, 3), "behavior": b} for ts, b in history.get(seat["id"], [])],
+    } for seat in seat_map["seats"]]
+    return jsonify({
+        "lab_id": lab_id,
+        "camera_id": cam_id,
+        "image_size": seat_map["image_size"],
+        "total": len(seats),
+        "occupied": len(occupied),
+        "seats": seats,
+    })
+
 
-    annotated_frame = analysis.get("annotated_frame")
-    if annotated_frame is None:
-        annotated_frame = frame
-    _, buffer = cv2.imencode(".jpg", annotated_frame)
-    return Response(buffer.tobytes(), mimetype="image/jpeg")
+@app.route("/api/seats/<lab_id>/<int:cam_id>", methods=["PUT"])
+def set_seats(lab_id, cam_id):
+    """
+    บันทึก seat map ของกล้อง: {\"image_size\": [w, h], \"seats\": [{\"id\": \"A1\", \"polygon\": [[x, y], ...]}]}
+    เขียนทับ seat_maps/{lab_id}_{cam_id}.json แล้วใช้ทันที (history ของกล้องนี้เริ่มใหม่)
+    """
+    body = request.get_json(force=True, silent=True) or {}
+    seats = body.get("seats")
+    if not isinstance(seats, list) or not seats:
+        return jsonify({"error": "Missing 'seats' list"}), 400
+    try:
+        seat_map = SeatMap(seats, body.get("image_size"))
+        if any(len(s["polygon"]) < 3 or s["polygon"].ndim != 2 or s["polygon"].shape[1] != 2
+               for s in seat_map.seats):
+            raise ValueError("polygon needs >= 3 [x, y] points")
+        if len(set(seat_map.ids)) != len(seat_map.ids):
+            raise ValueError("duplicate seat id")
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid seat map: {e}"}), 400
+    save_seat_map(lab_id, cam_id, seat_map)
+    with _seat_lock:
+        seat_states[(lab_id, cam_id)] = {"map": seat_map, "occupied": {}, "history": {}, "rounds": 0}
+    with _analysis_cond:
+        analysis_cache.pop((lab_id, cam_id), None)   # ผลเดิม assign ด้วย map เก่า
+    return jsonify({"ok": True, "lab_id": lab_id, "cam_id": cam_id, "total": len(seat_map)})
 
 
 # ✅ API 5: ดึงข้อมูลสถิติย้อนหลังสำหรับกราฟ
 @app.route("/api/stats/<lab_id>")
 def get_stats_history(lab_id):
-    if lab_id not in stats_history:
+    limit = request.args.get("limit", MAX_HISTORY, type=int)
+    history = stats_store.recent_stats(lab_id, max(1, limit))
+    if not history:
         return jsonify({
             "lab_id": lab_id,
             "history": [],
             "labels": []
         })
-    
-    history = list(stats_history[lab_id])
+
     labels = [item["time"] for item in history]
     attention_rates = [item["attention_rate"] for item in history]
     people_counts = [item["total_people"] for item in history]
@@ -312,33 +860,72 @@ def get_stats_history(lab_id):
     })
 
 
+# ✅ API 5b: ประวัติช่วงยาวแบบ downsample (รายนาที/ชั่วโมง/วัน จาก rollup)
+HISTORY_DEFAULT_SPAN   = 86400   # ไม่ระบุ from → ย้อนหลัง 1 วัน
+HISTORY_DEFAULT_POINTS = 500
+EXPORT_MAX_POINTS      = 2000    # /api/export — จุดใน history สูงสุด (เกินนี้ใช้ rollup แทน sample ดิบ)
+
+
+@app.route("/api/history/<lab_id>")
+def get_long_history(lab_id):
+    """
+    ?from=&to= (epoch วินาที), ?resolution=auto|raw|minute|hour|day, ?points= (จำนวนจุดสูงสุดสำหรับ auto)
+    """
+    end   = request.args.get("to", time.time(), type=float)
+    start = request.args.get("from", end - HISTORY_DEFAULT_SPAN, type=float)
+    resolution = request.args.get("resolution", "auto")
+    points = request.args.get("points", HISTORY_DEFAULT_POINTS, type=int)
+    if resolution != "auto" and resolution not in RESOLUTIONS:
+        return jsonify({"error": f"resolution ต้องเป็น auto หรือ {', '.join(RESOLUTIONS)}"}), 400
+    if start > end or points < 1:
+        return jsonify({"error": "ช่วงเวลาหรือ points ไม่ถูกต้อง"}), 400
+
+    resolution, history = stats_store.history(lab_id, start, end, resolution, points)
+    return jsonify({
+        "lab_id": lab_id,
+        "from": start,
+        "to": end,
+        "resolution": resolution,
+        "labels": [item["time"] for item in history],
+        "attention_rates": [item["attention_rate"] for item in history],
+        "people_counts": [item["total_people"] for item in history],
+        "history": history,
+    })
+
+
 # ✅ API 6: ดึง Activity Log
 @app.route("/api/activities/<lab_id>")
 def get_activities(lab_id):
-    if lab_id not in activity_log:
-        return jsonify({"lab_id": lab_id, "activities": []})
-    
+    limit = request.args.get("limit", MAX_ACTIVITY, type=int)
     return jsonify({
         "lab_id": lab_id,
-        "activities": list(activity_log[lab_id])
+        "activities": stats_store.recent_activities(lab_id, max(1, limit))
     })
 
 
 # 📝 ฟังก์ชันบันทึกสถิติ (เรียกครั้งเดียวต่อ cache miss)
-def record_stats(lab_id, analysis):
-    if lab_id not in stats_history:
-        stats_history[lab_id] = deque(maxlen=MAX_HISTORY)
-        activity_log[lab_id] = deque(maxlen=20)
+def _record_activity(lab_id, ts, type_, message):
+    stats_store.record_activity(lab_id, ts, type_, message)
+    events.publish("activity", {
+        "lab_id": lab_id, "time": datetime.fromtimestamp(ts).strftime("%H:%M:%S"),
+        "ts": ts, "type": type_, "message": message,
+    }, lab_id)
 
-    now = datetime.now()
-    time_str = now.strftime("%H:%M:%S")
 
-    stats_history[lab_id].append({
-        "time": time_str,
+# แค่ใส่คิวของ stats_store — writer thread commit เป็น batch เอง ไม่มี disk I/O ตรงนี้
+def record_stats(lab_id, analysis):
+    ts = time.time()
+    stats_store.record_stats(lab_id, ts, analysis["attention_rate"],
+                             analysis["total_people"], analysis["summary"])
+    point = {
+        "time":           datetime.fromtimestamp(ts).strftime("%H:%M:%S"),
+        "ts":             ts,
         "attention_rate": analysis["attention_rate"],
-        "total_people": analysis["total_people"],
-        "summary": analysis["summary"]
-    })
+        "total_people":   analysis["total_people"],
+        "summary":        analysis["summary"],
+    }
+    events.publish("stats", {"lab_id": lab_id, **point}, lab_id)
+    events.publish("overview", {"lab_id": lab_id, **_overview_info(point)}, lab_id)
 
     summary      = analysis["summary"]
     sleeping     = summary.get("sleeping", 0)
@@ -347,43 +934,59 @@ def record_stats(lab_id, analysis):
     # • แจ้งเตือนนักศึกษาหลับ
     if sleeping > 0:
         msg = f"⚠️ ห้อง {lab_id}: ตรวจพบนักศึกษาหลับ {sleeping} คน"
-        activity_log[lab_id].appendleft({"time": time_str, "type": "warning", "message": msg})
-        push_alert(lab_id, "warning", msg)
+        _record_activity(lab_id, ts, "warning", msg)
+        push_alert(lab_id, "warning", msg, ts)
 
     # • แจ้งเตือนความตั้งใจต่ำ
     if analysis["attention_rate"] < 50 and analysis["total_people"] > 0:
         msg = f"🔴 ห้อง {lab_id}: ความตั้งใจต่ำ ({analysis['attention_rate']}%)"
-        activity_log[lab_id].appendleft({"time": time_str, "type": "alert", "message": msg})
-        push_alert(lab_id, "alert", msg)
+        _record_activity(lab_id, ts, "alert", msg)
+        push_alert(lab_id, "alert", msg, ts)
 
     # • แจ้งเตือนถือโทรศัพท์จำนวนมาก
     if looking_down >= 3:
         msg = f"📱 ห้อง {lab_id}: นักศึกษาก้มหน้า/โทรศัพท์ {looking_down} คน"
-        push_alert(lab_id, "info", msg)
-
-    # • บันทึกลง disk
-    save_stats()
+        push_alert(lab_id, "info", msg, ts)
 
 
 # ✅ API 7: ส่งออกข้อมูลรายงานแบบครบถ้วน
 @app.route("/api/export/<lab_id>")
 def export_lab_data(lab_id):
-    history = list(stats_history.get(lab_id, []))
-    activities = list(activity_log.get(lab_id, []))
-
-    avg_attention = round(sum(h["attention_rate"] for h in history) / len(history), 1) if history else 0
-    avg_people = round(sum(h["total_people"] for h in history) / len(history), 1) if history else 0
-    max_people = max((h["total_people"] for h in history), default=0)
-    latest = history[-1] if history else None
+    """
+    ?from=&to= (epoch วินาที) — ไม่ระบุ from = ย้อนหลัง HISTORY_DEFAULT_SPAN (ไม่ส่ง sample ทั้งหมดที่เคยบันทึก)
+    history เลือก resolution แบบเดียวกับ /api/history (?resolution=, ?points=) — summary คำนวณจาก rollup
+    """
+    end   = request.args.get("to", time.time(), type=float)
+    start = request.args.get("from", end - HISTORY_DEFAULT_SPAN, type=float)
+    resolution = request.args.get("resolution", "auto")
+    points = request.args.get("points", EXPORT_MAX_POINTS, type=int)
+    if resolution != "auto" and resolution not in RESOLUTIONS:
+        return jsonify({"error": f"resolution ต้องเป็น auto หรือ {', '.join(RESOLUTIONS)}"}), 400
+    if start > end or points < 1:
+        return jsonify({"error": "ช่วงเวลาหรือ points ไม่ถูกต้อง"}), 400
+
+    resolution, history = stats_store.history(lab_id, start, end, resolution, points)
+    activities = stats_store.recent_activities(lab_id, MAX_ACTIVITY)
+    agg        = stats_store.aggregate_stats(lab_id, start, end)
+
+    avg_attention = round(agg["avg_attention"], 1)
+    avg_people = round(agg["avg_people"], 1)
+    max_people = agg["max_people"]
+    latest = stats_store.latest_stats(lab_id, end)
+    if latest and latest["ts"] < start:
+        latest = None
 
     return jsonify({
         "lab_id": lab_id,
         "export_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "from": start,
+        "to": end,
+        "resolution": resolution,
         "summary": {
             "avg_attention_rate": avg_attention,
             "avg_people": avg_people,
             "max_people": max_people,
-            "total_records": len(history),
+            "total_records": agg["count"],
             "latest_attention_rate": latest["attention_rate"] if latest else 0,
             "latest_total_people": latest["total_people"] if latest else 0,
             "latest_summary": latest["summary"] if latest else {
@@ -406,48 +1009,131 @@ def get_alerts():
 # ✅ API 9: สรุปทุกห้องสำหรับ Overview
 @app.route("/api/overview")
 def get_overview():
-    all_labs = sorted(set(list(stats_history.keys()) + ["9226", "9227"]))
+    all_labs = sorted(set(stats_store.labs() + ["9226", "9227"]))
     result = {}
     for lab_id in all_labs:
-        history = list(stats_history.get(lab_id, []))
-        latest  = history[-1] if history else None
-        result[lab_id] = {
-            "total_people":   latest["total_people"]   if latest else 0,
-            "attention_rate": latest["attention_rate"] if latest else 0,
-            "summary":        latest["summary"]        if latest else None,
-            "has_data":       latest is not None,
-            "last_updated":   latest["time"]           if latest else "--:--",
-        }
+        result[lab_id] = _overview_info(stats_store.latest_stats(lab_id))
     return jsonify({"labs": result})
 
 
+def _overview_info(latest):
+    """ข้อมูล overview card ของห้องจาก stats ล่าสุด (ใช้ทั้ง /api/overview และ event "overview")"""
+    return {
+        "total_people":   latest["total_people"]   if latest else 0,
+        "attention_rate": latest["attention_rate"] if latest else 0,
+        "summary":        latest["summary"]        if latest else None,
+        "has_data":       latest is not None,
+        "last_updated":   latest["time"]           if latest else "--:--",
+    }
+
+
+# ✅ API 10: Server-Sent Events — push แทนการ poll
+@app.route("/api/events")
+def stream_events():
+    """
+    ?labs=9226,9227  กรองเฉพาะห้อง (ไม่ระบุ = ทุกห้อง)
+    ?types=stats,alert  กรองชนิด event: analysis, stats, activity, alert, overview
+    ?all_labs=alert  ชนิด event ที่ส่งจากทุกห้องแม้กรอง labs ไว้
+    resume ด้วย header Last-Event-ID (EventSource ส่งให้เองตอน reconnect) หรือ ?last_event_id=
+    """
+    def split(name):
+        value = request.args.get(name, "")
+        return {v.strip() for v in value.split(",") if v.strip()} or None
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    return Response(events.subscribe(split("labs"), split("types"), last_id, split("all_labs")),
+                    mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 # ─── MJPEG Streaming ─────────────────────────────────────────────────────────
-def _gen_mjpeg(lab_id, cam_id):
-    """Generator สำหรับ MJPEG stream (~25 FPS)"""
-    idle = 0
-    while True:
-        # หยุด stream ถ้า source ถูกลบไปแล้ว
-        if (lab_id, cam_id) not in frame_buffers:
-            break
-        frame = get_live_frame(lab_id, cam_id)
-        if frame is None:
-            time.sleep(0.05)
-            idle += 1
-            if idle > 100:  # รอ frame นานเกิน 5 วินาที — หยุด
-                print(f"⏱️ MJPEG stream หมดเวลารอ frame: {lab_id}/{cam_id}")
-                break
-            continue
-        idle = 0
-        _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-        yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
-        time.sleep(1 / 25)
+# encode ครั้งเดียวต่อ frame ต่อกล้อง แล้วกระจาย bytes เดียวกันให้ทุก viewer
+# broadcasters: { ((lab_id, cam_id), "raw" | "annotated"): MjpegBroadcaster }
+broadcasters: dict = {}
+_broadcasters_lock = threading.Lock()
+STREAM_JPEG_QUALITY = 80
+STREAM_MAX_FPS      = 25
+
+
+def _raw_frame_waiter(key):
+    """รอ frame ใหม่จาก ring buffer ของกล้อง — token = (ring, seq)"""
+    def wait(token, timeout):
+        buf = frame_buffers.get(key)
+        if not buf or not buf["running"]:
+            return token, None
+        ring = buf["ring"]
+        seq = token[1] if token and token[0] is ring else 0
+        seq, view = ring.wait_newer(seq, timeout)
+        return (ring, seq), view
+    return wait
+
+
+def _annotated_frame_waiter(key):
+    """
+    รอผลวิเคราะห์ใหม่ใน analysis_cache — token = (entry, ts) ที่ส่งไปแล้ว; คืน JPEG ที่ cache ไว้ (ไม่ encode ซ้ำ)
+    รอบที่ gating ใช้ผลเดิม (ts ใหม่ entry เดิม) ส่ง JPEG เดิมซ้ำ — stream ของห้องนิ่งไม่หมดเวลา
+    """
+    def fresh(token):
+        entry = analysis_cache.get(key)
+        return entry is not None and (token is None or entry is not token[0] or entry["ts"] != token[1])
+
+    def wait(token, timeout):
+        with _analysis_cond:
+            ok = _analysis_cond.wait_for(lambda: fresh(token), timeout)
+            entry = analysis_cache.get(key)
+            ts = entry["ts"] if entry is not None else None
+        if not ok:
+            return token, None
+        lab_id, cam_id = key
+        return (entry, ts), _render_jpeg(lab_id, cam_id, entry["result"], "behavior", STREAM_JPEG_QUALITY)[1]
+    return wait
+
+
+def _stream_missing(lab_id, cam_id, annotated):
+    """ข้อความ error (404) ถ้ากล้องไม่มีอะไรให้ stream — annotated ต้องมี analysis worker, raw ต้องมี source"""
+    if annotated:
+        return None if (lab_id, cam_id) in analysis_workers else "No live analysis"
+    return None if (lab_id, cam_id) in frame_buffers else "No live source"
+
+
+def _get_broadcaster(lab_id, cam_id, mode):
+    key = (lab_id, cam_id)
+    with _broadcasters_lock:
+        b = broadcasters.get((key, mode))
+        if b is None:
+            if mode == "annotated":
+                waiter = _annotated_frame_waiter(key)
+                # annotated มาตามรอบ analysis — ADAPTIVE_RATE ยืดรอบได้ถึง max_interval (ห้องว่าง/นิ่ง) ต้องรอนานกว่านั้น
+                if ADAPTIVE_RATE:
+                    idle = max(5.0, 2 * rate_controller.max_interval)
+                else:
+                    fps  = analysis_workers.get(key, {}).get("fps", ANALYSIS_FPS)
+                    idle = max(5.0, 3.0 / fps)
+            else:
+                waiter, idle = _raw_frame_waiter(key), 5.0
+            b = MjpegBroadcaster(waiter, quality=STREAM_JPEG_QUALITY, max_fps=STREAM_MAX_FPS,
+                                 idle_timeout=idle, name=f"{lab_id}/{cam_id} ({mode})")
+            broadcasters[(key, mode)] = b
+        return b
 
 
 @app.route("/api/stream/<lab_id>/<int:cam_id>")
 def stream_camera(lab_id, cam_id):
-    """MJPEG streaming endpoint — browser แสดงผลแบบ live"""
+    """
+    MJPEG streaming endpoint — browser แสดงผลแบบ live
+    ?annotated=1 เพื่อ stream ภาพพร้อม behavior annotation แทนภาพดิบ
+    """
+    annotated = request.args.get("annotated", "0").lower() in ("1", "true", "yes")
+    missing = _stream_missing(lab_id, cam_id, annotated)
+    if missing:
+        return jsonify({"error": missing}), 404
+    b = _get_broadcaster(lab_id, cam_id, "annotated" if annotated else "raw")
     return Response(
-        _gen_mjpeg(lab_id, cam_id),
+        b.subscribe(),
         mimetype="multipart/x-mixed-replace; boundary=frame",
     )
 
@@ -457,7 +1143,12 @@ def stream_camera(lab_id, cam_id):
 def get_sources():
     """แสดงรายการ video sources ที่กำหนดไว้"""
     result = {
-        f"{lid}/{cid}": {"source": src}
+        f"{lid}/{cid}": {
+            "source": src,
+            "analysis_fps": analysis_workers.get((lid, cid), {}).get("fps"),
+            "pose_every_n": analysis_workers.get((lid, cid), {}).get("pose_every_n"),
+            "capture_state": frame_buffers[(lid, cid)]["capture"].state if (lid, cid) in frame_buffers else None,
+        }
         for (lid, cid), src in video_sources.items()
     }
     return jsonify(result)
@@ -465,25 +1156,277 @@ def get_sources():
 
 @app.route("/api/sources/<lab_id>/<int:cam_id>", methods=["POST"])
 def set_source(lab_id, cam_id):
-    """ตั้ง video source: {\"source\": 0} สำหรับ webcam หรือ {\"source\": \"path/video.mp4\"}"""
+    """
+    ตั้ง video source: {\"source\": 0} สำหรับ webcam หรือ {\"source\": \"path/video.mp4\"}
+    กำหนดอัตราวิเคราะห์ได้ด้วย {\"analysis_fps\": 2} (ค่าเริ่มต้น ANALYSIS_FPS)
+    — เมื่อเปิด ADAPTIVE_RATE ค่านี้เป็นเพดาน รอบจริงมาจาก rate_controller (/api/schedule)
+    และความไวของ change gating ด้วย {\"change_threshold\": 1.5} (ค่าเริ่มต้น CHANGE_THRESHOLD)
+    รัน pose ทุก N รอบด้วย {\"pose_every_n\": 3} (ค่าเริ่มต้น POSE_EVERY_N)
+    แบ่ง tile ด้วย {\"tiles\": {\"rows\": 2, \"cols\": 3, \"overlap\": 0.2}} (ดู /api/tiles)
+    normalize แสงด้วย {\"preprocess\": \"gamma\"} (ค่าเริ่มต้น PREPROCESS_MODE, ดู /api/preprocess)
+    RTSP/HTTP: {\"source\": \"rtsp://...\"} — ไม่ทดสอบเปิดก่อน (หลุด/ยังไม่พร้อมก็ reconnect เอง)
+    decode {\"decode_fps\": 10} (ค่าเริ่มต้น CAPTURE_DECODE_FPS) และย่อ {\"max_width\": 1920}
+    """
     body = request.get_json(force=True, silent=True) or {}
     source = body.get("source")
     if source is None:
         return jsonify({"error": "Missing 'source' field"}), 400
+    analysis_fps = body.get("analysis_fps")
+    if analysis_fps is not None:
+        try:
+            analysis_fps = float(analysis_fps)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid 'analysis_fps'"}), 400
+        if analysis_fps <= 0:
+            return jsonify({"error": "'analysis_fps' must be > 0"}), 400
+    try:
+        pose_every_n = int(body.get("pose_every_n") or POSE_EVERY_N)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid 'pose_every_n'"}), 400
+    if pose_every_n < 1:
+        return jsonify({"error": "'pose_every_n' must be >= 1"}), 400
+    change_threshold = body.get("change_threshold")
+    if change_threshold is not None:
+        try:
+            change_threshold = float(change_threshold)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid 'change_threshold'"}), 400
+    tiles = body.get("tiles")
+    if tiles is not None:
+        try:
+            tiles = TileLayout.from_dict(tiles)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid 'tiles': {e}"}), 400
+    preprocess = body.get("preprocess")
+    if preprocess is not None and preprocess not in PREPROCESS_MODES:
+        return jsonify({"error": f"Invalid 'preprocess' (เลือกจาก {list(PREPROCESS_MODES)})"}), 400
+    capture_opts = {}
+    for name, cast in (("decode_fps", float), ("max_width", int)):
+        if body.get(name) is None:
+            continue
+        try:
+            capture_opts[name] = cast(body[name])
+        except (TypeError, ValueError):
+            return jsonify({"error": f"Invalid '{name}'"}), 400
+        if capture_opts[name] <= 0:
+            return jsonify({"error": f"'{name}' must be > 0"}), 400
     # แปลง string ตัวเลขเป็น int (webcam index)
     if isinstance(source, str) and source.isdigit():
         source = int(source)
 
-    # ตรวจสอบก่อนว่าเปิดได้จริง — คืน error ทันทีถ้าไม่ได้
-    test_cap = cv2.VideoCapture(source)
-    if not test_cap.isOpened():
+    # ไฟล์/webcam ตรวจสอบก่อนว่าเปิดได้จริง — คืน error ทันทีถ้าไม่ได้
+    if source_kind(source) != "network":
+        test_cap = cv2.VideoCapture(source)
+        if not test_cap.isOpened():
+            test_cap.release()
+            label = f"webcam {source}" if isinstance(source, int) else source
+            return jsonify({"error": f"ไม่สามารถเปิดได้: {label}"}), 400
         test_cap.release()
-        label = f"webcam {source}" if isinstance(source, int) else source
-        return jsonify({"error": f"ไม่สามารถเปิดได้: {label}"}), 400
-    test_cap.release()
 
-    _start_capture(lab_id, cam_id, source)
-    return jsonify({"ok": True, "lab_id": lab_id, "cam_id": cam_id, "source": source})
+    _start_capture(lab_id, cam_id, source, analysis_fps, pose_every_n, **capture_opts)
+    _gate.set_threshold((lab_id, cam_id), change_threshold)
+    if tiles is not None:
+        tile_layouts[(lab_id, cam_id)] = tiles
+    if preprocess is not None:
+        preprocess_modes[(lab_id, cam_id)] = preprocess
+    return jsonify({"ok": True, "lab_id": lab_id, "cam_id": cam_id, "source": source,
+                    "analysis_fps": analysis_fps or ANALYSIS_FPS, "pose_every_n": pose_every_n,
+                    "tiles": tiles.to_dict() if tiles else None,
+                    "preprocess": preprocess_modes.get((lab_id, cam_id), PREPROCESS_MODE)})
+
+
+@app.route("/api/tiles/<lab_id>/<int:cam_id>", methods=["GET", "PUT"])
+def tile_layout(lab_id, cam_id):
+    """
+    GET: tile layout ของกล้อง (null = ทั้งเฟรม)
+    PUT: {\"rows\": 2, \"cols\": 3, \"overlap\": 0.2, \"full_frame\": true} — body null/{} ปิด tiling
+    """
+    key = (lab_id, cam_id)
+    if request.method == "PUT":
+        body = request.get_json(force=True, silent=True)
+        if not body:
+            tile_layouts.pop(key, None)
+        else:
+            try:
+                tile_layouts[key] = TileLayout.from_dict(body)
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid tile layout: {e}"}), 400
+        with _analysis_cond:
+            analysis_cache.pop(key, None)   # ผลเดิมวิเคราะห์ด้วย layout เก่า
+    layout = tile_layouts.get(key)
+    return jsonify({"lab_id": lab_id, "cam_id": cam_id, "tiles": layout.to_dict() if layout else None})
+
+
+@app.route("/api/preprocess/<lab_id>/<int:cam_id>", methods=["GET", "PUT"])
+def preprocess_mode(lab_id, cam_id):
+    """
+    GET: โหมด normalize แสงของกล้อง + โหมดที่เลือกได้
+    PUT: {\"mode\": \"clahe_ycrcb\"} — body null/{} กลับไปใช้ PREPROCESS_MODE
+    """
+    key = (lab_id, cam_id)
+    if request.method == "PUT":
+        body = request.get_json(force=True, silent=True)
+        mode = (body or {}).get("mode")
+        if mode is None:
+            preprocess_modes.pop(key, None)
+        elif mode not in PREPROCESS_MODES:
+            return jsonify({"error": f"Invalid mode (เลือกจาก {list(PREPROCESS_MODES)})"}), 400
+        else:
+            preprocess_modes[key] = mode
+        with _analysis_cond:
+            analysis_cache.pop(key, None)   # ผลเดิมวิเคราะห์ด้วยโหมดเก่า
+    return jsonify({"lab_id": lab_id, "cam_id": cam_id,
+                    "mode": preprocess_modes.get(key, PREPROCESS_MODE), "modes": list(PREPROCESS_MODES)})
+
+
+@app.route("/api/capture")
+def get_capture_stats():
+    """สถานะ capture ต่อกล้อง: fps_in / fps_decoded / drops / errors / reconnects / state"""
+    return jsonify({f"{lid}/{cid}": buf["capture"].stats()
+                    for (lid, cid), buf in list(frame_buffers.items())})
+
+
+@app.route("/api/schedule", methods=["GET", "PUT"])
+def inference_schedule():
+    """
+    GET: รอบวิเคราะห์ปัจจุบันของแต่ละกล้อง (interval, latency, activity, state) + งบ CPU/โหลด
+    PUT: ปรับ {\"adaptive\": bool, \"cpu_budget\": 0.5, \"base_interval\", \"min_interval\", \"max_interval\"}
+    """
+    global ADAPTIVE_RATE
+    if request.method == "PUT":
+        body = request.get_json(force=True, silent=True) or {}
+        updates = {}
+        for name in ("cpu_budget", "base_interval", "min_interval", "max_interval"):
+            if body.get(name) is None:
+                continue
+            try:
+                updates[name] = float(body[name])
+            except (TypeError, ValueError):
+                return jsonify({"error": f"Invalid '{name}'"}), 400
+            if updates[name] <= 0:
+                return jsonify({"error": f"'{name}' must be > 0"}), 400
+        lo = updates.get("min_interval", rate_controller.min_interval)
+        hi = updates.get("max_interval", rate_controller.max_interval)
+        if lo > hi:
+            return jsonify({"error": "'min_interval' must be <= 'max_interval'"}), 400
+        for name, value in updates.items():
+            setattr(rate_controller, name, value)
+        if "adaptive" in body:
+            ADAPTIVE_RATE = bool(body["adaptive"])
+    schedule = rate_controller.schedule()
+    schedule["cameras"] = {f"{lid}/{cid}": cam for (lid, cid), cam in schedule["cameras"].items()}
+    return jsonify({"adaptive": ADAPTIVE_RATE, **schedule})
+
+
+@app.route("/api/gating")
+def get_gating_stats():
+    """ตัวนับ change gating ต่อกล้อง: analyzed / skipped / threshold"""
+    return jsonify({
+        "enabled": CHANGE_GATING,
+        "cameras": {f"{lid}/{cid}": st for (lid, cid), st in _gate.stats().items()},
+    })
+
+
+@app.route("/api/inference-queue")
+def get_inference_queue_stats():
+    """สถานะ admission control ของ inference จาก HTTP request (งานที่รัน/รอคิว, จำนวนที่ตอบ 503)"""
+    return jsonify({**_inference_executor.stats(), "coalesced": _analysis_flight.coalesced,
+                    "cached": len(analysis_cache)})
+
+
+@app.route("/api/inference-pool")
+def get_pool_stats():
+    """สถานะ process pool: worker ที่ยังทำงาน, จำนวนงาน, จำนวนครั้งที่ restart"""
+    if _pool is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **_pool.stats()})
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+@app.before_request
+def _start_request_timer():
+    if METRICS_ENABLED:
+        g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _observe_request(response):
+    """
+    เวลาของ handler ต่อ route (ไม่ใช่ต่อ URL) — stream (SSE/MJPEG) นับถึงตอนเริ่มส่ง
+    URL ที่ไม่ตรง route ใด = "unmatched"; lab_id/cam_id เฉพาะ response ที่สำเร็จของกล้อง/ห้องที่มีอยู่จริง
+    """
+    started = g.pop("request_started", None)
+    if started is not None:
+        rule = request.url_rule.rule if request.url_rule else "unmatched"
+        args = request.view_args or {}
+        labels = ("", "")
+        if response.status_code < 400 and "lab_id" in args:
+            if "cam_id" in args:
+                labels = _camera_labels((args["lab_id"], args["cam_id"]))
+            elif _known_lab(args["lab_id"]):
+                labels = (args["lab_id"], "")
+        method = request.method if request.url_rule else "other"
+        http_seconds.observe((rule, method, str(response.status_code)) + labels,
+                             time.perf_counter() - started)
+    return response
+
+
+def _collect_component_metrics():
+    """ตัวนับที่ component อื่นเก็บไว้อยู่แล้ว — อ่านเฉพาะตอน scrape"""
+    captures = [(key, buf["capture"].stats()) for key, buf in list(frame_buffers.items())
+                if buf.get("capture") is not None]
+    gates = _gate.stats()
+    queue = _inference_executor.stats()
+    cam = ("lab_id", "cam_id")
+
+    def per_capture(field):
+        return [(key, st[field]) for key, st in captures]
+
+    return [
+        ("classmood_capture_streaming", "gauge", "1 if the capture source is currently streaming", cam,
+         [(key, st["state"] == "streaming") for key, st in captures]),
+        ("classmood_capture_hw_decode", "gauge", "1 if hardware decode is active", cam, per_capture("hw_decode")),
+        ("classmood_capture_fps_in", "gauge", "Frames grabbed per second", cam, per_capture("fps_in")),
+        ("classmood_capture_fps_decoded", "gauge", "Frames decoded per second", cam, per_capture("fps_decoded")),
+        ("classmood_capture_last_frame_age_seconds", "gauge", "Seconds since the last decoded frame", cam,
+         per_capture("last_frame_age")),
+        ("classmood_capture_frames_in_total", "counter", "Frames grabbed", cam, per_capture("frames_in")),
+        ("classmood_capture_frames_decoded_total", "counter", "Frames decoded", cam,
+         per_capture("frames_decoded")),
+        ("classmood_capture_drops_total", "counter", "Frames grabbed but not decoded (above decode_fps)", cam,
+         per_capture("drops")),
+        ("classmood_capture_errors_total", "counter", "Failed grab/retrieve calls", cam, per_capture("errors")),
+        ("classmood_capture_reconnects_total", "counter", "Capture reconnects", cam, per_capture("reconnects")),
+        ("classmood_capture_decode_seconds_total", "counter", "Time spent decoding and resizing frames", cam,
+         per_capture("decode_seconds")),
+        ("classmood_gate_frames_total", "counter", "Frames seen by change gating by result", cam + ("result",),
+         [(key + (result,), counters[result]) for key, counters in gates.items()
+          for result in ("analyzed", "skipped")]),
+        ("classmood_analysis_interval_seconds", "gauge", "Current analysis interval per camera", cam,
+         [(key, rate_controller.interval(key) if ADAPTIVE_RATE else 1.0 / worker["fps"])
+          for key, worker in list(analysis_workers.items())]),
+        ("classmood_analysis_cache_entries", "gauge", "Cameras held in the analysis cache", (),
+         [((), len(analysis_cache))]),
+        ("classmood_inference_pending", "gauge", "HTTP-triggered inferences running or queued", (),
+         [((), queue["pending"])]),
+        ("classmood_inference_submitted_total", "counter", "HTTP-triggered inferences admitted", (),
+         [((), queue["submitted"])]),
+        ("classmood_inference_rejected_total", "counter", "HTTP-triggered inferences rejected with 503", (),
+         [((), queue["rejected"])]),
+        ("classmood_inference_coalesced_total", "counter", "Cache misses served by another request's inference",
+         (), [((), _analysis_flight.coalesced)]),
+        ("classmood_stats_commits_total", "counter", "Stats store commits", (), [((), stats_store.commits)]),
+        ("classmood_stats_rows_total", "counter", "Rows written by the stats store", (), [((), stats_store.rows)]),
+    ]
+
+
+metrics.add_collector(_collect_component_metrics)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus text format — stage/HTTP histogram ต่อกล้อง, cache hit/miss, capture fps/drops, คิว inference"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 
 @app.route("/api/sources/<lab_id>/<int:cam_id>", methods=["DELETE"])
@@ -493,8 +1436,58 @@ def delete_source(lab_id, cam_id):
     return jsonify({"ok": True})
 
 
-# ✅ โหลดข้อมูลเดิมเมื่อ server เริ่ม
-load_stats()
+# ─── Startup / Health ─────────────────────────────────────────────────────────
+def _warmup_frame():
+    """ภาพทดสอบภาพแรก (ขนาดใกล้ของจริง) — ไม่มีก็ใช้ภาพดำ 720p"""
+    for lab_id, cam_id in (("9226", 1), ("9227", 1)):
+        path = _get_image_path(lab_id, cam_id)
+        frame = cv2.imread(path) if path else None
+        if frame is not None:
+            return frame
+    return np.zeros((720, 1280, 3), dtype=np.uint8)
+
+
+def _warmup_steps():
+    """phase ของ warm-up ตามการตั้งค่า — pool โหลดโมเดลใน worker process แทน process นี้"""
+    frame = _warmup_frame()
+    steps = []
+    if _pool is not None:
+        steps.append(("inference_pool", lambda: _pool.warm_up(frame)))
+    else:
+        steps.append(("pose_model", get_pose_model))
+        steps.append(("pose_warmup", lambda: analyze_frames([frame])))
+    if USE_DETECTION_MODEL:
+        steps.append(("detection_model", get_detection_model))
+        steps.append(("detection_warmup", lambda: get_detection_model()(frame, verbose=False)))
+    return steps
+
+
+def start_warmup():
+    """เริ่มโหลด/warm-up โมเดลใน background (เรียกครั้งเดียวตอน server เริ่ม — ดู __main__ และ asgi.py)"""
+    if startup.state != "starting":
+        return
+    if WARMUP_ON_START:
+        startup.run_background(_warmup_steps())
+    else:
+        startup.mark_ready()
+
+
+@app.route("/api/health")
+def health():
+    """liveness — process ตอบ request ได้ (ไม่รอโมเดล)"""
+    return jsonify({"ok": True, "state": startup.state, "uptime": startup.status()["uptime"]})
+
+
+@app.route("/api/ready")
+def ready():
+    """readiness — 200 เมื่อโหลดโมเดล + warm-up เสร็จ (503 ระหว่างรอ) พร้อมเวลาแต่ละ phase"""
+    status = startup.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
+# ✅ เตรียมฐานข้อมูลสถิติเมื่อ server เริ่ม
+with startup.phase("stats_store"):
+    init_stats_store()
 
 
 # ✅ หน้าเว็บหลัก
@@ -509,4 +1502,7 @@ def static_files(path):
 
 
 if __name__ == "__main__":
+    # debug reloader รัน module นี้สองรอบ (process ที่เฝ้าไฟล์ + process ที่ serve จริง) — warm-up เฉพาะตัวที่ serve
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
     app.run(debug=True, threaded=True)
@@ -0,0 +1,82 @@
+"""
+🚀 Startup - จับเวลาแต่ละ phase ตอน server เริ่ม + สถานะ readiness
+  - phase แบบ sync (import, stats store) บันทึกด้วย record() / phase()
+  - งานหนัก (โหลดโมเดล + warm-up inference) รันใน background thread ด้วย run_background()
+    server รับ request ได้ทันที — /api/health ตอบเลย, /api/ready ตอบ 503 จนทุก phase เสร็จ
+  - phase ที่ล้มเหลวถูกบันทึก error ไว้ (ready = False) แต่ไม่ทำให้ process ล้ม
+    request ที่ต้องใช้โมเดลยังโหลดเองได้ตามปกติ (get_pose_model)
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTracker:
+    def __init__(self):
+        self.started  = time.time()
+        self.phases   = {}     # name → {"seconds": float | None, "state": "running" | "done" | "failed", "error"}
+        self.state    = "starting"   # starting | warming | ready | degraded
+        self.ready_ts = None
+        self._lock    = threading.Lock()
+
+    def record(self, name, seconds, error=None):
+        with self._lock:
+            self.phases[name] = {"seconds": round(seconds, 3), "state": "failed" if error else "done",
+                                 "error": error}
+
+    @contextmanager
+    def phase(self, name):
+        """จับเวลา phase — exception ถูกบันทึกแล้วส่งต่อ"""
+        with self._lock:
+            self.phases[name] = {"seconds": None, "state": "running", "error": None}
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, time.perf_counter() - t0, f"{type(e).__name__}: {e}")
+            raise
+        self.record(name, time.perf_counter() - t0)
+
+    def run_background(self, steps):
+        """
+        รัน steps [(name, fn), ...] ตามลำดับใน daemon thread — phase ที่พังไม่หยุด phase ถัดไป
+        ทุก phase เสร็จ → state "ready" (หรือ "degraded" ถ้ามี phase ที่ล้มเหลว)
+        """
+        def run():
+            for name, fn in steps:
+                try:
+                    with self.phase(name):
+                        fn()
+                    print(f"⏱️  {name}: {self.phases[name]['seconds']:.2f}s")
+                except Exception as e:
+                    print(f"⚠️  startup phase {name} ล้มเหลว: {e}")
+            with self._lock:
+                failed = any(p["state"] == "failed" for p in self.phases.values())
+                self.state    = "degraded" if failed else "ready"
+                self.ready_ts = time.time()
+            print(f"🚀 พร้อมใช้งานใน {self.ready_ts - self.started:.1f}s"
+                  + (" (บาง phase ล้มเหลว — ดู /api/ready)" if failed else ""))
+
+        with self._lock:
+            self.state = "warming"
+        threading.Thread(target=run, daemon=True, name="startup-warmup").start()
+
+    def mark_ready(self):
+        """ไม่มีงาน background (ปิด warm-up) — พร้อมทันที"""
+        with self._lock:
+            self.state    = "ready"
+            self.ready_ts = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "state":         self.state,
+                "ready":         self.state == "ready",
+                "uptime":        round(time.time() - self.started, 3),
+                "ready_seconds": round(self.ready_ts - self.started, 3) if self.ready_ts else None,
+                "phases":        {k: dict(v) for k, v in self.phases.items()},
+            }
@@ -0,0 +1,396 @@
+"""
+🗄️ Stats Store - เก็บสถิติ/activity/alert แบบ append-only ใน SQLite (WAL mode)
+  - แถวละหนึ่ง sample มี index (lab_id, ts) — query ช่วงเวลาได้โดยไม่ต้องโหลดทั้งหมดเข้า memory
+  - record_* แค่ใส่คิว — writer thread ตัวเดียว insert แล้ว commit เป็น batch (ไม่ทำ disk I/O บน request path)
+  - WAL: reader ไม่ block writer และ process ตายกลาง commit ไม่ทำให้ข้อมูลเก่าเสีย
+  - reader ใช้ connection ต่อ thread (sqlite3 connection แชร์ข้าม thread ไม่ได้)
+  - rollup รายนาที/ชั่วโมง/วัน (ROLLUP_TIERS) อัปเดตทีละ sample ใน transaction เดียวกับ insert
+    → query ช่วงยาวหลายเดือนอ่านแค่ไม่กี่ร้อยแถว
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stats (
+    id             INTEGER PRIMARY KEY,
+    lab_id         TEXT    NOT NULL,
+    ts             REAL    NOT NULL,
+    attention_rate REAL    NOT NULL,
+    total_people   INTEGER NOT NULL,
+    summary        TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stats_lab_ts ON stats (lab_id, ts);
+
+CREATE TABLE IF NOT EXISTS activities (
+    id      INTEGER PRIMARY KEY,
+    lab_id  TEXT NOT NULL,
+    ts      REAL NOT NULL,
+    type    TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_activities_lab_ts ON activities (lab_id, ts);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id      INTEGER PRIMARY KEY,
+    lab_id  TEXT NOT NULL,
+    ts      REAL NOT NULL,
+    type    TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_lab_ts ON alerts (lab_id, ts);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    lab_id        TEXT    NOT NULL,
+    tier          TEXT    NOT NULL,
+    bucket        REAL    NOT NULL,
+    samples       INTEGER NOT NULL,
+    sum_attention REAL    NOT NULL,
+    sum_people    INTEGER NOT NULL,
+    max_people    INTEGER NOT NULL,
+    sum_attentive    INTEGER NOT NULL,
+    sum_looking_down INTEGER NOT NULL,
+    sum_sleeping     INTEGER NOT NULL,
+    sum_looking_away INTEGER NOT NULL,
+    sum_unknown      INTEGER NOT NULL,
+    PRIMARY KEY (lab_id, tier, bucket)
+) WITHOUT ROWID;
+"""
+
+# ขนาด bucket (วินาที) ของแต่ละ tier — เรียงละเอียด → หยาบ
+ROLLUP_TIERS = {"minute": 60, "hour": 3600, "day": 86400}
+RESOLUTIONS  = ("raw", *ROLLUP_TIERS)
+SUMMARY_KEYS = ("attentive", "looking_down", "sleeping", "looking_away", "unknown")
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (lab_id, tier, bucket) DO UPDATE SET
+    samples          = samples + 1,
+    sum_attention    = sum_attention + excluded.sum_attention,
+    sum_people       = sum_people + excluded.sum_people,
+    max_people       = MAX(max_people, excluded.max_people),
+    sum_attentive    = sum_attentive + excluded.sum_attentive,
+    sum_looking_down = sum_looking_down + excluded.sum_looking_down,
+    sum_sleeping     = sum_sleeping + excluded.sum_sleeping,
+    sum_looking_away = sum_looking_away + excluded.sum_looking_away,
+    sum_unknown      = sum_unknown + excluded.sum_unknown
+"""
+
+_INSERT = {
+    "stats":      "INSERT INTO stats (lab_id, ts, attention_rate, total_people, summary) VALUES (?, ?, ?, ?, ?)",
+    "activities": "INSERT INTO activities (lab_id, ts, type, message) VALUES (?, ?, ?, ?)",
+    "alerts":     "INSERT INTO alerts (id, lab_id, ts, type, message) VALUES (?, ?, ?, ?, ?)",
+}
+
+
+def _time_str(ts):
+    return datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+
+
+def _stats_row(row):
+    """แถว stats → dict รูปแบบเดียวกับ stats_history เดิม (+ ts)"""
+    ts, attention_rate, total_people, summary = row
+    return {
+        "time":           _time_str(ts),
+        "ts":             ts,
+        "attention_rate": attention_rate,
+        "total_people":   total_people,
+        "summary":        json.loads(summary),
+    }
+
+
+def bucket_start(ts, seconds):
+    """จุดเริ่ม bucket ตามเวลาท้องถิ่น (วันเริ่มเที่ยงคืนของเครื่อง server ไม่ใช่ UTC)"""
+    offset = time.localtime(ts).tm_gmtoff
+    return (ts + offset) // seconds * seconds - offset
+
+
+def _rollup_row(row):
+    """แถว rollup → จุดเฉลี่ยของ bucket (key เดียวกับ _stats_row + samples/max_people)"""
+    bucket, samples, sum_att, sum_people, max_people, *sums = row
+    return {
+        "time":           datetime.fromtimestamp(bucket).strftime("%Y-%m-%d %H:%M"),
+        "ts":             bucket,
+        "samples":        samples,
+        "attention_rate": round(sum_att / samples, 1),
+        "total_people":   round(sum_people / samples, 1),
+        "max_people":     max_people,
+        "summary":        {k: round(v / samples, 1) for k, v in zip(SUMMARY_KEYS, sums)},
+    }
+
+
+def _event_row(row):
+    ts, type_, message = row
+    return {"time": _time_str(ts), "ts": ts, "type": type_, "message": message}
+
+
+class StatsStore:
+    """
+    Args:
+        path:            ไฟล์ SQLite
+        commit_interval: รวม insert ที่เข้าคิวภายในช่วงนี้ (วินาที) แล้ว commit ครั้งเดียว
+        max_batch:       commit ทันทีเมื่อคิวสะสมถึงจำนวนนี้
+        on_commit:       callback(วินาที, จำนวนแถว) หลัง commit แต่ละ batch (เช่น เก็บ metrics ของ disk I/O)
+    """
+
+    def __init__(self, path, commit_interval=0.5, max_batch=500, on_commit=None):
+        self.path            = path
+        self.commit_interval = commit_interval
+        self.max_batch       = max_batch
+        self.on_commit       = on_commit
+        self._queue          = queue.Queue()
+        self._local          = threading.local()
+        self._thread         = None
+        self._lock           = threading.Lock()
+        self.commits         = 0
+        self.rows            = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        self._backfill_rollups(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")   # WAL + NORMAL: ไม่เสียข้อมูลเก่า แค่อาจหาย batch ล่าสุดถ้าไฟดับ
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # ─── Writer ─────────────────────────────────────────────────
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer_loop, daemon=True,
+                                                 name="stats-store-writer")
+                self._thread.start()
+
+    def _put(self, table, params):
+        self._ensure_writer()
+        self._queue.put((table, params))
+
+    def _writer_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch, done = [], []
+            deadline = time.time() + self.commit_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    done.append(item)   # flush() — commit ทุกอย่างที่อยู่ก่อนหน้าแล้วปลุกผู้รอ
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break
+            if batch:
+                started = time.perf_counter()
+                try:
+                    for table, params in batch:
+                        conn.execute(_INSERT[table], params)
+                        if table == "stats":
+                            self._add_to_rollups(conn, *params)
+                    conn.commit()
+                    self.commits += 1
+                    self.rows    += len(batch)
+                    if self.on_commit is not None:
+                        self.on_commit(time.perf_counter() - started, len(batch))
+                except Exception as e:
+                    conn.rollback()
+                    print(f"⚠️ บันทึกข้อมูลลง SQLite ล้มเหลว ({len(batch)} แถว): {e}")
+            for ev in done:
+                ev.set()
+
+    @staticmethod
+    def _add_to_rollups(conn, lab_id, ts, attention_rate, total_people, summary_json):
+        summary = json.loads(summary_json)
+        counts  = [int(summary.get(k, 0)) for k in SUMMARY_KEYS]
+        for tier, seconds in ROLLUP_TIERS.items():
+            conn.execute(_UPSERT_ROLLUP, (lab_id, tier, bucket_start(ts, seconds),
+                                          attention_rate, total_people, total_people, *counts))
+
+    def _backfill_rollups(self, conn):
+        """ฐานข้อมูลที่มี stats ก่อนมี rollups — คำนวณ rollup ย้อนหลังครั้งเดียว"""
+        if conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is not None:
+            return
+        rows = conn.execute("SELECT lab_id, ts, attention_rate, total_people, summary FROM stats").fetchall()
+        if not rows:
+            return
+        for row in rows:
+            self._add_to_rollups(conn, *row)
+        conn.commit()
+        print(f"📈 สร้าง rollup ย้อนหลังจาก {len(rows)} sample")
+
+    def flush(self, timeout=5.0) -> bool:
+        """รอจนทุกแถวที่เข้าคิวก่อนหน้านี้ถูก commit แล้ว"""
+        self._ensure_writer()
+        ev = threading.Event()
+        self._queue.put(ev)
+        return ev.wait(timeout)
+
+    # ─── Append ─────────────────────────────────────────────────
+    def record_stats(self, lab_id, ts, attention_rate, total_people, summary):
+        self._put("stats", (lab_id, ts, attention_rate, total_people,
+                            json.dumps(summary, ensure_ascii=False)))
+
+    def record_activity(self, lab_id, ts, type_, message):
+        self._put("activities", (lab_id, ts, type_, message))
+
+    def record_alert(self, alert_id, lab_id, ts, type_, message):
+        self._put("alerts", (alert_id, lab_id, ts, type_, message))
+
+    # ─── Queries ────────────────────────────────────────────────
+    def recent_stats(self, lab_id, limit) -> list:
+        """sample ล่าสุด limit ตัว เรียงจากเก่า → ใหม่"""
+        rows = self._reader().execute(
+            "SELECT ts, attention_rate, total_people, summary FROM stats "
+            "WHERE lab_id = ? ORDER BY ts DESC LIMIT ?", (lab_id, limit)).fetchall()
+        return [_stats_row(r) for r in reversed(rows)]
+
+    def stats_range(self, lab_id, start=None, end=None) -> list:
+        """sample ทั้งหมดในช่วง [start, end] (epoch วินาที; None = ไม่จำกัด) เรียงตามเวลา"""
+        rows = self._reader().execute(
+            "SELECT ts, attention_rate, total_people, summary FROM stats "
+            "WHERE lab_id = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (lab_id, start if start is not None else float("-inf"),
+             end if end is not None else float("inf"))).fetchall()
+        return [_stats_row(r) for r in rows]
+
+    def latest_stats(self, lab_id, end=None):
+        """sample ล่าสุด (ไม่เกิน end ถ้ากำหนด) หรือ None"""
+        row = self._reader().execute(
+            "SELECT ts, attention_rate, total_people, summary FROM stats "
+            "WHERE lab_id = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+            (lab_id, end if end is not None else float("inf"))).fetchone()
+        return _stats_row(row) if row else None
+
+    def _rollup_totals(self, lab_id, tier, lo, hi) -> tuple:
+        """รวม bucket ของ tier ที่เริ่มใน [lo, hi) → (samples, sum_attention, sum_people, max_people)"""
+        return self._reader().execute(
+            "SELECT COALESCE(SUM(samples), 0), COALESCE(SUM(sum_attention), 0), COALESCE(SUM(sum_people), 0), "
+            "COALESCE(MAX(max_people), 0) FROM rollups "
+            "WHERE lab_id = ? AND tier = ? AND bucket >= ? AND bucket < ?", (lab_id, tier, lo, hi)).fetchone()
+
+    def aggregate_stats(self, lab_id, start=None, end=None) -> dict:
+        """
+        ค่าเฉลี่ย/สูงสุด/จำนวน sample ในช่วง [start, end] (None = ไม่จำกัด) — อ่านจาก rollup เท่านั้น
+        วันที่อยู่ในช่วงทั้งวันใช้ rollup รายวัน ส่วนหัว/ท้ายที่ไม่เต็มวันใช้รายนาที (ละเอียดระดับนาที)
+        → ช่วงยาวแค่ไหนก็อ่านไม่เกินราว 3,000 แถว
+        """
+        day, minute = ROLLUP_TIERS["day"], ROLLUP_TIERS["minute"]
+        lo = bucket_start(start, minute) if start is not None else float("-inf")
+        hi = bucket_start(end, minute) + minute if end is not None else float("inf")
+        first_day = lo if start is None else bucket_start(start, day)
+        if first_day < lo:
+            first_day += day
+        last_day = hi if end is None else bucket_start(end, day)   # วันที่เริ่มก่อนนี้อยู่ในช่วงทั้งวัน
+        if first_day < last_day:
+            parts = [self._rollup_totals(lab_id, "day", first_day, last_day),
+                     self._rollup_totals(lab_id, "minute", lo, first_day),
+                     self._rollup_totals(lab_id, "minute", last_day, hi)]
+        else:
+            parts = [self._rollup_totals(lab_id, "minute", lo, hi)]
+        count      = sum(p[0] for p in parts)
+        sum_att    = sum(p[1] for p in parts)
+        sum_people = sum(p[2] for p in parts)
+        return {
+            "count":          count,
+            "avg_attention":  sum_att / count if count else 0,
+            "avg_people":     sum_people / count if count else 0,
+            "max_people":     max(p[3] for p in parts),
+        }
+
+    def count_stats(self, lab_id, start, end) -> int:
+        return self._reader().execute(
+            "SELECT COUNT(*) FROM stats WHERE lab_id = ? AND ts >= ? AND ts <= ?",
+            (lab_id, start, end)).fetchone()[0]
+
+    def rollup_range(self, lab_id, tier, start, end) -> list:
+        """จุดเฉลี่ยของทุก bucket ใน tier ที่เริ่มในช่วง [start, end] เรียงตามเวลา"""
+        rows = self._reader().execute(
+            "SELECT bucket, samples, sum_attention, sum_people, max_people, sum_attentive, "
+            "sum_looking_down, sum_sleeping, sum_looking_away, sum_unknown FROM rollups "
+            "WHERE lab_id = ? AND tier = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket",
+            (lab_id, tier, bucket_start(start, ROLLUP_TIERS[tier]), end)).fetchall()
+        return [_rollup_row(r) for r in rows]
+
+    def pick_resolution(self, lab_id, start, end, points) -> str:
+        """
+        tier ที่ละเอียดที่สุดที่จำนวนจุดในช่วงไม่เกิน points
+        raw นับจริงจาก index, tier อื่นประมาณจาก span / ขนาด bucket — ไม่มี tier ไหนพอ → day
+        """
+        if self.count_stats(lab_id, start, end) <= points:
+            return "raw"
+        span = max(0.0, end - start)
+        for tier, seconds in ROLLUP_TIERS.items():
+            if span / seconds <= points:
+                return tier
+        return "day"
+
+    def history(self, lab_id, start, end, resolution="auto", points=500):
+        """คืน (resolution ที่ใช้, list ของจุด) สำหรับช่วง [start, end]"""
+        if resolution == "auto":
+            resolution = self.pick_resolution(lab_id, start, end, points)
+        if resolution == "raw":
+            return resolution, self.stats_range(lab_id, start, end)
+        return resolution, self.rollup_range(lab_id, resolution, start, end)
+
+    def recent_activities(self, lab_id, limit=20) -> list:
+        """activity ล่าสุด เรียงจากใหม่ → เก่า (เหมือน activity_log เดิมที่ appendleft)"""
+        rows = self._reader().execute(
+            "SELECT ts, type, message FROM activities WHERE lab_id = ? ORDER BY ts DESC, id DESC LIMIT ?",
+            (lab_id, limit)).fetchall()
+        return [_event_row(r) for r in rows]
+
+    def labs(self) -> list:
+        return [r[0] for r in self._reader().execute("SELECT DISTINCT lab_id FROM stats")]
+
+    def max_alert_id(self) -> int:
+        return self._reader().execute("SELECT COALESCE(MAX(id), 0) FROM alerts").fetchone()[0]
+
+    def is_empty(self) -> bool:
+        return self._reader().execute("SELECT 1 FROM stats LIMIT 1").fetchone() is None
+
+    # ─── Migration ──────────────────────────────────────────────
+    def import_json(self, json_path) -> int:
+        """
+        นำเข้า stats.json รูปแบบเดิม (ครั้งเดียว เมื่อฐานข้อมูลยังว่าง)
+        ไฟล์เดิมเก็บแค่ "HH:MM:SS" — ใช้วันที่จาก mtime ของไฟล์ประกอบเป็น timestamp
+        """
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        mtime = os.path.getmtime(json_path)
+        day   = datetime.fromtimestamp(mtime).date()
+
+        def to_ts(time_str):
+            try:
+                t = datetime.strptime(time_str, "%H:%M:%S").time()
+            except (TypeError, ValueError):
+                t = datetime.min.time()
+            ts = datetime.combine(day, t).timestamp()
+            return ts - 86400 if ts > mtime else ts   # เวลาหลัง mtime = บันทึกไว้ตั้งแต่เมื่อวาน
+
+        count = 0
+        for lab_id, items in data.get("stats_history", {}).items():
+            for item in items:
+                self.record_stats(lab_id, to_ts(item.get("time")), item["attention_rate"],
+                                  item["total_people"], item["summary"])
+                count += 1
+        for lab_id, items in data.get("activity_log", {}).items():
+            for item in reversed(items):   # activity_log เดิมเรียงใหม่ → เก่า
+                self.record_activity(lab_id, to_ts(item.get("time")), item["type"], item["message"])
+        self.flush()
+        return count
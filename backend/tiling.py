@@ -0,0 +1,100 @@
+"""
+🧩 Tiled inference (แบบ SAHI) สำหรับภาพมุมกว้างความละเอียดสูง
+  - แบ่ง frame เป็น tile ซ้อนทับกัน (rows x cols, overlap) แล้วส่งทุก tile เข้า pose model ใน batch เดียว
+    คนแถวหลังที่เหลือไม่กี่ pixel ตอนย่อทั้งเฟรมลง imgsz=640 จะใหญ่ขึ้นตาม tile
+  - full_frame=True ส่งภาพทั้งเฟรมเพิ่มอีกหนึ่งภาพ — จับคนแถวหน้าที่ตัวใหญ่คร่อมหลาย tile
+  - รวมผลด้วย NMS ข้าม tile: เทียบทั้ง IoU และ IoS (intersection / กล่องเล็ก)
+    กล่องที่ถูกขอบ tile ตัดครึ่งจะอยู่ข้างในกล่องเต็มของ tile ข้างเคียง — IoU ต่ำแต่ IoS สูง
+"""
+import numpy as np
+
+MERGE_IOU = 0.45   # IoU เกินนี้ถือว่าคนเดียวกัน (เท่ากับ iou ของ _POSE_ARGS)
+MERGE_IOS = 0.70   # intersection / พื้นที่กล่องเล็ก เกินนี้ถือว่าคนเดียวกัน (กล่องถูกขอบ tile ตัด)
+
+
+class TileLayout:
+    """
+    Args:
+        rows, cols: จำนวน tile แนวตั้ง/แนวนอน
+        overlap:    สัดส่วนที่ tile ข้างเคียงซ้อนกัน (0-0.5) — ควรกว้างกว่าครึ่งตัวคนแถวหลัง
+        full_frame: ส่งภาพทั้งเฟรมเพิ่มอีกหนึ่งภาพ (คนตัวใหญ่แถวหน้า)
+    """
+
+    def __init__(self, rows=2, cols=2, overlap=0.2, full_frame=True):
+        if rows < 1 or cols < 1:
+            raise ValueError("rows/cols must be >= 1")
+        if not 0 <= overlap < 0.5:
+            raise ValueError("overlap must be in [0, 0.5)")
+        self.rows       = int(rows)
+        self.cols       = int(cols)
+        self.overlap    = float(overlap)
+        self.full_frame = bool(full_frame)
+
+    @classmethod
+    def from_dict(cls, data):
+        """{"rows": 2, "cols": 3, "overlap": 0.2, "full_frame": true} หรือ [rows, cols]"""
+        if isinstance(data, (list, tuple)):
+            return cls(*data)
+        return cls(**{k: data[k] for k in ("rows", "cols", "overlap", "full_frame") if k in data})
+
+    def to_dict(self) -> dict:
+        return {"rows": self.rows, "cols": self.cols,
+                "overlap": self.overlap, "full_frame": self.full_frame}
+
+    def tiles(self, width, height) -> list:
+        """กรอบ (x1, y1, x2, y2) ของแต่ละ tile — ภาพทั้งเฟรม (ถ้าเปิด full_frame) อยู่ท้ายสุด"""
+        out = []
+        for y1, y2 in _spans(height, self.rows, self.overlap):
+            for x1, x2 in _spans(width, self.cols, self.overlap):
+                out.append((x1, y1, x2, y2))
+        if self.full_frame and len(out) > 1:
+            out.append((0, 0, width, height))
+        return out
+
+
+def _spans(length, n, overlap):
+    """แบ่งความยาว length เป็น n ช่วงเท่ากันที่ซ้อนกัน overlap (สัดส่วนของช่วง)"""
+    if n == 1:
+        return [(0, length)]
+    size = length / (n - (n - 1) * overlap)
+    step = size * (1 - overlap)
+    return [(int(round(i * step)), min(length, int(round(i * step + size)))) for i in range(n)]
+
+
+def merge_detections(xyxy: np.ndarray, confs: np.ndarray, keypoints: np.ndarray,
+                     iou=MERGE_IOU, ios=MERGE_IOS) -> tuple:
+    """
+    NMS ข้าม tile — เก็บกล่อง conf สูงสุดของแต่ละกลุ่มที่ซ้อนกัน
+    Args:
+        xyxy:      (N, 4) พิกัดเฟรมเต็มแล้ว
+        confs:     (N,)
+        keypoints: (N, 17, 3) เรียงตามกล่อง
+    Returns:
+        (xyxy, confs, keypoints) ที่เหลือ เรียงตาม conf มากไปน้อย
+    """
+    if len(xyxy) == 0:
+        return xyxy, confs, keypoints
+    order = np.argsort(-confs)
+    xyxy, confs, keypoints = xyxy[order], confs[order], keypoints[order]
+    areas = np.maximum(0, xyxy[:, 2] - xyxy[:, 0]) * np.maximum(0, xyxy[:, 3] - xyxy[:, 1])
+
+    keep = []
+    suppressed = np.zeros(len(xyxy), dtype=bool)
+    for i in range(len(xyxy)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        rest = np.arange(i + 1, len(xyxy))
+        rest = rest[~suppressed[rest]]
+        if not len(rest):
+            continue
+        ix1 = np.maximum(xyxy[i, 0], xyxy[rest, 0])
+        iy1 = np.maximum(xyxy[i, 1], xyxy[rest, 1])
+        ix2 = np.minimum(xyxy[i, 2], xyxy[rest, 2])
+        iy2 = np.minimum(xyxy[i, 3], xyxy[rest, 3])
+        inter = np.maximum(0, ix2 - ix1) * np.maximum(0, iy2 - iy1)
+        union = areas[i] + areas[rest] - inter
+        smaller = np.minimum(areas[i], areas[rest])
+        same = ((inter / np.maximum(union, 1e-9)) > iou) | ((inter / np.maximum(smaller, 1e-9)) > ios)
+        suppressed[rest[same]] = True
+    return xyxy[keep], confs[keep], keypoints[keep]
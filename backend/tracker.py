@@ -0,0 +1,183 @@
+"""
+🎯 Person Tracker - ติดตามนักศึกษาข้ามเฟรม + smoothing พฤติกรรม
+  - จับคู่กล่องด้วย IoU แบบ greedy สองรอบ (ByteTrack-style: กล่อง conf สูงก่อน แล้วค่อยกล่อง conf ต่ำ)
+    และ fallback เป็นระยะ centroid สำหรับคนที่ขยับเยอะ — CPU ล้วน
+  - แต่ละ track เก็บ ring buffer ของ scores แล้วเลือกพฤติกรรมจากค่าเฉลี่ย → label ไม่กระพริบ
+  - predict() เลื่อนกล่องตามความเร็วล่าสุด สำหรับเฟรมที่ไม่ได้รัน pose inference
+"""
+from collections import deque
+
+import numpy as np
+
+from behavior_analyzer import BEHAVIOR_KEYS, decide_behavior
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU ระหว่างกล่อง a (N, 4) และ b (M, 4) แบบ xyxy → (N, M)"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter  = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Track:
+    """หนึ่งคนที่ถูกติดตาม"""
+
+    def __init__(self, track_id, box, history):
+        self.id       = track_id
+        self.box      = np.asarray(box, dtype=np.float64)   # ตำแหน่งปัจจุบัน (รวม predict)
+        self.obs_box  = self.box.copy()                     # ตำแหน่งที่เห็นจริงล่าสุด
+        self.velocity = np.zeros(4)                         # px ต่อ step
+        self.steps    = 0                                   # จำนวน step นับจาก observation ล่าสุด
+        self.missed   = 0                                   # จำนวน update ที่ไม่เจอ
+        self.scores   = deque(maxlen=history)
+        self.behavior = "unknown"
+        self.confidence = 0
+
+    def observe(self, box):
+        box = np.asarray(box, dtype=np.float64)
+        if self.steps > 0:
+            v = (box - self.obs_box) / self.steps
+            self.velocity = 0.5 * self.velocity + 0.5 * v
+        self.box, self.obs_box = box, box.copy()
+        self.steps  = 0
+        self.missed = 0
+
+    def predict(self):
+        self.box   = self.box + self.velocity
+        self.steps += 1
+
+    def smoothed(self, scores: dict):
+        """เพิ่ม scores เข้า ring buffer แล้วเลือกพฤติกรรมจากค่าเฉลี่ย"""
+        self.scores.append([scores.get(k, 0.0) for k in BEHAVIOR_KEYS])
+        mean = np.mean(self.scores, axis=0)
+        self.behavior, self.confidence = decide_behavior(dict(zip(BEHAVIOR_KEYS, mean.tolist())))
+        return self.behavior, self.confidence
+
+
+class PersonTracker:
+    """
+    Args:
+        iou_threshold: IoU ต่ำสุดที่ถือว่าเป็นคนเดียวกัน
+        high_conf:     กล่องที่ conf ≥ ค่านี้ได้จับคู่ก่อน (ByteTrack-style)
+        max_missed:    ลบ track เมื่อไม่เจอติดกันเกินจำนวน update นี้
+        history:       ขนาด ring buffer ของ scores ต่อ track
+    """
+
+    def __init__(self, iou_threshold=0.3, high_conf=0.5, max_missed=5, history=8):
+        self.iou_threshold = iou_threshold
+        self.high_conf     = high_conf
+        self.max_missed    = max_missed
+        self.history       = history
+        self.tracks        = []
+        self._next_id      = 1
+
+    def predict(self) -> list:
+        """เลื่อนทุก track ไปหนึ่ง step — คืน [{"track_id", "box"}] สำหรับเฟรมที่ไม่ได้ inference"""
+        for t in self.tracks:
+            t.predict()
+        return [{"track_id": t.id, "box": t.box.tolist()} for t in self.tracks if t.missed == 0]
+
+    def update(self, detections: list, behaviors: list) -> list:
+        """
+        จับคู่ detections ของเฟรมนี้กับ track เดิม แล้วคืน behaviors ที่ smooth แล้ว
+
+        Args:
+            detections: [{"box": [x1, y1, x2, y2], "conf": float}] จาก analyze_frame
+            behaviors:  ผลต่อคนจาก score_behaviors (ลำดับเดียวกับ detections)
+        Returns:
+            list ของ behavior dict เดิม + "track_id", "raw_behavior" และ behavior/confidence ที่ smooth แล้ว
+        """
+        boxes = np.array([d["box"] for d in detections], dtype=np.float64).reshape(-1, 4)
+        confs = np.array([d["conf"] for d in detections], dtype=np.float64)
+        assigned = [None] * len(detections)
+        free = list(range(len(self.tracks)))
+
+        high = [i for i in range(len(detections)) if confs[i] >= self.high_conf]
+        low  = [i for i in range(len(detections)) if confs[i] < self.high_conf]
+        for group in (high, low):
+            free = self._match_iou(boxes, group, free, assigned)
+        free = self._match_centroid(boxes, free, assigned)
+
+        for ti in free:
+            self.tracks[ti].missed += 1
+        for di, ti in enumerate(assigned):
+            if ti is None:
+                self.tracks.append(Track(self._next_id, boxes[di], self.history))
+                self._next_id += 1
+                assigned[di] = len(self.tracks) - 1
+            else:
+                self.tracks[ti].observe(boxes[di])
+
+        out = []
+        for di, beh in enumerate(behaviors):
+            if di >= len(assigned):
+                out.append(beh)
+                continue
+            track = self.tracks[assigned[di]]
+            behavior, confidence = track.smoothed(beh.get("details", {}).get("scores", {}))
+            out.append({**beh, "behavior": behavior, "confidence": confidence,
+                        "track_id": track.id, "raw_behavior": beh["behavior"]})
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        return out
+
+    def _match_iou(self, boxes, det_idx, free, assigned):
+        if not det_idx or not free:
+            return free
+        track_boxes = np.array([self.tracks[t].box for t in free])
+        ious = iou_matrix(track_boxes, boxes[det_idx])
+        while ious.size and ious.max() >= self.iou_threshold:
+            r, c = np.unravel_index(np.argmax(ious), ious.shape)
+            assigned[det_idx[c]] = free[r]
+            ious[r, :] = -1
+            ious[:, c] = -1
+        matched = {assigned[d] for d in det_idx if assigned[d] is not None}
+        return [t for t in free if t not in matched]
+
+    def _match_centroid(self, boxes, free, assigned):
+        """คนที่ขยับเยอะจน IoU ต่ำ — จับคู่ถ้า centroid ห่างไม่เกินครึ่งเส้นทแยงของกล่อง"""
+        left = [d for d, t in enumerate(assigned) if t is None]
+        if not left or not free:
+            return free
+        tb = np.array([self.tracks[t].box for t in free])
+        db = boxes[left]
+        tc = (tb[:, :2] + tb[:, 2:]) / 2
+        dc = (db[:, :2] + db[:, 2:]) / 2
+        dist = np.linalg.norm(tc[:, None] - dc[None, :], axis=2)
+        diag = np.linalg.norm(tb[:, 2:] - tb[:, :2], axis=1)[:, None]
+        dist[dist > 0.5 * diag] = np.inf
+        while np.isfinite(dist).any():
+            r, c = np.unravel_index(np.argmin(dist), dist.shape)
+            assigned[left[c]] = free[r]
+            dist[r, :] = np.inf
+            dist[:, c] = np.inf
+        matched = set(assigned)
+        return [t for t in free if t not in matched]
+
+
+def propagate_analysis(prev: dict, frame: np.ndarray, predicted: list) -> dict:
+    """
+    เฟรมระหว่างรอบ pose inference: เลื่อนกล่องตาม track แล้วใช้พฤติกรรมเดิมกับ frame ใหม่
+    (ไม่มี skeleton — keypoints เดิมไม่ตรงตำแหน่งแล้ว; ไม่รันโมเดล)
+
+    Args:
+        predicted: ผลของ PersonTracker.predict() ของกล้องนี้ — เรียกใน process ที่ถือ tracker
+                   (analysis worker หรือ InferencePool.predict)
+    """
+    moved = {t["track_id"]: t["box"] for t in predicted}
+    detections = [
+        {**det, "box": moved.get(beh.get("track_id"), det["box"])}
+        for det, beh in zip(prev["detections"], prev["behaviors"])
+    ]
+    out = {**prev, "detections": detections, "frame": frame,
+           "keypoints": None, "propagated": True}
+    out.pop("frame_scale", None)   # ของเฟรมย่อใน cache ของรอบก่อน — frame ใหม่เป็นขนาดเต็ม
+    out.pop("frame_size", None)
+    return out
@@ -4,7 +4,7 @@ let currentLab = "";
 let useBehaviorMode = true; // ✅ เปิดโหมดวิเคราะห์พฤติกรรมเป็นค่าเริ่มต้น
 let liveFeedInterval = null;
 let lastAlertId = 0; // ID สุดท้ายที่ได้รับเพื่อหลีกเอา alert ซ้ำ
-let alertPollInterval = null; // setInterval handle สำหรับดึง alerts
+let eventSource = null; // 📣 SSE connection (/api/events) — ข้อมูลทั้งหมดถูก push มาแทนการ poll
 let latestExportData = null; // เก็บข้อมูลล่าสุดสำหรับ export
 
 // 🎥 ติดตามว่ากล้องไหนมี live source กำลัง stream อยู่ (key: "labId/camId")
@@ -16,7 +16,7 @@ function isStreamActive(labId, camId) {
   return activeSources.has(_srcKey(labId, camId));
 }
 
-// 🎥 เริ่มโหลดภาพ + ดึงข้อมูลจาก Flask ทุก 2 วินาที
+// 🎥 เริ่มโหลดภาพ + ข้อมูลครั้งแรก — ตัวเลขหลังจากนี้มาทาง SSE (onAnalysisEvent)
 function startLiveFeed() {
   // หยุด interval เก่าก่อน (ป้องกันซ้ำซ้อน)
   if (liveFeedInterval) {
@@ -24,20 +24,18 @@ function startLiveFeed() {
   }
 
   const feed = document.getElementById("liveFeed");
-  const detectionCount = document.getElementById("detectionCount");
   if (!feed) return;
 
   // เรียกทันทีครั้งแรก
   updateLiveFeed();
 
-  // แล้วเรียกทุก 2 วินาที
-  liveFeedInterval = setInterval(updateLiveFeed, 2000);
+  // รูปนิ่งต้องโหลดภาพใหม่เองทุก 2 วินาที (โหมด stream browser รับ MJPEG เอง)
+  liveFeedInterval = setInterval(refreshFeedImage, 2000);
 }
 
-// 🔄 ฟังก์ชันอัปเดต feed และข้อมูล
-async function updateLiveFeed() {
+// 🖼️ โหลดภาพนิ่งใหม่ (server วิเคราะห์ตอนโหลดภาพ แล้ว push ผลมาทาง SSE)
+function refreshFeedImage() {
   const feed = document.getElementById("liveFeed");
-  const detectionCount = document.getElementById("detectionCount");
   if (!feed || !currentLab) return;
 
   // ถ้า stream mode — browser จัดการ image เอง ไม่ต้อง set src
@@ -47,6 +45,15 @@ async function updateLiveFeed() {
       : `http://127.0.0.1:5000/api/frame/${currentLab}/${currentCamera}?t=${Date.now()}`;
     feed.src = frameUrl;
   }
+}
+
+// 🔄 ฟังก์ชันอัปเดต feed และดึงข้อมูลล่าสุดหนึ่งครั้ง (snapshot)
+async function updateLiveFeed() {
+  const feed = document.getElementById("liveFeed");
+  const detectionCount = document.getElementById("detectionCount");
+  if (!feed || !currentLab) return;
+
+  refreshFeedImage();
 
   try {
     // ดึงข้อมูลการตรวจจับ
@@ -61,22 +68,7 @@ async function updateLiveFeed() {
     }
 
     // อัปเดตสถิติฝั่งขวา (จำนวนคน)
-    const peopleEl = document.querySelector(".text-blue-600");
-    const pcUsedEl = document.querySelector(
-      ".text-green-600:not(#attentionRate)",
-    );
-    const pcFreeEl = document.querySelector(".text-orange-600");
-    const usageEl = document.querySelector(".text-purple-600");
-
-    const total = 30;
-    const used = Math.min(total, data.num_people);
-    const free = total - used;
-    const usage = Math.round((used / total) * 100);
-
-    if (peopleEl) peopleEl.textContent = used;
-    if (pcUsedEl) pcUsedEl.textContent = used;
-    if (pcFreeEl) pcFreeEl.textContent = free;
-    if (usageEl) usageEl.textContent = `${usage}%`;
+    updatePeopleStats(data.num_people, data.seats);
 
     // ถ้าเปิดโหมดวิเคราะห์พฤติกรรม
     if (useBehaviorMode) {
@@ -98,6 +90,43 @@ async function updateLiveFeed() {
   }
 }
 
+// 👥 อัปเดตสถิติฝั่งขวา (จำนวนคน / PC ที่ใช้)
+// seats = {total, occupied} จาก seat map ของกล้อง — ไม่มีก็ประมาณจากจำนวนคน / DEFAULT_SEATS
+const DEFAULT_SEATS = 30;
+function updatePeopleStats(numPeople, seats) {
+  const peopleEl = document.querySelector(".text-blue-600");
+  const pcUsedEl = document.querySelector(
+    ".text-green-600:not(#attentionRate)",
+  );
+  const pcFreeEl = document.querySelector(".text-orange-600");
+  const usageEl = document.querySelector(".text-purple-600");
+
+  const total = seats ? seats.total : DEFAULT_SEATS;
+  const used = Math.min(total, seats ? seats.occupied : numPeople);
+  const free = total - used;
+  const usage = total ? Math.round((used / total) * 100) : 0;
+
+  if (peopleEl) peopleEl.textContent = seats ? numPeople : used;
+  if (pcUsedEl) pcUsedEl.textContent = used;
+  if (pcFreeEl) pcFreeEl.textContent = free;
+  if (usageEl) usageEl.textContent = `${usage}%`;
+}
+
+// 📣 ผลวิเคราะห์ใหม่จาก SSE — อัปเดตเฉพาะกล้องที่กำลังดูอยู่
+function onAnalysisEvent(data) {
+  if (data.lab_id !== currentLab || data.camera_id !== currentCamera) return;
+  const detectionCount = document.getElementById("detectionCount");
+
+  updatePeopleStats(data.total_people, data.seats);
+  if (useBehaviorMode) {
+    updateBehaviorStats(data);
+    if (detectionCount)
+      detectionCount.textContent = `🧠 ตรวจพบ ${data.total_people} คน | ตั้งใจเรียน ${data.attention_rate}%`;
+  } else if (detectionCount) {
+    detectionCount.textContent = `👥 ตรวจพบ ${data.total_people} คน (เชื่อมั่น ${data.avg_confidence}%)`;
+  }
+}
+
 // 🧠 อัปเดตสถิติพฤติกรรม
 function updateBehaviorStats(data) {
   const attentiveEl = document.getElementById("behaviorAttentive");
@@ -226,8 +255,9 @@ function enterLab(labId, labName) {
   updateCameraFeed();
   startLiveFeed();
   initCharts(); // 📊 สร้างกราฟ
-  startChartUpdates(); // 📊 เริ่มอัปเดตกราฟ
-  startAlertPolling(); // 🔔 เริ่มยิงฟังการแจ้งเตือน
+  updateCharts(); // 📊 ข้อมูลกราฟเริ่มต้น — จุดใหม่มาทาง SSE
+  pollAlerts(); // 🔔 alert ที่เกิดก่อนเข้าห้อง
+  connectEvents(labId); // 📣 รับ event ของห้องนี้ (+ alert ทุกห้อง)
 }
 
 // 🔙 กลับไปหน้าเมนู
@@ -241,8 +271,9 @@ function backToMenu() {
     clearInterval(liveFeedInterval);
     liveFeedInterval = null;
   }
-  stopChartUpdates();
-  stopAlertPolling(); // 🔔 หยุดยิงฟังแจ้งเตือน
+  // 📣 กลับไปรับเฉพาะ overview ของทุกห้อง
+  updateOverview();
+  connectEvents(null);
 }
 
 // 🌙 โหมดมืด / สว่าง
@@ -534,9 +565,14 @@ async function exportReport() {
   if (dateEl) dateEl.textContent = `วันที่: ${dateStr}`;
   if (timeEl) timeEl.textContent = `เวลาส่งออก: ${timeStr}`;
 
-  // ดึงข้อมูลจาก backend
+  // ดึงข้อมูลจาก backend — ช่วงเวลาของวันนี้ (เที่ยงคืน → ตอนนี้)
+  const dayStart = new Date(now);
+  dayStart.setHours(0, 0, 0, 0);
+  const range = `from=${dayStart.getTime() / 1000}&to=${now.getTime() / 1000}`;
   try {
-    const res = await fetch(`http://127.0.0.1:5000/api/export/${currentLab}`);
+    const res = await fetch(
+      `http://127.0.0.1:5000/api/export/${currentLab}?${range}`,
+    );
     const data = await res.json();
     latestExportData = data;
 
@@ -577,7 +613,9 @@ function closeReportModal() {
 // ===== 📊 CHART FUNCTIONS =====
 let attentionChart = null;
 let behaviorPieChart = null;
-let chartUpdateInterval = null;
+let activityItems = []; // activity ล่าสุด (ใหม่ → เก่า)
+const MAX_CHART_POINTS = 30;
+const MAX_ACTIVITY_ITEMS = 20;
 
 // 📊 สร้างกราฟเริ่มต้น
 function initCharts() {
@@ -706,7 +744,7 @@ function initCharts() {
   }
 }
 
-// 📊 อัปเดตข้อมูลกราฟ
+// 📊 โหลดข้อมูลกราฟทั้งชุด (ตอนเข้าห้อง / หลัง SSE reset)
 async function updateCharts() {
   if (!currentLab) return;
 
@@ -721,16 +759,7 @@ async function updateCharts() {
       attentionChart.update("none");
     }
 
-    if (behaviorPieChart && data.latest_summary) {
-      const summary = data.latest_summary;
-      behaviorPieChart.data.datasets[0].data = [
-        summary.attentive || 0,
-        summary.sleeping || 0,
-        summary.looking_down || 0,
-        summary.looking_away || 0,
-      ];
-      behaviorPieChart.update("none");
-    }
+    if (data.latest_summary) updateBehaviorPie(data.latest_summary);
 
     // อัปเดต Activity Log
     await updateActivityLog();
@@ -739,6 +768,45 @@ async function updateCharts() {
   }
 }
 
+// 🥧 อัปเดตกราฟวงกลมพฤติกรรม
+function updateBehaviorPie(summary) {
+  if (!behaviorPieChart) return;
+  behaviorPieChart.data.datasets[0].data = [
+    summary.attentive || 0,
+    summary.sleeping || 0,
+    summary.looking_down || 0,
+    summary.looking_away || 0,
+  ];
+  behaviorPieChart.update("none");
+}
+
+// 📣 จุดสถิติใหม่จาก SSE — ต่อท้ายกราฟเส้น ตัดให้เหลือ MAX_CHART_POINTS จุด
+function onStatsEvent(point) {
+  if (point.lab_id !== currentLab) return;
+  if (attentionChart) {
+    const labels = attentionChart.data.labels;
+    const [attention, people] = attentionChart.data.datasets;
+    labels.push(point.time);
+    attention.data.push(point.attention_rate);
+    people.data.push(point.total_people);
+    while (labels.length > MAX_CHART_POINTS) {
+      labels.shift();
+      attention.data.shift();
+      people.data.shift();
+    }
+    attentionChart.update("none");
+  }
+  updateBehaviorPie(point.summary);
+}
+
+// 📣 activity ใหม่จาก SSE
+function onActivityEvent(activity) {
+  if (activity.lab_id !== currentLab) return;
+  activityItems.unshift(activity);
+  activityItems = activityItems.slice(0, MAX_ACTIVITY_ITEMS);
+  renderActivityLog();
+}
+
 // 📝 อัปเดต Activity Log
 async function updateActivityLog() {
   if (!currentLab) return;
@@ -748,11 +816,20 @@ async function updateActivityLog() {
       `http://127.0.0.1:5000/api/activities/${currentLab}`,
     );
     const data = await res.json();
+    if (!data.activities) return;
+    activityItems = data.activities;
+    renderActivityLog();
+  } catch (e) {
+    console.error("Error updating activity log:", e);
+  }
+}
 
-    const activityList = document.getElementById("activityList");
-    if (!activityList || !data.activities) return;
+// 📝 แสดง Activity Log จาก activityItems
+function renderActivityLog() {
+  const activityList = document.getElementById("activityList");
+  if (!activityList) return;
 
-    if (data.activities.length === 0) {
+  if (activityItems.length === 0) {
       activityList.innerHTML = `
         <div class="flex items-center space-x-3 text-sm">
           <div class="w-2 h-2 bg-gray-400 rounded-full"></div>
@@ -760,46 +837,26 @@ async function updateActivityLog() {
           <span>ยังไม่มีกิจกรรม</span>
         </div>
       `;
-      return;
-    }
+    return;
+  }
 
-    activityList.innerHTML = data.activities
-      .slice(0, 10)
-      .map((activity) => {
-        let dotColor = "bg-blue-500";
-        if (activity.type === "warning") dotColor = "bg-yellow-500";
-        if (activity.type === "alert") dotColor = "bg-red-500";
-        if (activity.type === "success") dotColor = "bg-green-500";
+  activityList.innerHTML = activityItems
+    .slice(0, 10)
+    .map((activity) => {
+      let dotColor = "bg-blue-500";
+      if (activity.type === "warning") dotColor = "bg-yellow-500";
+      if (activity.type === "alert") dotColor = "bg-red-500";
+      if (activity.type === "success") dotColor = "bg-green-500";
 
-        return `
+      return `
         <div class="flex items-center space-x-3 text-sm">
           <div class="w-2 h-2 ${dotColor} rounded-full"></div>
           <span class="text-gray-600">${activity.time}</span>
           <span>${activity.message}</span>
         </div>
       `;
-      })
-      .join("");
-  } catch (e) {
-    console.error("Error updating activity log:", e);
-  }
-}
-
-// 📊 เริ่มอัปเดตกราฟทุก 2 วินาที
-function startChartUpdates() {
-  if (chartUpdateInterval) {
-    clearInterval(chartUpdateInterval);
-  }
-  updateCharts(); // เรียกทันที
-  chartUpdateInterval = setInterval(updateCharts, 2000);
-}
-
-// 📊 หยุดอัปเดตกราฟ
-function stopChartUpdates() {
-  if (chartUpdateInterval) {
-    clearInterval(chartUpdateInterval);
-    chartUpdateInterval = null;
-  }
+    })
+    .join("");
 }
 
 document.addEventListener("DOMContentLoaded", function () {
@@ -809,28 +866,64 @@ document.addEventListener("DOMContentLoaded", function () {
     document.getElementById("themeIcon").textContent = "☀️";
     document.getElementById("themeText").textContent = "โหมดสว่าง";
   }
-  // 🏠 อัปเดต overview card หน้าเมนูทุก 8 วินาที
+  // 🏠 overview card หน้าเมนู — โหลดครั้งแรก แล้วรับการเปลี่ยนแปลงทาง SSE
   updateOverview();
-  setInterval(updateOverview, 8000);
+  connectEvents(null);
 });
 
 // =============================================
-// 🔔  Alert polling (แจ้งเตือนแบบ real-time)
+// 📣  Server-Sent Events (/api/events)
 // =============================================
 
-function startAlertPolling() {
-  if (alertPollInterval) return; // กันทำซ้ำ
-  alertPollInterval = setInterval(pollAlerts, 3000);
-  pollAlerts(); // เรียกทันที
+/**
+ * เปิด SSE ใหม่ — ในห้อง: event ของห้องนั้น + alert ทุกห้อง, หน้าเมนู: overview ทุกห้อง
+ * browser reconnect เองพร้อม Last-Event-ID ถ้าการเชื่อมต่อหลุด
+ */
+function connectEvents(labId) {
+  disconnectEvents();
+  const query = labId
+    ? `labs=${encodeURIComponent(labId)}&all_labs=alert`
+    : "types=overview";
+  eventSource = new EventSource(`http://127.0.0.1:5000/api/events?${query}`);
+
+  const on = (name, handler) =>
+    eventSource.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+  on("analysis", onAnalysisEvent);
+  on("stats", onStatsEvent);
+  on("activity", onActivityEvent);
+  on("alert", onAlertEvent);
+  on("overview", onOverviewEvent);
+  on("reset", reloadSnapshot); // พลาด event เกินที่ server เก็บไว้ — โหลดใหม่ทั้งชุด
+}
+
+function disconnectEvents() {
+  if (eventSource) {
+    eventSource.close();
+    eventSource = null;
+  }
 }
 
-function stopAlertPolling() {
-  if (alertPollInterval) {
-    clearInterval(alertPollInterval);
-    alertPollInterval = null;
+function reloadSnapshot() {
+  if (currentLab) {
+    updateLiveFeed();
+    updateCharts();
+    pollAlerts();
+  } else {
+    updateOverview();
   }
 }
 
+// =============================================
+// 🔔  Alerts (แจ้งเตือนแบบ real-time)
+// =============================================
+
+function onAlertEvent(alert) {
+  if (alert.id <= lastAlertId) return;
+  const icons = { warning: "⚠️", alert: "🔴", info: "📱" };
+  showToast((icons[alert.type] || "🔔") + " " + alert.message, alert.type);
+  lastAlertId = alert.id;
+}
+
 async function pollAlerts() {
   try {
     const res = await fetch(
@@ -838,10 +931,7 @@ async function pollAlerts() {
     );
     if (!res.ok) return;
     const data = await res.json();
-    for (const alert of data.alerts || []) {
-      const icons = { warning: "⚠️", alert: "🔴", info: "📱" };
-      showToast((icons[alert.type] || "🔔") + " " + alert.message, alert.type);
-    }
+    for (const alert of data.alerts || []) onAlertEvent(alert);
     if (data.latest_id > lastAlertId) lastAlertId = data.latest_id;
   } catch (_) {
     /* server not running is fine */
@@ -889,29 +979,34 @@ async function updateOverview() {
     if (!res.ok) return;
     const data = await res.json();
     for (const [labId, info] of Object.entries(data.labs || {})) {
-      const elPeople = document.getElementById(`ov-${labId}-people`);
-      const elAttention = document.getElementById(`ov-${labId}-attention`);
-      const elTime = document.getElementById(`ov-${labId}-time`);
-      if (!elPeople) continue;
-
-      elPeople.textContent = info.has_data ? info.total_people : "-";
-      elTime.textContent = info.last_updated;
-
-      const pct = info.attention_rate;
-      const color =
-        pct >= 70
-          ? "text-green-600"
-          : pct >= 40
-            ? "text-yellow-500"
-            : "text-red-500";
-      elAttention.className = `font-medium ${color}`;
-      elAttention.textContent = info.has_data ? `${pct}%` : "-%";
+      renderOverviewCard(labId, info);
     }
   } catch (_) {
     /* server not running is fine */
   }
 }
 
+// 📣 overview ของห้องเปลี่ยนจาก SSE
+function onOverviewEvent(info) {
+  renderOverviewCard(info.lab_id, info);
+}
+
+function renderOverviewCard(labId, info) {
+  const elPeople = document.getElementById(`ov-${labId}-people`);
+  const elAttention = document.getElementById(`ov-${labId}-attention`);
+  const elTime = document.getElementById(`ov-${labId}-time`);
+  if (!elPeople) return;
+
+  elPeople.textContent = info.has_data ? info.total_people : "-";
+  elTime.textContent = info.last_updated;
+
+  const pct = info.attention_rate;
+  const color =
+    pct >= 70 ? "text-green-600" : pct >= 40 ? "text-yellow-500" : "text-red-500";
+  elAttention.className = `font-medium ${color}`;
+  elAttention.textContent = info.has_data ? `${pct}%` : "-%";
+}
+
 // =============================================
 // 🎥 Video Source Management
 // =============================================